@@ -0,0 +1,189 @@
+"""Execution backend benchmarks: virtual machine vs compiled Python.
+
+    python -m benchmarks.bench_backends --scale 1 -o results.json
+    python -m benchmarks.bench_backends --programs primos collatz --levels 0 2
+
+Each kernel is a compute-bound program parameterized by its size. For every
+backend it records compile time, run time and the output, which must be the
+same for all backends.
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+
+from src.cli import check_program
+from src.intermediate import IntermediateGenerator
+from src.optimizer import LEVELS, PassManager
+from src.pycodegen import PythonBackend
+from src.vm import StreamIO, VirtualMachine, assemble
+
+from .bench_lexer import git_commit
+
+# Kernels; {n} is replaced by the problem size times --scale
+PROGRAMS = {
+    'bucles': ("""main {
+    int i, j, n, s;
+    n = {n}; s = 0;
+    i = 0;
+    while (i < n) {
+        j = 0;
+        while (j < n) { s = s + (i * j) % 7 - (n * 3 + 2) / 5; j++; }
+        i++;
+    }
+    cout s;
+}""", 600),
+    'primos': ("""main {
+    int n, candidate, divisor, count, prime;
+    n = {n}; count = 0;
+    candidate = 2;
+    while (candidate <= n) {
+        prime = 1;
+        divisor = 2;
+        while (divisor * divisor <= candidate && prime == 1) {
+            if (candidate % divisor == 0) prime = 0; end
+            divisor++;
+        }
+        count = count + prime;
+        candidate++;
+    }
+    cout count;
+}""", 60000),
+    'collatz': ("""main {
+    int n, start, value, steps, longest;
+    n = {n}; longest = 0;
+    start = 1;
+    do {
+        value = start; steps = 0;
+        while (value != 1) {
+            if (value % 2 == 0) value = value / 2; else value = 3 * value + 1; end
+            steps++;
+        }
+        if (steps > longest) longest = steps; end
+        start++;
+    } while (start <= n);
+    cout longest;
+}""", 30000),
+    'flotante': ("""main {
+    int k, n; float sum, sign, term;
+    n = {n}; sum = 0; sign = 1;
+    k = 0;
+    while (k < n) {
+        term = sign / (2 * k + 1);
+        sum = sum + term;
+        sign = -sign;
+        k++;
+    }
+    cout sum * 4;
+}""", 400000),
+    'switch': ("""main {
+    int i, n, a, b, c;
+    n = {n}; a = 0; b = 0; c = 0;
+    i = 0;
+    while (i < n) {
+        switch (i % 4) {
+            case 0 { a = a + i; }
+            case 1 { b = b - 1; }
+            case 2 { c = c + a % 5; }
+            case 3 { a = a - b; }
+        }
+        i++;
+    }
+    cout a; cout b; cout c;
+}""", 200000),
+}
+
+
+def program_text(name, scale=1.0):
+    template, size = PROGRAMS[name]
+    return template.replace("{n}", str(max(int(size * scale), 1)))
+
+
+def _run(runner):
+    output = io.StringIO()
+    streams = StreamIO(io.StringIO(), output)
+    start = time.perf_counter()
+    runner(streams)
+    return output.getvalue(), time.perf_counter() - start
+
+
+def bench_program(name, code, levels):
+    """One entry per backend: compile and run seconds plus the output"""
+    start = time.perf_counter()
+    tree, errors = check_program(code)
+    front_end = time.perf_counter() - start
+    if errors:
+        raise ValueError(f"{name}: " + "; ".join(map(str, errors)))
+
+    entries = []
+    for level in levels:
+        start = time.perf_counter()
+        intermediate = IntermediateGenerator().generate(tree)
+        PassManager(level).run(intermediate)
+        bytecode = assemble(intermediate)
+        compile_seconds = front_end + time.perf_counter() - start
+        output, seconds = _run(lambda streams: VirtualMachine(streams, budget=None).run(bytecode))
+        entries.append({'backend': f"vm-O{level}", 'compile_seconds': compile_seconds, 'run_seconds': seconds, 'output': output})
+
+    start = time.perf_counter()
+    program = PythonBackend().compile(tree)
+    compile_seconds = front_end + time.perf_counter() - start
+    output, seconds = _run(lambda streams: program.run(streams, None))
+    entries.append({'backend': "python", 'compile_seconds': compile_seconds, 'run_seconds': seconds, 'output': output})
+    return entries
+
+
+def run(names, levels, scale=1.0):
+    results = []
+    for name in names:
+        code = program_text(name, scale)
+        entries = bench_program(name, code, levels)
+        outputs = {entry['output'] for entry in entries}
+        if len(outputs) != 1:
+            raise AssertionError(f"{name}: los backends no coinciden: {[entry['output'] for entry in entries]}")
+        baseline = entries[0]['run_seconds']
+        for entry in entries:
+            entry['program'] = name
+            entry['speedup'] = baseline / entry['run_seconds'] if entry['run_seconds'] else None
+            results.append(entry)
+            print(_format_entry(entry), file=sys.stderr, flush=True)
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': scale,
+        'results': results,
+    }
+
+
+def _format_entry(entry):
+    speedup = f"{entry['speedup']:.2f}x" if entry['speedup'] else "-"
+    return (
+        f"{entry['program']:>10} {entry['backend']:>7}: compilación {entry['compile_seconds']:.3f}s, "
+        f"ejecución {entry['run_seconds']:.3f}s ({speedup})"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_backends", description="Benchmarks de los backends de ejecución")
+    parser.add_argument("--programs", nargs="+", choices=list(PROGRAMS), default=list(PROGRAMS))
+    parser.add_argument("--levels", nargs="+", type=int, choices=sorted(LEVELS), default=[0, max(LEVELS)],
+                        help="niveles de optimización para la máquina virtual")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplica el tamaño de cada problema")
+    parser.add_argument("-o", "--output", help="guardar los resultados en este archivo JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.programs, args.levels, args.scale)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
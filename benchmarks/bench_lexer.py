@@ -0,0 +1,208 @@
+"""Lexer benchmarks.
+
+    python -m benchmarks.bench_lexer --sizes 1K 1M 10M -o results.json
+    python -m benchmarks.bench_lexer --compare old.json new.json
+    python -m benchmarks.bench_lexer --cold-start --import-budget 50
+
+For each corpus size and engine it records tokens per second, per-phase
+timings and (unless --no-memory) the tracemalloc peak of a separate run.
+It also records the cold start of the lexer (importing src.lexer and
+creating a Lexer in a fresh interpreter) and exits with status 1 when that
+goes over the import budget.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from src.lexer import Lexer
+
+from .corpus import generate_program, parse_size
+
+DEFAULT_SIZES = ["1K", "10K", "100K", "1M", "10M", "100M"]
+# Cold start budget, in milliseconds
+IMPORT_BUDGET_MS = 50
+COLD_START_RUNS = 5
+COLD_START_SCRIPT = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "from src.lexer import Lexer\n"
+    "Lexer()\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run_phases(engine, code, output_filename):
+    """Tokenize code phase by phase, returning (tokens, errors, {phase: seconds})"""
+    lexer = Lexer(engine)
+    phases = {}
+    if engine == 'legacy':
+        matches, phases['comment_prescan'] = _timed(lexer._find_block_comments, code)
+        (tokens, errors), phases['process_text'] = _timed(lexer._tokenize_legacy, code, matches)
+    else:
+        (tokens, errors), phases['scan'] = _timed(lexer._tokenize_combined, code)
+    _, phases['save'] = _timed(lexer.save_tokens_to_file, tokens, output_filename)
+    return tokens, errors, phases
+
+
+def peak_memory(engine, code, output_filename):
+    """Peak traced allocation (bytes) of a full tokenize + save"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run_phases(engine, code, output_filename)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_highlighting(code, tokens):
+    """Time IDE.apply_syntax_highlighting; None when there is no display"""
+    try:
+        import tkinter as tk
+        from src.ui import IDE
+        root = tk.Tk()
+    except Exception:
+        return None
+    try:
+        root.withdraw()
+        ide = IDE(root)
+        ide.text_area.insert("1.0", code)
+        _, seconds = _timed(ide.apply_syntax_highlighting, tokens)
+        return seconds
+    finally:
+        root.destroy()
+
+
+def cold_start(runs=COLD_START_RUNS):
+    """Best time (seconds) to import the lexer and create one, each in a new interpreter"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT], cwd=root,
+                                capture_output=True, text=True, check=True)
+        times.append(float(result.stdout))
+    return min(times)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, engines, memory=True, highlight=False, seed=0):
+    cold_start_seconds = cold_start()
+    print(f"arranque en frío del léxico: {cold_start_seconds * 1000:.1f} ms", file=sys.stderr, flush=True)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        output_filename = os.path.join(tmp, "tokens.txt")
+        for size in sizes:
+            code = generate_program(size, seed)
+            for engine in engines:
+                tokens, errors, phases = run_phases(engine, code, output_filename)
+                if highlight:
+                    phases['highlight'] = bench_highlighting(code, tokens)
+                total = sum(seconds for phase, seconds in phases.items() if phase != 'highlight')
+                lex_seconds = total - phases['save']
+                entry = {
+                    'size': size,
+                    'engine': engine,
+                    'chars': len(code),
+                    'tokens': len(tokens),
+                    'errors': len(errors),
+                    'phases': phases,
+                    'total_seconds': total,
+                    'tokens_per_second': len(tokens) / lex_seconds if lex_seconds > 0 else None,
+                    'peak_memory_bytes': peak_memory(engine, code, output_filename) if memory else None,
+                }
+                results.append(entry)
+                del tokens, errors
+                print(_format_entry(entry), file=sys.stderr, flush=True)
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cold_start_seconds': cold_start_seconds,
+        'results': results,
+    }
+
+
+def _format_entry(entry):
+    phases = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in entry['phases'].items() if seconds is not None)
+    memory = f", pico {entry['peak_memory_bytes'] / 1e6:.1f} MB" if entry['peak_memory_bytes'] else ""
+    rate = entry['tokens_per_second'] or 0
+    return f"{entry['size']:>11} B {entry['engine']:>8}: {entry['tokens']} tokens, {rate:,.0f} tokens/s ({phases}){memory}"
+
+
+def compare(old_path, new_path):
+    """Print the speed ratio between two result files"""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    baseline = {(entry['size'], entry['engine']): entry for entry in old['results']}
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    if old.get('cold_start_seconds') and new.get('cold_start_seconds'):
+        print(f"arranque en frío: {old['cold_start_seconds'] * 1000:.1f} ms -> {new['cold_start_seconds'] * 1000:.1f} ms")
+    for entry in new['results']:
+        before = baseline.get((entry['size'], entry['engine']))
+        if not before:
+            continue
+        ratio = before['total_seconds'] / entry['total_seconds'] if entry['total_seconds'] else float('inf')
+        print(f"{entry['size']:>11} B {entry['engine']:>8}: {before['total_seconds']:.3f}s -> {entry['total_seconds']:.3f}s ({ratio:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_lexer", description="Benchmarks del analizador léxico")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="tamaños del corpus (1K, 10M, ...)")
+    parser.add_argument("--engines", nargs="+", choices=Lexer.ENGINES, default=list(Lexer.ENGINES))
+    parser.add_argument("--no-memory", action="store_true", help="omitir la medición de memoria (tracemalloc es lento)")
+    parser.add_argument("--highlight", action="store_true", help="medir también el resaltado del IDE (requiere pantalla)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="guardar los resultados en este archivo JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTERIOR", "NUEVO"), help="comparar dos archivos de resultados")
+    parser.add_argument("--cold-start", action="store_true", help="medir solo el arranque en frío del léxico")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_MS, metavar="MS",
+                        help=f"tiempo máximo de arranque en frío (por defecto {IMPORT_BUDGET_MS} ms)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.cold_start:
+        seconds = cold_start()
+        print(f"arranque en frío del léxico: {seconds * 1000:.1f} ms")
+    else:
+        report = run([parse_size(size) for size in args.sizes], args.engines, not args.no_memory, args.highlight, args.seed)
+        text = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        seconds = report['cold_start_seconds']
+
+    if seconds * 1000 > args.import_budget:
+        print(f"El arranque en frío ({seconds * 1000:.1f} ms) supera el presupuesto de {args.import_budget:g} ms",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
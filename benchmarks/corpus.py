@@ -0,0 +1,139 @@
+"""Synthetic program generator for the lexer benchmarks.
+
+    python -m benchmarks.corpus 10M -o big.txt
+"""
+import argparse
+import random
+
+SIZE_SUFFIXES = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+    """Turn '1K', '10M' or '512' into a number of bytes"""
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+class ProgramGenerator:
+    """Build random but well-formed programs for the language of the Lexer"""
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.variables = []
+        self.counter = 0
+
+    def generate(self, size):
+        """Return a program of at least size characters"""
+        parts = ["/* Programa generado para pruebas de rendimiento */\nmain {\n"]
+        length = len(parts[0])
+        while length < size:
+            block = self._block(1)
+            parts.append(block)
+            length += len(block)
+        parts.append("}\n")
+        return "".join(parts)
+
+    def _name(self):
+        self.counter += 1
+        return f"v{self.counter}"
+
+    def _number(self):
+        if self.random.random() < 0.4:
+            return f"{self.random.randint(0, 999)}.{self.random.randint(0, 99)}"
+        return str(self.random.randint(0, 99999))
+
+    def _operand(self):
+        if self.variables and self.random.random() < 0.6:
+            return self.random.choice(self.variables)
+        return self._number()
+
+    def _expression(self, depth=0):
+        parts = [self._operand()]
+        for _ in range(self.random.randint(0, 3)):
+            parts.append(self.random.choice("+-*/%^"))
+            if depth < 2 and self.random.random() < 0.2:
+                parts.append(f"({self._expression(depth + 1)})")
+            else:
+                parts.append(self._operand())
+        return " ".join(parts)
+
+    def _condition(self):
+        condition = f"{self._operand()} {self.random.choice(['<', '<=', '>', '>=', '==', '!='])} {self._operand()}"
+        if self.random.random() < 0.3:
+            condition += f" {self.random.choice(['&&', '||'])} {self._operand()} < {self._operand()}"
+        return condition
+
+    def _comment(self, indent):
+        choice = self.random.random()
+        if choice < 0.5:
+            return f"{indent}// calcula el valor {self.random.randint(0, 100)}\n"
+        if choice < 0.8:
+            return f"{indent}/* bloque\n{indent}   de varias lineas {self.random.randint(0, 100)} */\n"
+        # Looks nested, but the first */ closes it
+        return f"{indent}/* externo /* interno {self.random.randint(0, 100)} */\n"
+
+    def _statement(self, depth):
+        indent = "    " * depth
+        choice = self.random.random()
+        if choice < 0.15 or not self.variables:
+            names = [self._name() for _ in range(self.random.randint(1, 4))]
+            self.variables.extend(names)
+            del self.variables[:-200]  # Keep the pool of live names small
+            return f"{indent}{self.random.choice(['int', 'float'])} {', '.join(names)};\n"
+        if choice < 0.45:
+            return f"{indent}{self.random.choice(self.variables)} = {self._expression()};\n"
+        if choice < 0.5:
+            return f"{indent}{self.random.choice(self.variables)}{self.random.choice(['++', '--'])};\n"
+        if choice < 0.55:
+            return f"{indent}cin {self.random.choice(self.variables)};\n"
+        if choice < 0.6:
+            return f"{indent}cout {self._expression()};\n"
+        if choice < 0.7:
+            return self._comment(indent)
+        if depth >= 4:
+            return f"{indent}{self.random.choice(self.variables)} = {self._expression()};\n"
+        return self._block(depth)
+
+    def _body(self, depth):
+        return "".join(self._statement(depth + 1) for _ in range(self.random.randint(1, 5)))
+
+    def _block(self, depth):
+        indent = "    " * depth
+        choice = self.random.random()
+        if choice < 0.3:
+            text = f"{indent}if ({self._condition()})\n{self._body(depth)}"
+            if self.random.random() < 0.5:
+                text += f"{indent}else\n{self._body(depth)}"
+            return text + f"{indent}end\n"
+        if choice < 0.5:
+            return f"{indent}while ({self._condition()}) {{\n{self._body(depth)}{indent}}}\n"
+        if choice < 0.65:
+            return f"{indent}do {{\n{self._body(depth)}{indent}}} while ({self._condition()});\n"
+        if choice < 0.75:
+            cases = "".join(
+                f"{indent}    case {value} {{\n{self._body(depth + 1)}{indent}    }}\n"
+                for value in range(self.random.randint(1, 3))
+            )
+            return f"{indent}switch ({self._operand()}) {{\n{cases}{indent}}}\n"
+        return self._body(depth - 1)
+
+
+def generate_program(size, seed=0):
+    """Return a synthetic program of at least size characters"""
+    return ProgramGenerator(seed).generate(size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.corpus", description="Genera programas sintéticos")
+    parser.add_argument("size", type=parse_size, help="tamaño mínimo, p. ej. 1K, 10M")
+    parser.add_argument("-o", "--output", required=True, help="archivo de salida")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(generate_program(args.size, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Content-addressed on-disk cache for compiler artifacts.
+
+Entries are keyed by a hash of the program text (content_hash), of the
+compiler's own source and of the interpreter's bytecode version, so editing
+the lexer or any later phase invalidates what it produced, and code objects
+marshalled by one Python release are never loaded by another. Token streams
+are stored as typed arrays whose values are sliced back out of the text on
+load; other artifacts are pickled.
+
+Each entry is one file under <directory>/<2 hex digits>/, written to a
+temporary name and renamed into place, so concurrent writers (the IDE, CLI
+worker processes) never see half-written entries. A hit touches the file's
+modification time, which makes mtime the LRU order used when the total size
+goes over max_bytes.
+"""
+import hashlib
+import importlib.util
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from array import array
+
+from .token_buffer import ITEM_ARRAYS, TokenBuffer
+
+DEFAULT_MAX_BYTES = 256 << 20
+# Eviction stops once the cache is back under this fraction of max_bytes
+EVICT_TO = 0.8
+
+# Modules whose source decides what the cached artifacts contain
+VERSIONED_MODULES = (
+    'cache', 'lexer', 'line_index', 'token_buffer', 'parallel_lexer', 'parser', 'symbol_table', 'semantic', 'intermediate',
+    'optimizer', 'vm', 'pycodegen',
+)
+
+# Token stream layout (little endian):
+#   header   magic "LEXC", version, reserved, item count, text length, messages size
+#   arrays   the TokenBuffer arrays: types (B, 0 for errors), starts (Q),
+#            lengths (I), lines (I), columns (I)
+#   messages pickled list with the message of each error, in order
+MAGIC = b'LEXC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHQQQ')
+
+_compiler_version = None
+
+
+def compiler_version():
+    """Hash of the compiler modules' source and of the interpreter that runs
+    them, computed once per process"""
+    global _compiler_version
+    if _compiler_version is None:
+        digest = hashlib.sha256(f"formato {FORMAT_VERSION}".encode())
+        # Marshal and pickle data of code objects only load in the same release
+        digest.update(f"{sys.implementation.cache_tag}\0{sys.version_info[:3]}\0".encode())
+        digest.update(importlib.util.MAGIC_NUMBER)
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in VERSIONED_MODULES:
+            try:
+                with open(os.path.join(directory, name + ".py"), "rb") as f:
+                    digest.update(f.read())
+            except OSError:
+                digest.update(name.encode())
+        _compiler_version = digest.hexdigest()
+    return _compiler_version
+
+
+def content_hash(text):
+    """Key of a program's source text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def default_directory():
+    """$COMPILADOR_CACHE_DIR, else compilador/ in the user's cache directory"""
+    directory = os.environ.get("COMPILADOR_CACHE_DIR")
+    if directory:
+        return directory
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "compilador")
+
+
+class CompileCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self._size = None   # Bytes on disk, counted on the first write
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, kind, digest):
+        key = hashlib.sha256(f"{compiler_version()}\0{kind}\0{digest}".encode()).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.{kind}")
+
+    # Raw entries
+
+    def _read(self, kind, digest):
+        """(path, data) of an entry, or (path, None) after counting a miss"""
+        path = self._path(kind, digest)
+        try:
+            with open(path, "rb") as f:
+                return path, f.read()
+        except OSError:
+            self.misses += 1
+            return path, None
+
+    def _hit(self, path):
+        """Count an entry that decoded as a hit and mark it recently used"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+
+    def _write(self, kind, digest, data):
+        path = self._path(kind, digest)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(descriptor, "wb") as f:
+                    f.write(data)
+                os.replace(temporary, path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        except OSError:
+            # A read-only or full disk only costs the speedup
+            return
+        if self._size is None:
+            self._size = self._disk_usage()
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """(mtime, size, path) of every entry"""
+        entries = []
+        try:
+            shards = os.scandir(self.directory)
+        except OSError:
+            return entries
+        with shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as files:
+                    for entry in files:
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Delete least recently used entries until under EVICT_TO of max_bytes"""
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self._size = 0
+
+    # Token streams
+
+    def get_tokens(self, digest, text):
+        """TokenBuffer stored for text (whose content_hash is digest), or None"""
+        path, data = self._read('tokens', digest)
+        if data is None:
+            return None
+        try:
+            magic, version, _, count, text_length, messages_size = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != FORMAT_VERSION or text_length != len(text):
+                self.misses += 1
+                return None
+            view = memoryview(data)
+            position = HEADER.size
+            arrays = []
+            for _, typecode in ITEM_ARRAYS:
+                values = array(typecode)
+                size = count * values.itemsize
+                values.frombytes(view[position:position + size])
+                if len(values) != count:
+                    raise ValueError("truncated token arrays")
+                position += size
+                arrays.append(values)
+            messages = pickle.loads(view[position:position + messages_size])
+        except (struct.error, ValueError, pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+        self._hit(path)
+        return TokenBuffer(arrays, messages)
+
+    def put_tokens(self, digest, text, buffer):
+        """Store the TokenBuffer of text, whose starts are offsets in text"""
+        pickled = pickle.dumps(buffer.messages, protocol=pickle.HIGHEST_PROTOCOL)
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(buffer), len(text), len(pickled))
+        self._write('tokens', digest, b"".join([header] + [values.tobytes() for values in buffer.arrays] + [pickled]))
+
+    # Other artifacts
+
+    def get(self, kind, digest, decode=None):
+        """Artifact stored by put(kind, digest, ...), or None.
+
+        decode, when given, turns the unpickled value into the artifact (e.g.
+        unmarshals code objects); if it raises, the entry is a miss too.
+        """
+        path, data = self._read(kind, digest)
+        if data is None:
+            return None
+        try:
+            artifact = pickle.loads(data)
+            if decode is not None:
+                artifact = decode(artifact)
+        except Exception:
+            # Stale or damaged entries are just misses
+            self.misses += 1
+            return None
+        self._hit(path)
+        return artifact
+
+    def put(self, kind, digest, artifact):
+        self._write(kind, digest, pickle.dumps(artifact, protocol=pickle.HIGHEST_PROTOCOL))
@@ -0,0 +1,398 @@
+"""Headless command-line entry point: python -m src.cli <command> ...
+
+Only the compiler modules are imported here, never tkinter, so it runs in CI
+machines without a display.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import CompileCache, content_hash
+from .intermediate import IntermediateGenerator
+from .lexer import Lexer
+from .optimizer import LEVELS, PassManager
+from .parallel_lexer import scan_parallel
+from .parser import Parser
+from .profiling import Profiler
+from .pycodegen import CodegenError, PythonBackend
+from .semantic import SemanticAnalyzer
+from .server import DEFAULT_WORKERS, run_server
+from .token_buffer import TokenBuffer
+from .token_file import write_token_file
+from .vm import DEFAULT_BUDGET, StreamIO, VirtualMachine, VMError, assemble
+
+# One lexer per engine and one cache per worker process, built on first use
+_lexers = {}
+_cache = None
+
+
+def _get_lexer(engine="combined"):
+    lexer = _lexers.get(engine)
+    if lexer is None:
+        lexer = _lexers[engine] = Lexer(engine)
+    return lexer
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = CompileCache()
+    return _cache
+
+
+def collect_files(inputs, pattern="*.txt"):
+    """Expand files, directories (recursively, filtered by pattern) and globs"""
+    files = []
+    seen = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            matches = sorted(glob.glob(os.path.join(entry, "**", pattern), recursive=True))
+        elif os.path.exists(entry):
+            matches = [entry]
+        else:
+            matches = sorted(glob.glob(entry, recursive=True))
+        for path in matches:
+            if os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                files.append(path)
+    return files
+
+
+def _output_path(output_dir, path, suffix):
+    """Mirror path under output_dir, replacing its extension with suffix"""
+    relative = os.path.relpath(path)
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(path)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + suffix)
+
+
+def lex_file(path, output_dir=None, show_tokens=False, output_format="text", use_cache=False, engine="combined",
+             split_workers=0):
+    """Tokenize one file; returns a result dict that is cheap to send between processes.
+
+    The combined engine lexes into a TokenBuffer and builds Token objects only
+    when they are written or printed; with use_cache, a file lexed before only
+    has its buffer loaded. The legacy engine always lexes, so that it can be
+    measured against the combined one. With split_workers, the file is cut
+    into pieces lexed on that many processes (combined engine only). 'phases'
+    holds the seconds spent in each step, as named in src.profiling.
+    """
+    result = {'path': path, 'tokens': 0, 'errors': 0, 'bytes': 0, 'chars': 0, 'bytes_written': 0, 'seconds': 0.0,
+              'failure': None, 'report': "", 'cached': False, 'phases': {}}
+    phases = result['phases']
+    start = time.perf_counter()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        result['failure'] = str(e)
+        return result
+    lexer = _get_lexer(engine)
+    result['bytes'] = len(code.encode("utf-8"))
+    result['chars'] = len(code)
+    mark = time.perf_counter()
+    phases['read'] = mark - start
+
+    buffer = None
+    # The cached buffers come from the combined engine
+    use_cache = use_cache and engine != "legacy"
+    if use_cache:
+        digest = content_hash(code)
+        buffer = _get_cache().get_tokens(digest, code)
+        result['cached'] = buffer is not None
+    # Phase charged for building Token objects from the buffer
+    load_phase = 'cache'
+    if buffer is None and engine != "legacy":
+        buffer = scan_parallel(code, split_workers) if split_workers else TokenBuffer.from_source(code)
+        mark = _lap(phases, 'scan', mark)
+        load_phase = 'scan'
+        if use_cache:
+            _get_cache().put_tokens(digest, code, buffer)
+            mark = _lap(phases, 'cache', mark)
+    if buffer is not None:
+        result['tokens'] = buffer.token_count
+        result['errors'] = buffer.error_count
+        if not (output_dir or show_tokens):
+            errors = buffer.errors(code)
+            mark = _lap(phases, load_phase, mark)
+            result['report'] = "\n".join(str(error) for error in errors)
+            _lap(phases, 'report_text', mark)
+            result['seconds'] = time.perf_counter() - start
+            return result
+        tokens, errors = buffer.split(code)
+        mark = _lap(phases, load_phase, mark)
+    else:
+        # The legacy engine records no offsets, so its tokens are not cached
+        matches = lexer._find_block_comments(code)
+        mark = _lap(phases, 'comment_prescan', mark)
+        tokens, errors = lexer._tokenize_legacy(code, matches)
+        mark = _lap(phases, 'process_text', mark)
+        result['tokens'] = len(tokens)
+        result['errors'] = len(errors)
+
+    if output_dir:
+        suffix = ".tokens.bin" if output_format == "binary" else ".tokens.txt"
+        tokens_path = _output_path(output_dir, path, suffix)
+        errors_path = _output_path(output_dir, path, ".errors.txt")
+        os.makedirs(os.path.dirname(tokens_path) or ".", exist_ok=True)
+        if output_format == "binary":
+            write_token_file(tokens, tokens_path)
+        else:
+            lexer.save_tokens_to_file(tokens, tokens_path)
+        with open(errors_path, "w", encoding="utf-8") as f:
+            f.write("".join(str(error) + "\n" for error in errors))
+        result['bytes_written'] = os.path.getsize(tokens_path) + os.path.getsize(errors_path)
+        _lap(phases, 'save', mark)
+    else:
+        lines = [str(token) for token in tokens] if show_tokens else []
+        lines.extend(str(error) for error in errors)
+        result['report'] = "\n".join(lines)
+        _lap(phases, 'report_text', mark)
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def _lap(phases, name, since):
+    """Add the time since since to a phase; returns the current time"""
+    now = time.perf_counter()
+    phases[name] = phases.get(name, 0.0) + now - since
+    return now
+
+
+def _lex_file_star(args):
+    return lex_file(*args)
+
+
+def run_lex(args):
+    """Tokenize many files across a process pool and print a summary"""
+    files = collect_files(args.inputs, args.pattern)
+    if not files:
+        print("No se encontraron archivos de entrada", file=sys.stderr)
+        return 2
+
+    if args.split and args.engine != "combined":
+        print("--split solo está disponible con el motor combined", file=sys.stderr)
+        return 2
+
+    split_workers = args.workers if args.split else 0
+    jobs = [(path, args.output_dir, args.tokens, args.format, not args.no_cache, args.engine, split_workers)
+            for path in files]
+    start = time.perf_counter()
+    totals = {'files': 0, 'tokens': 0, 'errors': 0, 'bytes': 0, 'failures': 0, 'cached': 0}
+    profiler = Profiler()
+    if args.capture:
+        # Only this process is profiled: use -j 1 to see inside the lexer
+        profiler.start_capture()
+
+    if args.workers == 1 or args.split:
+        # With --split the workers lex the pieces of one file at a time
+        results = map(_lex_file_star, jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=args.workers)
+        results = executor.map(_lex_file_star, jobs, chunksize=args.chunk_size)
+
+    try:
+        with profiler.capture():
+            for result in results:
+                totals['files'] += 1
+                if result['failure']:
+                    totals['failures'] += 1
+                    print(f"== {result['path']}: no se pudo leer: {result['failure']}", flush=True)
+                    continue
+                totals['tokens'] += result['tokens']
+                totals['errors'] += result['errors']
+                totals['bytes'] += result['bytes']
+                totals['cached'] += result['cached']
+                for name, seconds in result['phases'].items():
+                    profiler.add_time(name, seconds)
+                profiler.count('chars', result['chars'])
+                profiler.count('bytes_written', result['bytes_written'])
+                print(f"== {result['path']}: {result['tokens']} tokens, {result['errors']} errores", flush=True)
+                if result['report']:
+                    print(result['report'], flush=True)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    per_second = 1 / elapsed if elapsed > 0 else 0.0
+    print(
+        f"{totals['files']} archivos ({totals['cached']} desde la caché), {totals['tokens']} tokens, "
+        f"{totals['errors']} errores léxicos, {totals['failures']} fallos en {elapsed:.2f} s "
+        f"({totals['bytes'] * per_second / 1e6:.2f} MB/s, {totals['tokens'] * per_second:.0f} tokens/s)",
+        file=sys.stderr
+    )
+    if args.profile:
+        if args.capture:
+            profiler.stop_capture()
+        profiler.count('files', totals['files'])
+        profiler.count('cached_files', totals['cached'])
+        profiler.count('tokens', totals['tokens'])
+        profiler.count('errors', totals['errors'])
+        profiler.count('bytes_read', totals['bytes'])
+        report = profiler.report()
+        report.update({'command': "lex", 'engine': args.engine, 'workers': args.workers, 'elapsed_seconds': elapsed})
+        with open(args.profile, "w", encoding="utf-8") as f:
+            f.write(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+    return 1 if totals['errors'] or totals['failures'] else 0
+
+
+def check_program(code):
+    """Run the front end; returns (tree, errors) with every lexical,
+    syntactic and semantic error found"""
+    tokens, lexical_errors = _get_lexer().tokenize(code)
+    tree, syntax_errors = Parser().parse(tokens)
+    _, semantic_errors = SemanticAnalyzer().analyze(tree)
+    return tree, lexical_errors + syntax_errors + semantic_errors
+
+
+def compile_program(code, level=max(LEVELS)):
+    """Intermediate code for a program, optimized at level.
+
+    Returns (intermediate, errors); intermediate is None when the program has
+    errors, which are listed in errors.
+    """
+    tree, errors = check_program(code)
+    if errors:
+        return None, errors
+    intermediate = IntermediateGenerator().generate(tree)
+    PassManager(level).run(intermediate)
+    return intermediate, []
+
+
+def _compile_python(code, cache=None):
+    """(CompiledProgram or None, errors); None without errors means the
+    Python backend could not take the program"""
+    backend = PythonBackend(cache)
+    digest = content_hash(code) if cache is not None else None
+    program = backend.lookup(digest) if cache is not None else None
+    if program is not None:
+        return program, []
+    tree, errors = check_program(code)
+    if errors:
+        return None, errors
+    try:
+        return backend.compile(tree, digest), []
+    except CodegenError as e:
+        print(f"{e}; se usa la máquina virtual", file=sys.stderr)
+        return None, []
+
+
+def _compile_bytecode(code, level, cache=None):
+    """(Bytecode or None, errors) for the virtual machine"""
+    kind = f"bytecode-O{level}"
+    digest = content_hash(code) if cache is not None else None
+    if cache is not None:
+        bytecode = cache.get(kind, digest)
+        if bytecode is not None:
+            return bytecode, []
+    intermediate, errors = compile_program(code, level)
+    if errors:
+        return None, errors
+    bytecode = assemble(intermediate)
+    if cache is not None:
+        cache.put(kind, digest, bytecode)
+    return bytecode, []
+
+
+def run_program(args):
+    """Compile a program and run it with the chosen backend; cin reads stdin"""
+    try:
+        with open(args.program, "r", encoding="utf-8") as f:
+            code = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"No se pudo leer {args.program}: {e}", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    cache = None if args.no_cache else _get_cache()
+    program, errors = None, []
+    if args.backend == "python":
+        program, errors = _compile_python(code, cache)
+    if program is None and not errors:
+        bytecode, errors = _compile_bytecode(code, args.optimize, cache)
+    if errors:
+        for error in errors:
+            print(error, file=sys.stderr)
+        return 1
+    if program is not None:
+        size = f"{len(program.source)} bytes de Python"
+        unit = "iteraciones de ciclo"
+    else:
+        size = f"{len(bytecode)} instrucciones"
+        unit = "instrucciones ejecutadas"
+    compiled = time.perf_counter() - start
+
+    budget = args.budget or None
+    try:
+        if program is not None:
+            execution = program.run(StreamIO(), budget)
+        else:
+            execution = VirtualMachine(StreamIO(), budget=budget).run(bytecode)
+    except VMError as e:
+        # Keep the program's output ahead of the error
+        sys.stdout.flush()
+        print(e, file=sys.stderr)
+        return 1
+    if args.stats:
+        executed = f", {execution.executed} {unit}" if execution.executed is not None else ""
+        print(
+            f"compilación {compiled:.3f} s, {size}; ejecución {execution.seconds:.3f} s{executed}",
+            file=sys.stderr
+        )
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Compilador sin interfaz gráfica")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    lex = commands.add_parser("lex", help="análisis léxico de archivos, directorios o globs")
+    lex.add_argument("inputs", nargs="+", help="archivos, directorios o patrones glob")
+    lex.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="procesos en paralelo (1 = sin pool)")
+    lex.add_argument("--chunk-size", type=int, default=8, help="archivos enviados a cada proceso por tanda")
+    lex.add_argument("-o", "--output-dir", help="escribir <archivo>.tokens.txt y <archivo>.errors.txt en este directorio")
+    lex.add_argument("--format", choices=("text", "binary"), default="text", help="formato de los tokens escritos con --output-dir")
+    lex.add_argument("--pattern", default="*.txt", help="archivos a incluir al recorrer directorios (por defecto *.txt)")
+    lex.add_argument("--tokens", action="store_true", help="imprimir también los tokens en la salida estándar")
+    lex.add_argument("--no-cache", action="store_true", help="no leer ni guardar tokens en la caché de compilación")
+    lex.add_argument("--split", action="store_true",
+                     help="repartir cada archivo entre los procesos de -j (para archivos muy grandes)")
+    lex.add_argument("--engine", choices=Lexer.ENGINES, default="combined", help="motor del analizador léxico")
+    lex.add_argument("--profile", metavar="ARCHIVO", help="guardar tiempos por fase y contadores en este archivo JSON")
+    lex.add_argument("--capture", action="store_true", help="incluir cProfile y tracemalloc en --profile (con -j 1 para perfilar el analizador)")
+    lex.set_defaults(handler=run_lex)
+
+    run = commands.add_parser("run", help="compilar y ejecutar un programa; cin lee de la entrada estándar")
+    run.add_argument("program", help="archivo del programa")
+    run.add_argument("-O", "--optimize", type=int, choices=sorted(LEVELS), default=max(LEVELS), help="nivel de optimización")
+    run.add_argument("--backend", choices=("vm", "python"), default="vm", help="máquina virtual o código Python compilado")
+    run.add_argument("--budget", type=int, default=DEFAULT_BUDGET,
+                     help="máximo de instrucciones (iteraciones de ciclo con --backend python) a ejecutar; 0 = sin límite")
+    run.add_argument("--stats", action="store_true", help="imprimir tiempos e instrucciones ejecutadas en stderr")
+    run.add_argument("--no-cache", action="store_true", help="no usar la caché de compilación")
+    run.set_defaults(handler=run_program)
+
+    serve = commands.add_parser("serve", help="servidor de análisis JSON-RPC (estilo LSP) por stdio")
+    serve.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="hilos de análisis")
+    serve.add_argument("--no-cache", action="store_true", help="no usar la caché de compilación")
+    serve.set_defaults(handler=lambda args: run_server(args.workers, not args.no_cache))
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "workers", 1) < 1 or getattr(args, "chunk_size", 1) < 1:
+        print("--workers y --chunk-size deben ser mayores que cero", file=sys.stderr)
+        return 2
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
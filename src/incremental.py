@@ -0,0 +1,463 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from .cache import content_hash
+from .lexer import Token
+from .token_buffer import ERROR_TYPE, TokenBuffer
+
+
+# Smaller texts lex faster than a cache round trip
+CACHE_MIN_CHARS = 4096
+# Items per piece of a TokenStream; an edit copies only the pieces it touches
+PIECE_SIZE = 1024
+
+
+class TokenStream:
+    """The tokens and lexical errors of one text, as read-only pieces.
+
+    Each piece is a TokenBuffer whose starts, lines and first-line columns are
+    off by the piece's offset, line_offset and column_offset, so an edit moves
+    every piece after it by changing three numbers instead of each item.
+    Nothing in a stream changes once it is built, and items are built with
+    their positions in text when read, so a stream can be handed to another
+    thread while the lexer goes on with the next text.
+    """
+
+    def __init__(self, text, pieces=(), offsets=(), line_offsets=(), column_offsets=()):
+        self.text = text
+        self.pieces = pieces
+        self.offsets = offsets
+        self.line_offsets = line_offsets
+        self.column_offsets = column_offsets    # Added to the columns on each piece's first line
+        self.ends = tuple(accumulate(len(piece) for piece in pieces))
+        self.token_ends = tuple(accumulate(piece.token_count for piece in pieces))
+        self.error_ends = tuple(accumulate(piece.error_count for piece in pieces))
+        self._firsts = tuple(piece.starts[0] + offset for piece, offset in zip(pieces, offsets))
+        for piece in pieces:
+            # Fill the lazy index now, so readers on other threads never write
+            piece.error_indexes()
+        self.tokens = ItemView(self, errors=False)
+        self.errors = ItemView(self, errors=True)
+
+    @classmethod
+    def from_buffer(cls, text, buffer):
+        """Stream of a TokenBuffer whose starts are offsets in text"""
+        pieces = tuple(buffer.slice(start, start + PIECE_SIZE) for start in range(0, len(buffer), PIECE_SIZE))
+        zeros = (0,) * len(pieces)
+        return cls(text, pieces, zeros, zeros, zeros)
+
+    def __len__(self):
+        return self.ends[-1] if self.ends else 0
+
+    def __iter__(self):
+        for index, piece in enumerate(self.pieces):
+            yield from piece.items(self.text, *self.placement(index))
+
+    def placement(self, index):
+        """(offset, line_offset, column_offset) of a piece"""
+        return self.offsets[index], self.line_offsets[index], self.column_offsets[index]
+
+    def piece_of(self, index):
+        """(piece, index inside it) of an item"""
+        piece = bisect_right(self.ends, index)
+        return piece, index - (self.ends[piece - 1] if piece else 0)
+
+    def locate(self, offset, after=False):
+        """Index of the first item starting at offset or later (after it, if after)"""
+        piece = bisect_right(self._firsts, offset) - 1
+        if piece < 0:
+            return 0
+        search = bisect_right if after else bisect_left
+        local = search(self.pieces[piece].starts, offset - self.offsets[piece])
+        return (self.ends[piece - 1] if piece else 0) + local
+
+    def item(self, index):
+        """Token or LexicalError at index"""
+        piece, local = self.piece_of(index)
+        return self.pieces[piece].item(local, self.text, *self.placement(piece))
+
+    def items(self, start=0, stop=None):
+        """List of the items [start, stop)"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        items = []
+        while start < stop:
+            piece, local = self.piece_of(start)
+            count = min(len(self.pieces[piece]) - local, stop - start)
+            items += self.pieces[piece].items(self.text, *self.placement(piece), local, local + count)
+            start += count
+        return items
+
+    def start(self, index):
+        """Offset in text where an item starts"""
+        piece, local = self.piece_of(index)
+        return self.pieces[piece].starts[local] + self.offsets[piece]
+
+    def same(self, index, offset, token_type, value, message):
+        """Check whether the item at index is this token or error at offset"""
+        piece, local = self.piece_of(index)
+        buffer = self.pieces[piece]
+        return (buffer.starts[local] + self.offsets[piece] == offset and buffer.types[local] == token_type
+                and buffer.lengths[local] == len(value) and self.text.startswith(value, offset)
+                and (token_type != ERROR_TYPE or buffer.message(local) == message))
+
+
+class ItemView:
+    """Read-only sequence of the tokens, or of the lexical errors, of a
+    TokenStream; items are built when indexed or iterated"""
+
+    def __init__(self, stream, errors):
+        self._stream = stream
+        self._errors = errors
+        self._ends = stream.error_ends if errors else stream.token_ends
+
+    def __len__(self):
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        piece = bisect_right(self._ends, index)
+        number = index - (self._ends[piece - 1] if piece else 0)
+        buffer = self._stream.pieces[piece]
+        local = buffer.error_indexes()[number] if self._errors else buffer.token_index(number)
+        return buffer.item(local, self._stream.text, *self._stream.placement(piece))
+
+    def __iter__(self):
+        stream = self._stream
+        for piece, buffer in enumerate(stream.pieces):
+            if self._errors:
+                yield from buffer.errors(stream.text, *stream.placement(piece))
+            else:
+                for item in buffer.items(stream.text, *stream.placement(piece)):
+                    if isinstance(item, Token):
+                        yield item
+
+
+def _copy(target, piece, start, stop, offset, line_offset, column_offset):
+    """Add the items [start, stop) of a piece placed at (offset, line_offset,
+    column_offset) to target, with their positions in the text"""
+    if start >= stop:
+        return
+    mark = len(target)
+    target.extend(piece if stop - start == len(piece) else piece.slice(start, stop), offset, line_offset)
+    if column_offset and piece.lines[start] == piece.lines[0]:
+        _shift_columns(target, mark, column_offset)
+
+
+def _shift_columns(buffer, index, delta):
+    """Add delta to the columns of the items from index on that share its line"""
+    lines, columns = buffer.lines, buffer.columns
+    line = lines[index]
+    while index < len(lines) and lines[index] == line:
+        columns[index] += delta
+        index += 1
+
+
+class IncrementalLexer:
+    """Keep the token stream of a document and re-lex only the edited region.
+
+    The stream is a TokenStream of pieces of about PIECE_SIZE items. After an
+    edit the lexer restarts at a token boundary before the change and scans
+    forward until the new items line up with the old ones again. Only the
+    pieces holding the replaced items are rebuilt; the pieces after them are
+    shared with the previous stream and just placed further along.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache  # CompileCache for whole-text lexes, or None
+        self.stream = TokenStream("")
+        # Offsets (in the current text) and item indexes touched by the last update
+        self.changed_range = (0, 0)
+        self.changed_items = (0, 0)
+        # Union of the ranges changed since clear_dirty(), in current offsets
+        self.dirty_range = None
+        # What changed for highlighting since clear_dirty(), when it was a
+        # single update: (removed, added), see _token_diff; None otherwise
+        self.token_diff = None
+
+    @property
+    def text(self):
+        return self.stream.text
+
+    def clear_dirty(self):
+        """Forget the ranges changed so far (e.g. once they have been highlighted)"""
+        self.dirty_range = None
+
+    def reset(self, text, cancelled=None):
+        """Lex the whole text from scratch, or load it from the cache;
+        returns False if cancelled"""
+        cache = self.cache if len(text) >= CACHE_MIN_CHARS else None
+        buffer = None
+        if cache is not None:
+            digest = content_hash(text)
+            buffer = cache.get_tokens(digest, text)
+        if buffer is None:
+            buffer = TokenBuffer()
+            if not buffer.scan(text, cancelled=cancelled):
+                return False
+            if cache is not None:
+                cache.put_tokens(digest, text, buffer)
+        self.stream = TokenStream.from_buffer(text, buffer)
+        self.changed_range = self.dirty_range = (0, len(text))
+        self.changed_items = (0, len(buffer))
+        self.token_diff = None
+        return True
+
+    def update(self, text, prefix=None, suffix=None, cancelled=None):
+        """Bring the token stream up to date with text.
+
+        prefix and suffix are the number of characters known to be unchanged at
+        the start and end of the document (e.g. from the editor's modification
+        range). When omitted they are found by comparing with the previous text.
+        cancelled is polled while scanning; if it returns True the update stops
+        and returns False, leaving the previous stream untouched.
+        """
+        stream = self.stream
+        old = stream.text
+        if not old or not len(stream):
+            return self.reset(text, cancelled)
+
+        if prefix is None or suffix is None:
+            prefix, suffix = self._common_affixes(old, text)
+        limit = min(len(old), len(text))
+        prefix = max(0, min(prefix, limit))
+        suffix = max(0, min(suffix, limit - prefix))
+        if not prefix and not suffix:
+            # Nothing in common (e.g. another file was opened)
+            return self.reset(text, cancelled)
+        old_end = len(old) - suffix
+        new_end = len(text) - suffix
+        delta = len(text) - len(old)
+
+        # Restart one item before the one touching the edit: a token can depend
+        # on a couple of characters past its end (e.g. "3" followed by ".5").
+        first = stream.locate(prefix) - 2
+
+        # An edit that forms "*/" closes the first unclosed "/*" before it, which
+        # until now was lexed as operators (or inside a line comment).
+        if '*/' in text[max(prefix - 1, 0):new_end + 1]:
+            closer = old.rfind('*/', 0, prefix)
+            opener = old.find('/*', max(closer - 1, 0), prefix + 1)
+            if opener >= 0:
+                first = min(first, stream.locate(opener, after=True) - 2)
+
+        if first < 0:
+            # Nothing safe to keep before the edit: start over from the top
+            first = 0
+            start, line, line_start = 0, 1, 0
+        else:
+            restart = stream.item(first)
+            start = restart.offset
+            line = restart.line
+            line_start = start - restart.column + 1
+
+        synced = []
+
+        def stop(token_type, item_start, item_end, item_line, item_column, message):
+            # Past the edit the scanner only depends on the text that follows,
+            # so meeting an identical old item at the same place means the rest
+            # of the old stream is still valid.
+            old_start = item_start - delta
+            index = stream.locate(old_start)
+            if index < len(stream) and stream.same(index, old_start, token_type, text[item_start:item_end], message):
+                synced.append((index, item_line, item_column))
+                return True
+            return False
+
+        scanned = TokenBuffer()
+        if not scanned.scan(text, start, line, line_start, stop_from=new_end, stop=stop, cancelled=cancelled):
+            return False
+
+        line_delta = column_delta = 0
+        if synced:
+            sync, sync_line, sync_column = synced[0]
+            following = stream.item(sync)
+            sync_old_line = following.line
+            line_delta = sync_line - following.line
+            column_delta = sync_column - following.column
+            following.offset += delta
+            following.line, following.column = sync_line, sync_column
+        else:
+            sync, following, sync_old_line = len(stream), None, None
+
+        if self.dirty_range is None:
+            self.token_diff = self._token_diff(
+                stream.items(first, sync), scanned.items(text), following, old, text, (start, line, line_start),
+                prefix, old_end, new_end
+            )
+        else:
+            self.token_diff = None
+        self.stream = self._splice(text, first, sync, scanned, delta, line_delta, column_delta, sync_old_line)
+
+        stop_index = first + len(scanned)
+        end = self.stream.start(stop_index) if stop_index < len(self.stream) else len(text)
+        self.changed_range = (start, end)
+        self.changed_items = (first, stop_index)
+
+        if self.dirty_range is None:
+            self.dirty_range = self.changed_range
+        else:
+            # Carry the earlier dirty range over the edit, then add this one
+            low, high = self.dirty_range
+            low = low if low <= prefix else (low + delta if low >= old_end else prefix)
+            high = high if high <= prefix else (high + delta if high >= old_end else new_end)
+            self.dirty_range = (min(low, start), max(high, end))
+        return True
+
+    def _splice(self, text, first, sync, scanned, delta, line_delta, column_delta, sync_line):
+        """New stream for text, with scanned in place of the items [first, sync).
+
+        The old items from sync on move by delta characters and line_delta
+        lines, and the ones on sync_line (their old line) by column_delta
+        columns as well.
+        """
+        stream = self.stream
+        pieces = stream.pieces
+        offsets = list(stream.offsets)
+        line_offsets = list(stream.line_offsets)
+        column_offsets = list(stream.column_offsets)
+        first_piece, head = stream.piece_of(first)
+        if sync < len(stream):
+            last_piece, tail = stream.piece_of(sync)
+        else:
+            last_piece, tail = len(pieces) - 1, len(pieces[-1])
+        tail_placement = (offsets[last_piece] + delta, line_offsets[last_piece] + line_delta,
+                          column_offsets[last_piece])
+
+        # Move the pieces after the edit; the ones that start on the synced
+        # line also get its change of column
+        for index in range(last_piece + 1, len(pieces)):
+            if column_delta and pieces[index].lines[0] + line_offsets[index] == sync_line:
+                column_offsets[index] += column_delta
+            offsets[index] += delta
+            line_offsets[index] += line_delta
+
+        # Rebuild the touched pieces, with a neighbour when they would be small
+        low, high = first_piece, last_piece + 1
+        if head + len(scanned) + len(pieces[last_piece]) - tail < PIECE_SIZE // 2:
+            if high < len(pieces):
+                high += 1
+            elif low > 0:
+                low -= 1
+        rebuilt = TokenBuffer()
+        for index in range(low, first_piece):
+            _copy(rebuilt, pieces[index], 0, len(pieces[index]), offsets[index], line_offsets[index],
+                  column_offsets[index])
+        _copy(rebuilt, pieces[first_piece], 0, head, offsets[first_piece], line_offsets[first_piece],
+              column_offsets[first_piece])
+        rebuilt.extend(scanned)
+        if tail < len(pieces[last_piece]):
+            mark = len(rebuilt)
+            _copy(rebuilt, pieces[last_piece], tail, len(pieces[last_piece]), *tail_placement)
+            if column_delta:
+                _shift_columns(rebuilt, mark, column_delta)
+        for index in range(last_piece + 1, high):
+            _copy(rebuilt, pieces[index], 0, len(pieces[index]), offsets[index], line_offsets[index],
+                  column_offsets[index])
+
+        count = round(len(rebuilt) / PIECE_SIZE)
+        if count > 1:
+            size = -(-len(rebuilt) // count)
+            middle = tuple(rebuilt.slice(start, start + size) for start in range(0, len(rebuilt), size))
+        else:
+            middle = (rebuilt,) if len(rebuilt) else ()
+        zeros = (0,) * len(middle)
+        return TokenStream(
+            text,
+            pieces[:low] + middle + pieces[high:],
+            tuple(offsets[:low]) + zeros + tuple(offsets[high:]),
+            tuple(line_offsets[:low]) + zeros + tuple(line_offsets[high:]),
+            tuple(column_offsets[:low]) + zeros + tuple(column_offsets[high:]),
+        )
+
+    @staticmethod
+    def _token_diff(old_items, new_items, following, old, text, anchor, prefix, old_end, new_end):
+        """Tokens whose highlighting changed between a replaced run of items
+        and the items lexed in its place.
+
+        Returns (removed, added): removed holds (type, line, column, length)
+        spans, in the new text, that lose the tag of that token type, and
+        added the new Tokens to tag. Old tokens that come back unchanged at
+        the same place are in neither; their text, and its tag, only moved.
+        following is the item after the run, already moved to the new text,
+        and anchor is (offset, line, line start) of the first item, which lies
+        before the edit in both texts.
+        """
+        def position(source, offset):
+            start, line, line_start = anchor
+            newlines = source.count('\n', start, offset)
+            if newlines:
+                line += newlines
+                line_start = source.rfind('\n', start, offset) + 1
+            return line, offset - line_start + 1
+
+        delta = new_end - old_end
+        prefix_position = position(text, prefix)
+        old_end_line, old_end_column = position(old, old_end)
+        new_end_line, new_end_column = position(text, new_end)
+        line_delta = new_end_line - old_end_line
+        column_delta = new_end_column - old_end_column
+
+        kept = {}       # (offset, type, value) in the new text -> removal span
+        removed = []
+        before = after = None   # Tokens right before and after the edit
+        for item in old_items:
+            if not isinstance(item, Token):
+                continue
+            start = item.offset
+            end = start + len(item.value)
+            if end <= prefix:
+                kept[(start, item.type, item.value)] = (item.type, item.line, item.column, end - start)
+                if end == prefix:
+                    before = item
+            elif start >= old_end:
+                column = item.column + column_delta if item.line == old_end_line else item.column
+                kept[(start + delta, item.type, item.value)] = (item.type, item.line + line_delta, column, end - start)
+                if start == old_end:
+                    after = item
+            else:
+                # Touched by the edit: whatever is left of it loses its tag
+                line, column = (item.line, item.column) if start < prefix else prefix_position
+                span_end = end + delta if end > old_end else new_end
+                removed.append((item.type, line, column, span_end - min(start, prefix)))
+
+        added = []
+        for item in new_items:
+            if isinstance(item, Token):
+                if kept.pop((item.offset, item.type, item.value), None) is None:
+                    added.append(item)
+        removed.extend(kept.values())
+
+        # Tk gives inserted text the tags found on both sides of it
+        if after is None and isinstance(following, Token) and following.offset == new_end:
+            after = following
+        if new_end > prefix and before is not None and after is not None and before.type == after.type:
+            removed.append((before.type, *prefix_position, new_end - prefix))
+        return removed, added
+
+    @staticmethod
+    def _common_affixes(old, new):
+        """Return the length of the common prefix and suffix of two strings"""
+        limit = min(len(old), len(new))
+        # Binary search with slice comparisons so the work stays in C
+        low, high = 0, limit
+        while low < high:
+            mid = (low + high + 1) // 2
+            if old[:mid] == new[:mid]:
+                low = mid
+            else:
+                high = mid - 1
+        prefix = low
+
+        low, high = 0, limit - prefix
+        while low < high:
+            mid = (low + high + 1) // 2
+            if old[len(old) - mid:] == new[len(new) - mid:]:
+                low = mid
+            else:
+                high = mid - 1
+        return prefix, low
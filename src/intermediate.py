@@ -0,0 +1,511 @@
+"""Three-address code as quadruples (op, arg1, arg2, result).
+
+Quadruples live in four parallel typed arrays instead of one object each.
+Operands are ints tagged with their kind in the low three bits:
+
+    variable   slot of the declaration (Symbol.location)
+    temporary  t1, t2, ... numbered as they are allocated
+    constant   index into IntermediateCode.constants
+    label      index into IntermediateCode.label_positions
+
+and 0 means "no operand". Allocating a temporary or a label only bumps a
+counter, so generation does no per-instruction allocation beyond the array
+slots themselves.
+"""
+from array import array
+
+from .parser import (
+    Assignment, BinaryOp, Declaration, DoWhile, If, Input, Literal, Name, Output, Switch, UnaryOp, Update, While,
+)
+from .symbol_table import SymbolTable
+
+# Operand kinds
+NONE, VARIABLE, TEMPORARY, CONSTANT, LABEL = range(5)
+KIND_BITS = 3
+KIND_MASK = (1 << KIND_BITS) - 1
+
+# Opcodes; NOP marks instructions deleted by the optimizer
+NOP = 0
+(ASSIGN, ADD, SUB, MUL, DIV, MOD, POW, NEG, ITOF,
+ LT, LE, GT, GE, EQ, NE,
+ GOTO, IF_FALSE, IF_TRUE, LABEL_HERE, READ_INT, READ_FLOAT, WRITE, HALT) = range(1, 24)
+
+OPCODE_NAMES = {
+    NOP: 'nop', ASSIGN: '=', ADD: '+', SUB: '-', MUL: '*', DIV: '/', MOD: '%', POW: '^', NEG: 'neg', ITOF: 'itof',
+    LT: '<', LE: '<=', GT: '>', GE: '>=', EQ: '==', NE: '!=',
+    GOTO: 'goto', IF_FALSE: 'if_false', IF_TRUE: 'if_true', LABEL_HERE: 'label',
+    READ_INT: 'read_int', READ_FLOAT: 'read_float', WRITE: 'write', HALT: 'halt',
+}
+BINARY_OPCODES = {
+    '+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD, '^': POW,
+    '<': LT, '<=': LE, '>': GT, '>=': GE, '==': EQ, '!=': NE,
+}
+RELATIONAL_OPCODES = {LT, LE, GT, GE, EQ, NE}
+JUMP_OPCODES = {GOTO, IF_FALSE, IF_TRUE}
+# Largest int a power may produce, in bits; larger ones would take unbounded
+# time and memory, whatever the instruction budget
+MAX_POWER_BITS = 1 << 20
+
+
+def int_div(a, b):
+    """Integer division truncating toward zero, as in C"""
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+def int_mod(a, b):
+    """Remainder with the sign of the dividend, as in C"""
+    return a - b * int_div(a, b)
+
+
+class PowerError(ArithmeticError):
+    """A power without a value in the language: complex, or too large to compute"""
+
+
+def power(a, b):
+    """a ^ b with the semantics of the language.
+
+    int ^ int is an int: a negative exponent gives 1 / a ^ -b truncated
+    toward zero, like int_div. Raises PowerError when the result would be
+    complex or an int of more than MAX_POWER_BITS bits, ZeroDivisionError for
+    0 ^ negative and OverflowError when a float overflows.
+    """
+    if isinstance(a, int) and isinstance(b, int):
+        if b < 0:
+            if a == 0:
+                raise ZeroDivisionError("0 ^ negativo")
+            if a == 1 or a == -1:
+                return a if b % 2 else 1
+            return 0
+        if abs(a) > 1 and (abs(a).bit_length() - 1) * b > MAX_POWER_BITS:
+            raise PowerError("el resultado de la potencia es demasiado grande")
+        return a ** b
+    result = a ** b
+    if isinstance(result, complex):
+        raise PowerError("la potencia de una base negativa con exponente fraccionario no es un número real")
+    return result
+
+
+def evaluate(op, a, b=None):
+    """Value of a pure operation with the run-time semantics of the language.
+
+    int / int and int % int truncate toward zero; relational operators give
+    1 or 0; ^ is power(). Division by zero raises ZeroDivisionError.
+    """
+    if op == ASSIGN:
+        return a
+    if op == ADD:
+        return a + b
+    if op == SUB:
+        return a - b
+    if op == MUL:
+        return a * b
+    if op == DIV:
+        if type(a) is int and type(b) is int:
+            return int_div(a, b)
+        return a / b
+    if op == MOD:
+        return int_mod(a, b)
+    if op == POW:
+        return power(a, b)
+    if op == NEG:
+        return -a
+    if op == ITOF:
+        return float(a)
+    if op == LT:
+        return int(a < b)
+    if op == LE:
+        return int(a <= b)
+    if op == GT:
+        return int(a > b)
+    if op == GE:
+        return int(a >= b)
+    if op == EQ:
+        return int(a == b)
+    if op == NE:
+        return int(a != b)
+    raise ValueError(f"Operación no evaluable: {OPCODE_NAMES.get(op, op)}")
+
+
+def operand(kind, index):
+    return (index << KIND_BITS) | kind
+
+
+def operand_kind(value):
+    return value & KIND_MASK
+
+
+def operand_index(value):
+    return value >> KIND_BITS
+
+
+class IntermediateCode:
+    """Arena of quadruples plus the tables their operands index"""
+
+    def __init__(self):
+        self.ops = array('B')
+        self.arg1 = array('i')
+        self.arg2 = array('i')
+        self.result = array('i')
+        self.constants = []
+        self._constant_index = {}
+        self.variables = []         # Display name of each variable slot
+        self.variable_types = []
+        self._variable_names = set()
+        self.temp_count = 0
+        self.label_positions = array('i')  # Quad index of each label, -1 until placed
+
+    def __len__(self):
+        return len(self.ops)
+
+    def emit(self, op, arg1=0, arg2=0, result=0):
+        self.ops.append(op)
+        self.arg1.append(arg1)
+        self.arg2.append(arg2)
+        self.result.append(result)
+        return len(self.ops) - 1
+
+    def new_temp(self):
+        self.temp_count += 1
+        return operand(TEMPORARY, self.temp_count)
+
+    def new_label(self):
+        self.label_positions.append(-1)
+        return operand(LABEL, len(self.label_positions) - 1)
+
+    def place_label(self, label):
+        self.label_positions[operand_index(label)] = self.emit(LABEL_HERE, result=label)
+
+    def replace(self, ops, arg1, arg2, result):
+        """Swap in new quadruple arrays and relocate the labels"""
+        self.ops, self.arg1, self.arg2, self.result = ops, arg1, arg2, result
+        positions = array('i', [-1]) * len(self.label_positions)
+        for index, op in enumerate(ops):
+            if op == LABEL_HERE:
+                positions[result[index] >> KIND_BITS] = index
+        self.label_positions = positions
+
+    def compact(self):
+        """Drop NOP quadruples"""
+        keep = [index for index, op in enumerate(self.ops) if op != NOP]
+        if len(keep) == len(self.ops):
+            return
+        self.replace(
+            array('B', [self.ops[i] for i in keep]),
+            array('i', [self.arg1[i] for i in keep]),
+            array('i', [self.arg2[i] for i in keep]),
+            array('i', [self.result[i] for i in keep]),
+        )
+
+    def constant(self, value):
+        # Keyed by type too: 1 and 1.0 are equal dict keys
+        key = (type(value), value)
+        index = self._constant_index.get(key)
+        if index is None:
+            index = self._constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return operand(CONSTANT, index)
+
+    def add_variable(self, slot, name, var_type):
+        while len(self.variables) <= slot:
+            self.variables.append(None)
+            self.variable_types.append(None)
+        # Shadowed names get their slot appended so the listing stays unambiguous
+        self.variables[slot] = name if name not in self._variable_names else f"{name}_{slot}"
+        self._variable_names.add(name)
+        self.variable_types[slot] = var_type
+
+    # Listing
+
+    def operand_text(self, value):
+        kind = value & KIND_MASK
+        index = value >> KIND_BITS
+        if kind == VARIABLE:
+            return self.variables[index]
+        if kind == TEMPORARY:
+            return f"t{index}"
+        if kind == CONSTANT:
+            return repr(self.constants[index])
+        if kind == LABEL:
+            return f"L{index}"
+        return "-"
+
+    def three_address(self, index):
+        """Quadruple index as a three-address statement"""
+        op = self.ops[index]
+        text = self.operand_text
+        a, b, r = self.arg1[index], self.arg2[index], self.result[index]
+        if op == ASSIGN:
+            return f"{text(r)} = {text(a)}"
+        if op == NEG:
+            return f"{text(r)} = -{text(a)}"
+        if op == ITOF:
+            return f"{text(r)} = (float) {text(a)}"
+        if op == GOTO:
+            return f"goto {text(r)}"
+        if op == IF_FALSE:
+            return f"if_false {text(a)} goto {text(r)}"
+        if op == IF_TRUE:
+            return f"if_true {text(a)} goto {text(r)}"
+        if op == LABEL_HERE:
+            return f"{text(r)}:"
+        if op in (READ_INT, READ_FLOAT):
+            return f"read {text(r)}"
+        if op == WRITE:
+            return f"write {text(a)}"
+        if op == HALT:
+            return "halt"
+        return f"{text(r)} = {text(a)} {OPCODE_NAMES[op]} {text(b)}"
+
+    def format_range(self, start, stop):
+        """Listing lines for quadruples start..stop-1"""
+        text = self.operand_text
+        lines = []
+        for index in range(start, min(stop, len(self.ops))):
+            quad = f"({OPCODE_NAMES[self.ops[index]]}, {text(self.arg1[index])}, {text(self.arg2[index])}, {text(self.result[index])})"
+            lines.append(f"{index:>8}  {quad:<32} {self.three_address(index)}")
+        return lines
+
+
+class IntermediateGenerator:
+    """Lower a Program that passed semantic analysis to quadruples"""
+
+    def __init__(self):
+        self.statement_generators = {
+            Declaration: self._declaration,
+            Assignment: self._assignment,
+            Update: self._update,
+            Input: self._input,
+            Output: self._output,
+            If: self._if,
+            While: self._while,
+            DoWhile: self._do_while,
+            Switch: self._switch,
+        }
+
+    def generate(self, tree):
+        self.code = IntermediateCode()
+        self._table = SymbolTable()
+        self._statements(tree.body)
+        self.code.emit(HALT)
+        code = self.code
+        del self.code, self._table
+        return code
+
+    def _statements(self, statements):
+        generators = self.statement_generators
+        for statement in statements:
+            generators[type(statement)](statement)
+
+    def _block(self, block):
+        self._table.push_scope()
+        self._statements(block.statements)
+        self._table.pop_scope()
+
+    def _variable(self, node):
+        symbol = self._table.lookup(node.name)
+        if symbol is None:
+            raise ValueError(f"Variable no declarada: {node.name}")
+        return operand(VARIABLE, symbol.location), symbol.var_type
+
+    # Statements
+
+    def _declaration(self, node):
+        for name in node.names:
+            symbol = self._table.declare(name.name, node.var_type, name.line, name.column)
+            if symbol is None:
+                raise ValueError(f"Variable ya declarada: {name.name}")
+            self.code.add_variable(symbol.location, name.name, node.var_type)
+
+    def _store(self, target, target_type, value, value_type):
+        """target = value, converting int to float when needed"""
+        code = self.code
+        if target_type == 'float' and value_type == 'int':
+            if operand_kind(value) == CONSTANT:
+                code.emit(ASSIGN, code.constant(float(code.constants[operand_index(value)])), 0, target)
+            else:
+                code.emit(ITOF, value, 0, target)
+        elif operand_kind(value) == TEMPORARY and code.result and code.result[-1] == value:
+            # Write the last result straight into the variable
+            code.result[-1] = target
+        else:
+            code.emit(ASSIGN, value, 0, target)
+
+    def _assignment(self, node):
+        target, target_type = self._variable(node.target)
+        value, value_type = self._value(node.value)
+        self._store(target, target_type, value, value_type)
+
+    def _update(self, node):
+        target, target_type = self._variable(node.target)
+        one = self.code.constant(1.0 if target_type == 'float' else 1)
+        self.code.emit(ADD if node.operator == '++' else SUB, target, one, target)
+
+    def _input(self, node):
+        target, target_type = self._variable(node.target)
+        self.code.emit(READ_FLOAT if target_type == 'float' else READ_INT, 0, 0, target)
+
+    def _output(self, node):
+        value, _ = self._value(node.value)
+        self.code.emit(WRITE, value)
+
+    def _if(self, node):
+        code = self.code
+        else_label = code.new_label()
+        self._jump_if_false(node.condition, else_label)
+        self._block(node.then_body)
+        if node.else_body is None:
+            code.place_label(else_label)
+            return
+        end_label = code.new_label()
+        code.emit(GOTO, result=end_label)
+        code.place_label(else_label)
+        self._block(node.else_body)
+        code.place_label(end_label)
+
+    def _while(self, node):
+        # Test at the bottom: one jump per iteration
+        code = self.code
+        body_label = code.new_label()
+        test_label = code.new_label()
+        code.emit(GOTO, result=test_label)
+        code.place_label(body_label)
+        self._block(node.body)
+        code.place_label(test_label)
+        self._jump_if_true(node.condition, body_label)
+
+    def _do_while(self, node):
+        code = self.code
+        body_label = code.new_label()
+        code.place_label(body_label)
+        self._block(node.body)
+        self._jump_if_true(node.condition, body_label)
+
+    def _switch(self, node):
+        code = self.code
+        subject, _ = self._value(node.subject)
+        end_label = code.new_label()
+        for index, case in enumerate(node.cases):
+            next_label = code.new_label()
+            test = code.new_temp()
+            code.emit(EQ, subject, code.constant(case.value.value), test)
+            code.emit(IF_FALSE, test, 0, next_label)
+            self._block(case.body)
+            if index < len(node.cases) - 1:
+                code.emit(GOTO, result=end_label)
+            code.place_label(next_label)
+        code.place_label(end_label)
+
+    # Expressions
+
+    def _jump_if_false(self, node, label):
+        """Jump to label when the condition is false, short-circuiting && and ||"""
+        self._jump(node, label, False)
+
+    def _jump_if_true(self, node, label):
+        self._jump(node, label, True)
+
+    def _jump(self, root, label, when):
+        """Jump to label when the condition's value is when.
+
+        && and || chains are expanded with an explicit stack, so their length
+        does not count against the Python stack; the quadruples and labels
+        come out in the same order as a recursive expansion.
+        """
+        code = self.code
+        pending = [(root, label, when)]  # A None node places its label
+        while pending:
+            node, label, when = pending.pop()
+            if node is None:
+                code.place_label(label)
+            elif isinstance(node, BinaryOp) and node.operator in ('&&', '||'):
+                if (node.operator == '||') == when:
+                    # Either operand decides the jump on its own
+                    pending.append((node.right, label, when))
+                    pending.append((node.left, label, when))
+                else:
+                    # The left operand can only rule the jump out: then skip the right one
+                    skip = code.new_label()
+                    pending.append((None, skip, None))
+                    pending.append((node.right, label, when))
+                    pending.append((node.left, skip, not when))
+            else:
+                value, _ = self._value(node)
+                code.emit(IF_TRUE if when else IF_FALSE, value, 0, label)
+
+    def _to_float(self, value, value_type):
+        if value_type != 'int':
+            return value
+        code = self.code
+        if operand_kind(value) == CONSTANT:
+            return code.constant(float(code.constants[operand_index(value)]))
+        temp = code.new_temp()
+        code.emit(ITOF, value, 0, temp)
+        return temp
+
+    def _value(self, root):
+        """Operand holding the expression's value, and its type.
+
+        Walked with an explicit stack, like SemanticAnalyzer._expression, so
+        long operator chains do not overflow the Python stack.
+        """
+        code = self.code
+        values = []                 # (operand, type) of the subexpressions done so far
+        pending = [(root, False)]   # (node, whether its operands are in values)
+        while pending:
+            node, ready = pending.pop()
+            if isinstance(node, Literal):
+                values.append((code.constant(node.value), node.var_type))
+            elif isinstance(node, Name):
+                values.append(self._variable(node))
+            elif isinstance(node, BinaryOp) and node.operator in ('&&', '||'):
+                values.append(self._logical_value(node))
+            elif not ready:
+                pending.append((node, True))
+                if isinstance(node, UnaryOp):
+                    pending.append((node.operand, False))
+                else:
+                    pending.append((node.right, False))
+                    pending.append((node.left, False))
+            elif isinstance(node, UnaryOp):
+                values.append(self._unary_value(node, *values.pop()))
+            else:
+                right = values.pop()
+                values.append(self._binary_value(node, *values.pop(), *right))
+        return values[0]
+
+    def _unary_value(self, node, value, value_type):
+        if node.operator == '+':
+            return value, value_type
+        code = self.code
+        if operand_kind(value) == CONSTANT:
+            return code.constant(-code.constants[operand_index(value)]), value_type
+        temp = code.new_temp()
+        code.emit(NEG, value, 0, temp)
+        return temp, value_type
+
+    def _logical_value(self, node):
+        """1 or 0 through the jumping code"""
+        code = self.code
+        temp = code.new_temp()
+        false_label = code.new_label()
+        code.emit(ASSIGN, code.constant(0), 0, temp)
+        self._jump_if_false(node, false_label)
+        code.emit(ASSIGN, code.constant(1), 0, temp)
+        code.place_label(false_label)
+        return temp, 'bool'
+
+    def _binary_value(self, node, left, left_type, right, right_type):
+        code = self.code
+        op = BINARY_OPCODES[node.operator]
+        if 'float' in (left_type, right_type):
+            left = self._to_float(left, left_type)
+            right = self._to_float(right, right_type)
+            value_type = 'float'
+        else:
+            value_type = left_type
+        if op in RELATIONAL_OPCODES:
+            value_type = 'bool'
+        temp = code.new_temp()
+        code.emit(op, left, right, temp)
+        return temp, value_type
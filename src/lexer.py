@@ -1,213 +1,408 @@
+import codecs
 import re
+from types import MappingProxyType
+
+from .line_index import LineIndex
+
+# Lexer specification. It is built and compiled once, when the module is
+# imported, and shared read-only by every Lexer, so creating one is free.
+
+# Token categories
+TOKEN_TYPES = MappingProxyType({
+    'INTEGER': 1,      # Integer numbers
+    'DECIMAL': 10,     # Decimal (floating point) numbers
+    'IDENTIFIER': 2,   # Identifiers
+    'COMMENT': 3,      # Comments
+    'RESERVED': 4,     # Reserved words
+    'ARITHMETIC_OP': 5, # Arithmetic operators
+    'REL_LOG_OP': 6,   # Relational/logical operators
+    'SYMBOL': 7,       # Symbols
+    'ASSIGNMENT': 8,   # Assignment
+    'ERROR': 9         # Errors
+})
+
+# Display name of each token type
+TOKEN_NAMES = MappingProxyType({
+    1: "ENTERO",
+    10: "DECIMAL",
+    2: "IDENTIFICADOR",
+    3: "COMENTARIO",
+    4: "RESERVADO",
+    5: "OP_ARITM",
+    6: "OP_REL",
+    7: "SIMBOLO",
+    8: "ASIGNACION",
+    9: "ERROR"
+})
+
+RESERVED_WORDS = frozenset({
+    'if', 'else', 'end', 'do', 'while', 'switch', 'case',
+    'int', 'float', 'main', 'cin', 'cout'
+})
+
+
+def recognize_id_or_reserved(value):
+    """Determine if a token is an identifier or reserved word"""
+    if value in RESERVED_WORDS:
+        return TOKEN_TYPES['RESERVED']
+    return TOKEN_TYPES['IDENTIFIER']
+
+
+# Legacy engine: patterns tried in turn on each line
+PATTERNS = (
+    # Whitespace (ignored but tracked for line/col counting)
+    (r'[ \t]+', None),
+
+    # Newlines (tracked for line counting)
+    (r'\n', None),
+
+    # Comments
+    (r'//[^\n]*', TOKEN_TYPES['COMMENT']),  # Single line comments
+    (r'/\*(.|\n)*?\*/', TOKEN_TYPES['COMMENT']),  # Multi-line comments
+
+    # Arithmetic operators
+    (r'\+\+', TOKEN_TYPES['ARITHMETIC_OP']),  # increment
+    (r'--', TOKEN_TYPES['ARITHMETIC_OP']),  # decrement
+    (r'[\+\-\*\/\%\^]', TOKEN_TYPES['ARITHMETIC_OP']),
+
+    # Numbers
+    (r'\d+\.\d+', TOKEN_TYPES['DECIMAL']),  # Valid decimal (digits on both sides)
+    (r'\d+\.(?![0-9])', TOKEN_TYPES['ERROR']),  # Invalid decimal (no digits after dot)
+    (r'\d+', TOKEN_TYPES['INTEGER']),       # Integer
+
+    # Identifiers and reserved words
+    (r'[a-zA-Z][a-zA-Z0-9]*', recognize_id_or_reserved),
+
+    # Relational operators
+    (r'<=|>=|==|!=|<|>', TOKEN_TYPES['REL_LOG_OP']),
+
+    # Logical operators
+    (r'&&|\|\|', TOKEN_TYPES['REL_LOG_OP']),
+
+    # Symbols
+    (r'[\(\)\{\},;]', TOKEN_TYPES['SYMBOL']),
+
+    # Assignment
+    (r'=', TOKEN_TYPES['ASSIGNMENT'])
+)
+_regex_patterns = None
+
+
+def regex_patterns():
+    """PATTERNS compiled, on first use: only the legacy engine needs them"""
+    global _regex_patterns
+    if _regex_patterns is None:
+        _regex_patterns = tuple((re.compile(pattern), token_type) for pattern, token_type in PATTERNS)
+    return _regex_patterns
+
+# Combined engine: the same rules, in the same order, as named groups of a
+# single alternation matched with pos= offsets over the whole buffer.
+# Block comments come first because the legacy engine extracts them before
+# anything else; for the same reason a line comment stops right before a
+# closed /* */ comment.
+CLOSED_COMMENT = r'/\*[\s\S]*?\*/'
+COMBINED_RULES = (
+    ('WHITESPACE', r'[ \t]+', None),
+    ('NEWLINE', r'\n', None),
+    ('BLOCK_COMMENT', CLOSED_COMMENT, TOKEN_TYPES['COMMENT']),
+    ('LINE_COMMENT', rf'/(?!{CLOSED_COMMENT})/(?:(?!{CLOSED_COMMENT})[^\n])*', TOKEN_TYPES['COMMENT']),
+    ('INCREMENT', r'\+\+', TOKEN_TYPES['ARITHMETIC_OP']),
+    ('DECREMENT', r'--', TOKEN_TYPES['ARITHMETIC_OP']),
+    ('ARITHMETIC_OP', r'[\+\-\*\/\%\^]', TOKEN_TYPES['ARITHMETIC_OP']),
+    ('DECIMAL', r'\d+\.\d+', TOKEN_TYPES['DECIMAL']),
+    ('INVALID_DECIMAL', r'\d+\.(?![0-9])', TOKEN_TYPES['ERROR']),
+    ('INTEGER', r'\d+', TOKEN_TYPES['INTEGER']),
+    ('WORD', r'[a-zA-Z][a-zA-Z0-9]*', recognize_id_or_reserved),
+    ('REL_OP', r'<=|>=|==|!=|<|>', TOKEN_TYPES['REL_LOG_OP']),
+    ('LOGICAL_OP', r'&&|\|\|', TOKEN_TYPES['REL_LOG_OP']),
+    ('SYMBOL', r'[\(\)\{\},;]', TOKEN_TYPES['SYMBOL']),
+    ('ASSIGNMENT', r'=', TOKEN_TYPES['ASSIGNMENT']),
+    # Any other character is reported as unrecognized
+    ('MISMATCH', r'[\s\S]', TOKEN_TYPES['ERROR'])
+)
+COMBINED_REGEX = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern, _ in COMBINED_RULES))
+COMBINED_TYPES = MappingProxyType({name: token_type for name, _, token_type in COMBINED_RULES})
+# Combined rules whose matches are lexical errors, and the message of each
+ERROR_MESSAGES = MappingProxyType({
+    'INVALID_DECIMAL': "Número decimal inválido",
+    'MISMATCH': "Carácter no reconocido",
+})
+BLOCK_COMMENT_REGEX = re.compile(CLOSED_COMMENT)
+
 
 class Token:
-    def __init__(self, token_type, value, line, column):
+    def __init__(self, token_type, value, line, column, offset=None):
         self.type = token_type
         self.value = value
         self.line = line
         self.column = column
+        self.offset = offset  # Absolute position in the source (combined engine only)
 
     def __str__(self):
         # Get the token type name instead of just the number
-        token_names = {
-            1: "ENTERO",
-            10: "DECIMAL",
-            2: "IDENTIFICADOR",
-            3: "COMENTARIO",
-            4: "RESERVADO",
-            5: "OP_ARITM",
-            6: "OP_REL",
-            7: "SIMBOLO",
-            8: "ASIGNACION",
-            9: "ERROR"
-        }
-        type_name = token_names.get(self.type, str(self.type))
+        type_name = TOKEN_NAMES.get(self.type, str(self.type))
         return f"Token({type_name}, '{self.value}', line={self.line}, col={self.column})"
 class LexicalError:
-    def __init__(self, value, line, column, message):
+    def __init__(self, value, line, column, message, offset=None):
         self.value = value
         self.line = line
         self.column = column
         self.message = message
+        self.offset = offset  # Absolute position in the source (combined engine only)
 
     def __str__(self):
         return f"Error: {self.message} '{self.value}' en línea {self.line}, columna {self.column}"
 
 class Lexer:
-    def __init__(self):
-        # Define token categories
-        self.TOKEN_TYPES = {
-            'INTEGER': 1,      # Integer numbers
-            'DECIMAL': 10,     # Decimal (floating point) numbers
-            'IDENTIFIER': 2,   # Identifiers
-            'COMMENT': 3,      # Comments
-            'RESERVED': 4,     # Reserved words
-            'ARITHMETIC_OP': 5, # Arithmetic operators
-            'REL_LOG_OP': 6,   # Relational/logical operators
-            'SYMBOL': 7,       # Symbols
-            'ASSIGNMENT': 8,   # Assignment
-            'ERROR': 9         # Errors
-        }
-        
-        # Define reserved words
-        self.RESERVED_WORDS = {
-            'if', 'else', 'end', 'do', 'while', 'switch', 'case', 
-            'int', 'float', 'main', 'cin', 'cout'
-        }
-        
-        # Define patterns
-        self.patterns = [
-            # Whitespace (ignored but tracked for line/col counting)
-            (r'[ \t]+', None),
-            
-            # Newlines (tracked for line counting)
-            (r'\n', None),
-            
-            # Comments
-            (r'//[^\n]*', self.TOKEN_TYPES['COMMENT']),  # Single line comments 
-            (r'/\*(.|\n)*?\*/', self.TOKEN_TYPES['COMMENT']),  # Multi-line comments
-
-            # Arithmetic operators
-            (r'\+\+', self.TOKEN_TYPES['ARITHMETIC_OP']),  # increment
-            (r'--', self.TOKEN_TYPES['ARITHMETIC_OP']),  # decrement
-            (r'[\+\-\*\/\%\^]', self.TOKEN_TYPES['ARITHMETIC_OP']),
-            
-            # Numbers
-            (r'\d+\.\d+', self.TOKEN_TYPES['DECIMAL']),  # Valid decimal (digits on both sides)
-            (r'\d+\.(?![0-9])', self.TOKEN_TYPES['ERROR']),  # Invalid decimal (no digits after dot)
-            (r'\d+', self.TOKEN_TYPES['INTEGER']),       # Integer
-            
-            # Identifiers and reserved words
-            (r'[a-zA-Z][a-zA-Z0-9]*', self.recognize_id_or_reserved),
-            
-            
-            
-            # Relational operators
-            (r'<=|>=|==|!=|<|>', self.TOKEN_TYPES['REL_LOG_OP']),
-            
-            # Logical operators
-            (r'&&|\|\|', self.TOKEN_TYPES['REL_LOG_OP']),
-            
-            # Symbols
-            (r'[\(\)\{\},;]', self.TOKEN_TYPES['SYMBOL']),
-            
-            # Assignment
-            (r'=', self.TOKEN_TYPES['ASSIGNMENT'])
-        ]
-        
-        # Compile regex patterns
-        self.regex_patterns = [(re.compile(pattern), token_type) for pattern, token_type in self.patterns]
+    # Available scanning engines
+    ENGINES = ('combined', 'legacy')
+
+    # The shared specification
+    TOKEN_TYPES = TOKEN_TYPES
+    RESERVED_WORDS = RESERVED_WORDS
+    patterns = PATTERNS
+    combined_rules = COMBINED_RULES
+    combined_regex = COMBINED_REGEX
+    combined_types = COMBINED_TYPES
+    recognize_id_or_reserved = staticmethod(recognize_id_or_reserved)
+
+    def __init__(self, engine='combined'):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown lexer engine: {engine}")
+        self.engine = engine
 
     def save_tokens_to_file(self, tokens, filename="tokens.txt"):
         """Write the list of tokens to a text file."""
         with open(filename, "w", encoding="utf-8") as f:
-            for t in tokens:
-                f.write(f"{t.type} {t.value} {t.line} {t.column}\n")
-
+            f.write("".join(f"{t.type} {t.value} {t.line} {t.column}\n" for t in tokens))
 
-    def recognize_id_or_reserved(self, value):
-        """Determine if a token is an identifier or reserved word"""
-        if value in self.RESERVED_WORDS:
-            return self.TOKEN_TYPES['RESERVED']
-        return self.TOKEN_TYPES['IDENTIFIER']
-        
     def tokenize(self, code, save_to_file=False, output_filename="tokens.txt"):
         """Generate tokens from the input code"""
+        if self.engine == 'combined':
+            tokens, errors = self._tokenize_combined(code)
+        else:
+            tokens, errors = self._tokenize_legacy(code)
+
+        if save_to_file:
+            self.save_tokens_to_file(tokens, output_filename)
+
+        return tokens, errors
+
+    def _tokenize_combined(self, code):
+        """Tokenize with the single-pass combined pattern"""
+        tokens = []
+        errors = []
+        for item in self._scan(code):
+            if isinstance(item, Token):
+                tokens.append(item)
+            else:
+                errors.append(item)
+        return tokens, errors
+
+    def _scan(self, code, pos=0, line=1, line_start=0):
+        """Yield tokens and errors in source order, starting at offset pos.
+
+        line is the line number at pos and line_start the offset where that line begins.
+        """
+        make_item = self._make_item
+        for m in self.combined_regex.finditer(code, pos):
+            kind = m.lastgroup
+            if kind == 'WHITESPACE':
+                continue
+            if kind == 'NEWLINE':
+                line += 1
+                line_start = m.end()
+                continue
+
+            start = m.start()
+            value = m.group()
+            yield make_item(kind, value, line, start - line_start + 1, start)
+
+            if kind == 'BLOCK_COMMENT':
+                newlines = value.count('\n')
+                if newlines:
+                    line += newlines
+                    line_start = start + value.rfind('\n') + 1
+
+    def _make_item(self, kind, value, line, column, offset):
+        """Build the Token or LexicalError for a match of the combined pattern"""
+        message = ERROR_MESSAGES.get(kind)
+        if message is not None:
+            # Unrecognized character or invalid decimal
+            return LexicalError(value, line, column, message, offset)
+
+        token_type = self.combined_types[kind]
+        if callable(token_type):
+            token_type = token_type(value)
+        return Token(token_type, value, line, column, offset)
+
+    def iter_tokens(self, source, chunk_size=65536, encoding="utf-8"):
+        """Yield tokens and errors lazily, in source order.
+
+        source can be a str, a text or binary file object, or an mmap. File
+        input is read chunk_size units at a time; the scanner only accepts a
+        match once enough text follows it to be sure it cannot change, so
+        numbers and comments split across chunks come out whole. Memory stays
+        bounded by the chunk size, except that an unterminated "/*" holds the
+        input until a "*/" or the end is reached, since only then is it known
+        whether it starts a comment.
+        """
+        if isinstance(source, str):
+            yield from self._scan(source)
+            return
+
+        chunks = self._read_chunks(source, chunk_size, encoding)
+        match = self.combined_regex.match
+        buffer = ""
+        base = 0           # Absolute offset of buffer[0]
+        pos = 0            # Scan position inside buffer
+        line, line_start = 1, 0
+        closer_from = 0    # Where the search for a "*/" should resume
+        eof = False
+
+        while True:
+            if pos >= len(buffer) - 2 and not eof:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    eof = True
+                else:
+                    # Drop what has already been consumed before growing the buffer
+                    buffer = buffer[pos:] + chunk
+                    base += pos
+                    closer_from = max(closer_from - pos, 0)
+                    pos = 0
+                continue
+            if pos >= len(buffer):
+                return
+
+            m = match(buffer, pos)
+            kind = m.lastgroup
+            end = m.end()
+            value = m.group()
+            if not eof:
+                # Numbers look up to two characters ahead, and a "/*" is only an
+                # operator pair if no "*/" follows anywhere in the input.
+                opener = value.find('/*') if kind == 'LINE_COMMENT' else -1
+                if kind == 'ARITHMETIC_OP' and buffer.startswith('/*', pos):
+                    opener = 0
+                needs_more = end > len(buffer) - 2
+                if opener >= 0 and not needs_more:
+                    closer = buffer.find('*/', max(pos + opener + 2, closer_from))
+                    needs_more = closer < 0
+                    closer_from = len(buffer) - 1 if closer < 0 else 0
+                if needs_more:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        eof = True
+                    else:
+                        buffer += chunk
+                    continue
+            closer_from = 0
+
+            if kind == 'NEWLINE':
+                line += 1
+                line_start = base + end
+            elif kind != 'WHITESPACE':
+                start = base + pos
+                yield self._make_item(kind, value, line, start - line_start + 1, start)
+                if kind == 'BLOCK_COMMENT':
+                    newlines = value.count('\n')
+                    if newlines:
+                        line += newlines
+                        line_start = start + value.rfind('\n') + 1
+            pos = end
+
+    @staticmethod
+    def _read_chunks(source, chunk_size, encoding):
+        """Yield text chunks from a file object or mmap, decoding bytes as needed"""
+        decoder = None
+        while True:
+            data = source.read(chunk_size)
+            if not data:
+                break
+            if isinstance(data, str):
+                yield data
+                continue
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)()
+            text = decoder.decode(data)
+            if text:
+                yield text
+        if decoder is not None:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+
+    def _find_block_comments(self, code):
+        """Find all multiline comment positions"""
+        return list(BLOCK_COMMENT_REGEX.finditer(code))
+
+    def _tokenize_legacy(self, code, comment_matches=None):
+        """Tokenize line by line, trying each pattern in turn"""
         tokens = []
         errors = []
         
         # First, extract all multiline comments
-        multiline_pattern = re.compile(r'/\*[\s\S]*?\*/', re.DOTALL)
-        
-        # Find all multiline comment positions
-        comment_matches = list(multiline_pattern.finditer(code))
-        
-        # Process the code with comments handled separately
+        if comment_matches is None:
+            comment_matches = self._find_block_comments(code)
+
+        # Positions come from offsets through the line index, so the text is
+        # never split into lines
+        index = LineIndex(code)
         pos = 0
-        line_num = 1
-        col_num = 1
         
         for match in comment_matches:
             # Process text before this comment
-            pre_comment = code[pos:match.start()]
-            pre_tokens, pre_errors, line_num, col_num = self._process_text(pre_comment, line_num, col_num)
-            tokens.extend(pre_tokens)
-            errors.extend(pre_errors)
-            
-            # Create token for the comment
-            comment_text = match.group(0)
-            comment_lines = comment_text.count('\n')
-            
-            # Find line and column of comment start
-            comment_line = line_num
-            comment_col = col_num
+            self._process_text(code, pos, match.start(), index, tokens, errors)
             
             # Add the comment token
-            token = Token(self.TOKEN_TYPES['COMMENT'], comment_text, comment_line, comment_col)
-            tokens.append(token)
-            
-            # Update position
+            comment_line, comment_col = index.position(match.start())
+            tokens.append(Token(self.TOKEN_TYPES['COMMENT'], match.group(0), comment_line, comment_col))
             pos = match.end()
-            line_num += comment_lines
-            if comment_lines > 0:
-                col_num = len(comment_text.split('\n')[-1]) + 1
-            else:
-                col_num += len(comment_text)
         
         # Process remaining text
-        remaining = code[pos:]
-        rem_tokens, rem_errors, _, _ = self._process_text(remaining, line_num, col_num)
-        tokens.extend(rem_tokens)
-        errors.extend(rem_errors)
+        self._process_text(code, pos, len(code), index, tokens, errors)
 
-        if save_to_file:
-            self.save_tokens_to_file(tokens, output_filename)
-        
         return tokens, errors
 
-    def _process_text(self, text, start_line, start_col):
-        """Helper method to process text without multiline comments"""
-        tokens = []
-        errors = []
-        
-        lines = text.split('\n')
-        line_num = start_line
-        col_num = start_col
+    def _process_text(self, code, start, end, index, tokens, errors):
+        """Tokenize code[start:end], which holds no multiline comments, adding
+        to tokens and errors; index is the LineIndex of code"""
+        patterns = regex_patterns()
+        line_num = index.line_of(start)
+        line_start = index.line_start(line_num)
+        j = start
         
-        for i, line in enumerate(lines):
-            # Reset column for new lines (except the first one)
-            if i > 0:
-                col_num = 1
-            
-            j = 0
-            while j < len(line):
+        while True:
+            # Patterns match up to the end of the line, as if it were a separate string
+            line_end = min(index.line_end(line_num), end)
+            while j < line_end:
                 # Try to match a pattern at current position
                 matched = False
                 
-                for pattern, token_type in self.regex_patterns:
-                    match = pattern.match(line[j:])
+                for pattern, token_type in patterns:
+                    match = pattern.match(code, j, line_end)
                     
                     if match:
                         value = match.group(0)
                         
-                        # Skip whitespace but update column
+                        # Skip whitespace
                         if token_type is None:
-                            col_num += len(value)
                             j += len(value)
                             matched = True
                             break
                         
                         # Skip multiline comment patterns - we already handled them
-                        if token_type == self.TOKEN_TYPES['COMMENT'] and '/*' in value:
+                        if token_type == self.TOKEN_TYPES['COMMENT'] and value.startswith('/*'):
                             matched = True
                             j += len(value)
-                            col_num += len(value)
                             break
                         
                         # Call function for type identification if needed
                         if callable(token_type):
                             token_type = token_type(value)
                         
+                        col_num = j - line_start + 1
                         # Check if this is an error token (invalid decimal)
                         if token_type == self.TOKEN_TYPES['ERROR']:
                             # Create an error instead of a token
@@ -220,21 +415,21 @@ class Lexer:
                             tokens.append(token)
                         
                         # Update position
-                        col_num += len(value)
                         j += len(value)
                         matched = True
                         break
                 
                 if not matched:
                     # Handle unrecognized character
-                    error = LexicalError(line[j], line_num, col_num, "Carácter no reconocido")
+                    error = LexicalError(code[j], line_num, j - line_start + 1, "Carácter no reconocido")
                     errors.append(error)
                     j += 1
-                    col_num += 1
             
+            if line_end >= end:
+                return
+            # Continue after the newline
             line_num += 1
-        
-        return tokens, errors, line_num, col_num
+            line_start = j = line_end + 1
 
     def get_color_for_token_type(self, token_type):
         """Return the color for syntax highlighting based on token type"""
@@ -0,0 +1,46 @@
+"""Line-start index of a text, for mapping between offsets and positions.
+
+    index = LineIndex(code)
+    index.position(offset)      # (line, column), both 1-based
+    index.offset(line, column)
+
+The start offset of every line is found once, by the regex engine in C, and
+kept in a typed array; lookups are a bisect over it, so no line is ever
+copied out of the text.
+"""
+import re
+from array import array
+from bisect import bisect_right
+
+_NEWLINE = re.compile('\n')
+
+
+class LineIndex:
+    def __init__(self, text):
+        self.length = len(text)
+        self.starts = array('Q', [0])
+        self.starts.extend(m.end() for m in _NEWLINE.finditer(text))
+
+    def __len__(self):
+        """Number of lines; text ending in a newline has an empty last line"""
+        return len(self.starts)
+
+    def line_of(self, offset):
+        """1-based line containing offset"""
+        return bisect_right(self.starts, offset)
+
+    def line_start(self, line):
+        return self.starts[line - 1]
+
+    def line_end(self, line):
+        """Offset of the newline ending a line, or the text length for the last one"""
+        return self.starts[line] - 1 if line < len(self.starts) else self.length
+
+    def position(self, offset):
+        """(line, column) of an offset, both 1-based"""
+        line = bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
+
+    def offset(self, line, column):
+        """Offset of a 1-based (line, column), clamped to the end of that line"""
+        return min(self.starts[line - 1] + column - 1, self.line_end(line))
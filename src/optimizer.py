@@ -0,0 +1,383 @@
+"""Optimization passes over IntermediateCode and the manager that runs them.
+
+Each pass rewrites the quadruple arrays in place; deleted quadruples become
+NOP and are compacted away once the pass finishes. Levels:
+
+    0  no optimization
+    1  constant folding and propagation, dead and unreachable code
+    2  level 1 plus common subexpressions and loop-invariant code motion
+"""
+import time
+from array import array
+
+from .intermediate import (
+    ADD, ASSIGN, CONSTANT, DIV, EQ, GE, GOTO, GT, HALT, IF_FALSE, IF_TRUE, ITOF, JUMP_OPCODES, KIND_BITS, KIND_MASK,
+    LABEL_HERE, LE, LT, MOD, MUL, NE, NEG, NOP, POW, READ_FLOAT, READ_INT, SUB, TEMPORARY, VARIABLE, WRITE, evaluate,
+)
+
+# Operations without side effects whose result can be recomputed or dropped
+PURE_OPCODES = {ASSIGN, ADD, SUB, MUL, DIV, MOD, POW, NEG, ITOF, LT, LE, GT, GE, EQ, NE}
+UNARY_OPCODES = {ASSIGN, NEG, ITOF}
+COMMUTATIVE_OPCODES = {ADD, MUL, EQ, NE}
+# Safe to run on a path that would not have run them, or to drop when their
+# value is unused: they cannot fail. DIV, MOD and POW can divide by zero or
+# overflow, and ITOF overflows on ints too large for a float
+NON_TRAPPING_OPCODES = {ASSIGN, ADD, SUB, MUL, NEG, LT, LE, GT, GE, EQ, NE}
+# Quadruples that read arg1 / arg2 (jumps and writes read arg1 only)
+READS_ARG1 = PURE_OPCODES | {IF_FALSE, IF_TRUE, WRITE}
+READS_ARG2 = PURE_OPCODES - UNARY_OPCODES
+# Quadruples whose result is a value rather than a label
+WRITES_RESULT = PURE_OPCODES | {READ_INT, READ_FLOAT}
+
+# Larger powers are left for run time rather than computed while compiling
+MAX_FOLDED_EXPONENT = 64
+
+
+def basic_blocks(code):
+    """(start, stop) ranges of the basic blocks of code"""
+    ops = code.ops
+    blocks = []
+    start = 0
+    for index, op in enumerate(ops):
+        if op == LABEL_HERE and index > start:
+            blocks.append((start, index))
+            start = index
+        if op in JUMP_OPCODES or op == HALT:
+            blocks.append((start, index + 1))
+            start = index + 1
+    if start < len(ops):
+        blocks.append((start, len(ops)))
+    return blocks
+
+
+def _fold(op, a, b):
+    """Constant value of op(a, b), or None when it must stay for run time"""
+    if op == POW and type(b) is int and b > MAX_FOLDED_EXPONENT:
+        return None
+    try:
+        return evaluate(op, a, b)
+    except (ArithmeticError, ValueError):
+        return None
+
+
+def fold_constants(code):
+    """Fold constant operations and propagate constants inside basic blocks.
+
+    Conditional jumps on a constant become a goto or disappear.
+    """
+    ops, arg1, arg2, result = code.ops, code.arg1, code.arg2, code.result
+    constants = code.constants
+    for start, stop in basic_blocks(code):
+        known = {}  # Variable or temporary operand -> constant operand
+        for index in range(start, stop):
+            op = ops[index]
+            if op in READS_ARG1 and arg1[index] in known:
+                arg1[index] = known[arg1[index]]
+            if op in READS_ARG2 and arg2[index] in known:
+                arg2[index] = known[arg2[index]]
+            a, b = arg1[index], arg2[index]
+
+            if op in (IF_FALSE, IF_TRUE):
+                if a & KIND_MASK == CONSTANT:
+                    taken = bool(constants[a >> KIND_BITS]) == (op == IF_TRUE)
+                    if taken:
+                        ops[index], arg1[index] = GOTO, 0
+                    else:
+                        ops[index] = NOP
+                continue
+            if op not in WRITES_RESULT:
+                continue
+
+            target = result[index]
+            known.pop(target, None)
+            if op not in PURE_OPCODES or a & KIND_MASK != CONSTANT:
+                continue
+            if op in UNARY_OPCODES:
+                value = _fold(op, constants[a >> KIND_BITS], None)
+            elif b & KIND_MASK == CONSTANT:
+                value = _fold(op, constants[a >> KIND_BITS], constants[b >> KIND_BITS])
+            else:
+                continue
+            if value is None:
+                continue
+            folded = code.constant(value)
+            ops[index], arg1[index], arg2[index] = ASSIGN, folded, 0
+            known[target] = folded
+    code.compact()
+
+
+def eliminate_common_subexpressions(code):
+    """Reuse values already computed in the same basic block (local value numbering)"""
+    ops, arg1, arg2, result = code.ops, code.arg1, code.arg2, code.result
+    for start, stop in basic_blocks(code):
+        available = {}  # (op, arg1, arg2) -> operand holding the value
+        users = {}      # operand -> keys of available that read or hold it
+        copies = {}     # temporary -> operand it is a copy of
+        copied = {}     # operand -> temporaries that are copies of it
+        for index in range(start, stop):
+            op = ops[index]
+            if op in READS_ARG1 and arg1[index] in copies:
+                arg1[index] = copies[arg1[index]]
+            if op in READS_ARG2 and arg2[index] in copies:
+                arg2[index] = copies[arg2[index]]
+            if op not in WRITES_RESULT:
+                continue
+
+            target = result[index]
+            # The old value of target is gone: forget what depended on it
+            for key in users.pop(target, ()):
+                available.pop(key, None)
+            for temp in copied.pop(target, ()):
+                if copies.get(temp) == target:
+                    del copies[temp]
+            copies.pop(target, None)
+
+            if op not in PURE_OPCODES or op == ASSIGN:
+                continue
+            a, b = arg1[index], arg2[index]
+            if op in COMMUTATIVE_OPCODES and a > b:
+                a, b = b, a
+            key = (op, a, b)
+            holder = available.get(key)
+            if holder is not None and holder != target:
+                ops[index], arg1[index], arg2[index] = ASSIGN, holder, 0
+                if target & KIND_MASK == TEMPORARY:
+                    copies[target] = holder
+                    copied.setdefault(holder, []).append(target)
+                continue
+            if target in (a, b):
+                continue
+            available[key] = target
+            for operand in (a, b, target):
+                if operand & KIND_MASK in (VARIABLE, TEMPORARY):
+                    users.setdefault(operand, []).append(key)
+
+
+def _remove_unreachable(code):
+    """NOP out blocks that no path from the entry reaches"""
+    ops, result = code.ops, code.result
+    blocks = basic_blocks(code)
+    block_at = {start: number for number, (start, _) in enumerate(blocks)}
+    reachable = bytearray(len(blocks))
+    pending = [0] if blocks else []
+    while pending:
+        number = pending.pop()
+        if reachable[number]:
+            continue
+        reachable[number] = 1
+        start, stop = blocks[number]
+        last = ops[stop - 1]
+        if last in JUMP_OPCODES:
+            pending.append(block_at[code.label_positions[result[stop - 1] >> KIND_BITS]])
+        if last not in (GOTO, HALT) and number + 1 < len(blocks):
+            pending.append(number + 1)
+    for number, (start, stop) in enumerate(blocks):
+        if not reachable[number]:
+            for index in range(start, stop):
+                ops[index] = NOP
+
+
+def _remove_dead_jumps_and_labels(code):
+    """Drop gotos to the next quadruple and labels nothing jumps to"""
+    ops, result = code.ops, code.result
+    targets = set()
+    for index, op in enumerate(ops):
+        if op in JUMP_OPCODES:
+            target = code.label_positions[result[index] >> KIND_BITS]
+            following = index + 1
+            while following < target and ops[following] in (NOP, LABEL_HERE):
+                following += 1
+            if op == GOTO and following == target:
+                ops[index] = NOP
+            else:
+                targets.add(result[index])
+    for index, op in enumerate(ops):
+        if op == LABEL_HERE and result[index] not in targets:
+            ops[index] = NOP
+
+
+def _remove_unused_values(code):
+    """Drop quadruples whose temporary is never read, and variable stores
+    overwritten later in the same block without being read. Only operations
+    that cannot fail are dropped, so a run-time error stays an error."""
+    ops, arg1, arg2, result = code.ops, code.arg1, code.arg2, code.result
+    reads = {}
+    for index, op in enumerate(ops):
+        if op in READS_ARG1:
+            reads[arg1[index]] = reads.get(arg1[index], 0) + 1
+        if op in READS_ARG2:
+            reads[arg2[index]] = reads.get(arg2[index], 0) + 1
+
+    # Backwards, so a removal can make the quadruples feeding it dead too
+    for index in range(len(ops) - 1, -1, -1):
+        op = ops[index]
+        target = result[index]
+        if op in NON_TRAPPING_OPCODES and target & KIND_MASK == TEMPORARY and not reads.get(target):
+            ops[index] = NOP
+            if op in READS_ARG1:
+                reads[arg1[index]] -= 1
+            if op in READS_ARG2:
+                reads[arg2[index]] -= 1
+
+    for start, stop in basic_blocks(code):
+        overwritten = set()  # Variables stored later in the block before any read
+        for index in range(stop - 1, start - 1, -1):
+            op = ops[index]
+            if op in WRITES_RESULT and result[index] & KIND_MASK == VARIABLE:
+                if op in NON_TRAPPING_OPCODES and result[index] in overwritten:
+                    ops[index] = NOP
+                    continue
+                overwritten.add(result[index])
+            if op in READS_ARG1:
+                overwritten.discard(arg1[index])
+            if op in READS_ARG2:
+                overwritten.discard(arg2[index])
+
+
+def eliminate_dead_code(code):
+    """Remove unreachable blocks, useless jumps and labels, and unused values"""
+    _remove_unreachable(code)
+    _remove_dead_jumps_and_labels(code)
+    code.compact()
+    _remove_unused_values(code)
+    code.compact()
+
+
+def _loops(code):
+    """Loops of code as {(header, back_jump): (insert_at, depth)}.
+
+    A loop is a jump back to a label at or before it; several jumps back to
+    one label (from a || condition) make a single loop ending at the last.
+    Hoisted code goes right before the loop is entered: before the header
+    label, or before the goto that enters a while loop at its test. depth
+    counts the loops around it; the generated code nests them properly.
+    """
+    ops, result = code.ops, code.result
+    ends = {}
+    for index, op in enumerate(ops):
+        if op in JUMP_OPCODES:
+            header = code.label_positions[result[index] >> KIND_BITS]
+            if header <= index:
+                ends[header] = index
+
+    loops = {}
+    enclosing = []  # back_jump of the loops containing the current header
+    for header in sorted(ends):
+        back = ends[header]
+        while enclosing and enclosing[-1] < header:
+            enclosing.pop()
+        insert_at = header
+        if header > 0 and ops[header - 1] == GOTO:
+            entry = code.label_positions[result[header - 1] >> KIND_BITS]
+            if header < entry <= back:
+                insert_at = header - 1
+        loops[(header, back)] = (insert_at, len(enclosing))
+        enclosing.append(back)
+    return loops
+
+
+def hoist_loop_invariants(code):
+    """Move computations whose operands do not change inside a loop in front of it.
+
+    Only temporaries with a single definition in the loop are moved, and only
+    operations that cannot fail, since a while body may run zero times.
+    Loops are handled one nesting level at a time, innermost first, so code
+    can climb out of several loops.
+    """
+    loops = _loops(code)
+    if not loops:
+        return
+
+    for level in range(max(depth for _, depth in loops.values()), -1, -1):
+        ops, arg1, arg2, result = code.ops, code.arg1, code.arg2, code.result
+        moves = {}  # Insert position -> indexes moved there
+        moved = set()
+        for (header, back), (insert_at, depth) in loops.items():
+            if depth != level:
+                continue
+            defined = {}
+            for index in range(header, back + 1):
+                if ops[index] in WRITES_RESULT:
+                    defined[result[index]] = defined.get(result[index], 0) + 1
+            hoisted = []
+            for index in range(header, back + 1):
+                op = ops[index]
+                target = result[index]
+                if op not in NON_TRAPPING_OPCODES or target & KIND_MASK != TEMPORARY or defined[target] != 1:
+                    continue
+                if defined.get(arg1[index]) or (op in READS_ARG2 and defined.get(arg2[index])):
+                    continue
+                hoisted.append(index)
+                # Its value is now fixed for the whole loop
+                del defined[target]
+            if hoisted:
+                moves.setdefault(insert_at, []).extend(hoisted)
+                moved.update(hoisted)
+        if moves:
+            _reorder(code, moves, moved)
+            # Positions shift after a move
+            loops = _loops(code)
+
+
+def _reorder(code, moves, moved):
+    """Rebuild the arrays with the quadruples in moved placed at their insert positions"""
+    ops, arg1, arg2, result = code.ops, code.arg1, code.arg2, code.result
+    order = []
+    for index in range(len(ops)):
+        for hoisted in moves.get(index, ()):
+            order.append(hoisted)
+        if index not in moved:
+            order.append(index)
+    code.replace(
+        array('B', [ops[i] for i in order]),
+        array('i', [arg1[i] for i in order]),
+        array('i', [arg2[i] for i in order]),
+        array('i', [result[i] for i in order]),
+    )
+
+
+PASSES = {
+    'plegado': ("Plegado y propagación de constantes", fold_constants),
+    'cse': ("Subexpresiones comunes", eliminate_common_subexpressions),
+    'licm': ("Invariantes de ciclo", hoist_loop_invariants),
+    'muerto': ("Código muerto e inalcanzable", eliminate_dead_code),
+}
+LEVELS = {
+    0: [],
+    1: ['plegado', 'muerto'],
+    2: ['plegado', 'cse', 'licm', 'plegado', 'muerto'],
+}
+
+
+class PassManager:
+    def __init__(self, level=2):
+        if level not in LEVELS:
+            raise ValueError(f"Nivel de optimización desconocido: {level}")
+        self.level = level
+        self.passes = [PASSES[name] for name in LEVELS[level]]
+
+    def run(self, code):
+        """Optimize code in place; returns one report per pass run"""
+        reports = []
+        for name, function in self.passes:
+            before = len(code)
+            start = time.perf_counter()
+            function(code)
+            reports.append({
+                'pass': name,
+                'seconds': time.perf_counter() - start,
+                'before': before,
+                'after': len(code),
+            })
+        return reports
+
+
+def format_report(reports):
+    lines = []
+    for report in reports:
+        change = report['after'] - report['before']
+        lines.append(
+            f"{report['pass']:<36} {report['seconds'] * 1000:>9.2f} ms  "
+            f"{report['before']:>8} -> {report['after']:<8} ({change:+d})"
+        )
+    return "\n".join(lines) + "\n" if lines else ""
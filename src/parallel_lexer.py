@@ -0,0 +1,153 @@
+"""Lexing of one large source on several processes.
+
+    buffer = scan_parallel(code, workers=8)        # a TokenBuffer
+    tokens, errors = tokenize_parallel(code)       # same lists as Lexer().tokenize(code)
+
+The source is cut at newlines that the combined engine lexes as NEWLINE
+tokens, i.e. that are not inside a /* */ comment. A pre-scan finds those
+comments without tokenizing. At such a newline the scanner carries no state
+besides the line number, so each piece can be lexed on its own, starting at
+the line number counted up to it. The pieces are encoded once into a shared
+memory block that the worker processes read their slice from, instead of
+receiving a pickled copy of the text. Workers send back TokenBuffers rather
+than Token objects, and the buffers are concatenated in source order.
+"""
+import os
+import re
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .token_buffer import TokenBuffer
+
+# Sources shorter than this are lexed in the calling process
+MIN_PARALLEL_CHARS = 1 << 20
+# Pieces per worker, so a slow piece does not leave the other workers idle
+PIECES_PER_WORKER = 4
+
+_COMMENT_START = re.compile(r'/[/*]')
+
+
+def block_comments(code):
+    """(start, end) of every /* */ comment, as the combined engine lexes them.
+
+    A "/*" starts a comment only if a "*/" follows somewhere. A "//" starts
+    a line comment unless its second "/" starts such a comment, and the line
+    comment ends at the end of its line or right before one.
+    """
+    spans = []
+    last_closer = code.rfind('*/')
+    find = code.find
+    search = _COMMENT_START.search
+    pos = 0
+    while True:
+        m = search(code, pos)
+        if m is None:
+            return spans
+        start = m.start()
+        if code[start + 1] == '*':
+            if start + 2 > last_closer:
+                # Neither this "/*" nor any later one is closed
+                return spans
+            end = find('*/', start + 2) + 2
+            spans.append((start, end))
+            pos = end
+        elif code.startswith('/*', start + 1) and start + 3 <= last_closer:
+            # "//*" followed by a "*/": a "/" operator, then a comment
+            pos = start + 1
+        else:
+            line_end = find('\n', start + 2)
+            if line_end < 0:
+                line_end = len(code)
+            opener = find('/*', start + 2, line_end)
+            pos = opener if 0 <= opener and opener + 2 <= last_closer else line_end
+
+
+def split_points(code, pieces):
+    """Offsets, from 0 to len(code), cutting code into up to pieces parts at
+    the start of lines that do not begin inside a block comment"""
+    spans = block_comments(code)
+    span_starts = [start for start, _ in spans]
+    bounds = [0]
+    for index in range(1, pieces):
+        newline = code.find('\n', max(len(code) * index // pieces, bounds[-1]))
+        while newline >= 0:
+            inside = bisect_right(span_starts, newline) - 1
+            if inside < 0 or spans[inside][1] <= newline:
+                break
+            newline = code.find('\n', spans[inside][1])
+        if newline < 0 or newline + 1 >= len(code):
+            break
+        if newline + 1 > bounds[-1]:
+            bounds.append(newline + 1)
+    bounds.append(len(code))
+    return bounds
+
+
+def _scan_text(text, line, base):
+    """TokenBuffer of text, which starts a line.
+
+    line is the line number of text[0] and base its offset in the whole source.
+    """
+    buffer = TokenBuffer()
+    buffer.scan(text, line=line, offset=base)
+    return buffer
+
+
+def _scan_shared(name, byte_start, byte_end, line, base):
+    """Worker: lex the UTF-8 bytes [byte_start, byte_end) of a shared memory block"""
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        text = bytes(memory.buf[byte_start:byte_end]).decode("utf-8")
+    finally:
+        memory.close()
+    return _scan_text(text, line, base)
+
+
+def _concatenate(parts):
+    """One TokenBuffer with the items of each part, in order"""
+    buffer = parts[0]
+    for part in parts[1:]:
+        buffer.extend(part)
+    return buffer
+
+
+def scan_parallel(code, workers=None, pieces=None):
+    """Tokens and errors of code as a TokenBuffer, lexed on workers processes"""
+    workers = workers or os.cpu_count() or 1
+    if pieces is None:
+        if workers == 1 or len(code) < MIN_PARALLEL_CHARS:
+            return _scan_text(code, 1, 0)
+        pieces = workers * PIECES_PER_WORKER
+    bounds = split_points(code, pieces)
+
+    encoded = []
+    jobs = []
+    line = 1
+    byte_start = 0
+    for start, end in zip(bounds, bounds[1:]):
+        data = code[start:end].encode("utf-8")
+        encoded.append(data)
+        jobs.append((byte_start, byte_start + len(data), line, start))
+        byte_start += len(data)
+        line += code.count('\n', start, end)
+
+    memory = shared_memory.SharedMemory(create=True, size=max(byte_start, 1))
+    try:
+        position = 0
+        for data in encoded:
+            memory.buf[position:position + len(data)] = data
+            position += len(data)
+        del encoded
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            futures = [executor.submit(_scan_shared, memory.name, *job) for job in jobs]
+            parts = [future.result() for future in futures]
+    finally:
+        memory.close()
+        memory.unlink()
+    return _concatenate(parts)
+
+
+def tokenize_parallel(code, workers=None):
+    """(tokens, errors), equal to Lexer().tokenize(code), lexed on workers processes"""
+    return scan_parallel(code, workers).split(code)
@@ -0,0 +1,585 @@
+"""Recursive-descent parser for the language defined by the Lexer.
+
+    program     -> main { statements }
+    statement   -> (int | float) ID {, ID} ;
+                 | ID = expression ;  |  ID ++ ;  |  ID -- ;
+                 | if ( expression ) statements [else statements] end
+                 | while ( expression ) { statements }
+                 | do { statements } while ( expression ) ;
+                 | switch ( expression ) { {case NUMBER { statements }} }
+                 | cin ID ;  |  cout expression ;
+    expression  -> binary operators by precedence, lowest first:
+                   ||   &&   < <= > >= == !=   + -   * / %
+                   then unary + -, then ^ (right associative)
+
+The token list is walked once, left to right. Errors use panic-mode recovery:
+the broken statement is dropped and tokens are skipped up to a ';', a
+statement keyword or a closing brace. Skipped tokens are never revisited, so
+parsing stays linear however broken the input is.
+"""
+from .lexer import Token
+
+# Token type codes assigned by Lexer.TOKEN_TYPES
+INTEGER = 1
+IDENTIFIER = 2
+COMMENT = 3
+DECIMAL = 10
+
+# Lookup keys for tokens whose value does not identify them
+ID_KEY = '<id>'
+INT_KEY = '<int>'
+FLOAT_KEY = '<float>'
+EOF_KEY = '<eof>'
+
+BINARY_PRECEDENCE = {
+    '||': 1,
+    '&&': 2,
+    '<': 3, '<=': 3, '>': 3, '>=': 3, '==': 3, '!=': 3,
+    '+': 4, '-': 4,
+    '*': 5, '/': 5, '%': 5,
+}
+UNARY_OPERATORS = {'+', '-'}
+
+# Recovery stops before these keys; identifiers are left out on purpose so
+# that the rest of a broken expression is not read as a new statement
+STATEMENT_KEYWORDS = {'if', 'while', 'do', 'switch', 'int', 'float', 'cin', 'cout'}
+SYNC_KEYS = STATEMENT_KEYWORDS | {'}', 'end', 'else', 'case', EOF_KEY}
+
+# Nesting of blocks, parentheses and unary operators; deeper input is
+# reported instead of overflowing the Python stack
+MAX_DEPTH = 100
+
+
+class SyntacticError:
+    def __init__(self, value, line, column, message):
+        self.value = value
+        self.line = line
+        self.column = column
+        self.message = message
+
+    def __str__(self):
+        return f"Error: {self.message} '{self.value}' en línea {self.line}, columna {self.column}"
+
+
+class Node:
+    """Base AST node; subclasses list their attributes in _fields"""
+    __slots__ = ('line', 'column')
+    _fields = ()
+
+    def __init__(self, line, column, *values):
+        self.line = line
+        self.column = column
+        for name, value in zip(self._fields, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({values})"
+
+
+class Program(Node):
+    # tokens: the token list the Block ranges refer to, comments excluded
+    __slots__ = _fields = ('body', 'tokens')
+
+
+class Block(Node):
+    """Statements of a nested body and the range of tokens they span"""
+    __slots__ = _fields = ('statements', 'start', 'end')
+
+
+class Declaration(Node):
+    __slots__ = _fields = ('var_type', 'names')
+
+
+class Assignment(Node):
+    __slots__ = _fields = ('target', 'value')
+
+
+class Update(Node):
+    """ID++ or ID--"""
+    __slots__ = _fields = ('target', 'operator')
+
+
+class If(Node):
+    __slots__ = _fields = ('condition', 'then_body', 'else_body')
+
+
+class While(Node):
+    __slots__ = _fields = ('condition', 'body')
+
+
+class DoWhile(Node):
+    __slots__ = _fields = ('body', 'condition')
+
+
+class Switch(Node):
+    __slots__ = _fields = ('subject', 'cases')
+
+
+class Case(Node):
+    __slots__ = _fields = ('value', 'body')
+
+
+class Input(Node):
+    __slots__ = _fields = ('target',)
+
+
+class Output(Node):
+    __slots__ = _fields = ('value',)
+
+
+class BinaryOp(Node):
+    __slots__ = _fields = ('operator', 'left', 'right')
+
+
+class UnaryOp(Node):
+    __slots__ = _fields = ('operator', 'operand')
+
+
+class Literal(Node):
+    __slots__ = _fields = ('value', 'var_type')
+
+
+class Name(Node):
+    __slots__ = _fields = ('name',)
+
+
+class _Panic(Exception):
+    """Unwinds to the statement list that will resynchronize"""
+
+
+class Parser:
+    def __init__(self):
+        self.statement_parsers = {
+            'int': self._declaration,
+            'float': self._declaration,
+            ID_KEY: self._assignment,
+            'if': self._if,
+            'while': self._while,
+            'do': self._do_while,
+            'switch': self._switch,
+            'cin': self._input,
+            'cout': self._output,
+        }
+
+    def parse(self, tokens):
+        """Build the AST for a token list; returns (Program, errors).
+
+        Comment tokens are ignored. The tree is always returned, without the
+        statements that could not be parsed.
+        """
+        self._tokens = [token for token in tokens if token.type != COMMENT]
+        self._keys = [self._key(token) for token in self._tokens]
+        self._tokens.append(self._end_token())
+        self._keys.append(EOF_KEY)
+        self._pos = 0
+        self._depth = 0
+        self._errors = []
+        self._last_error = -1
+
+        tree = self._program()
+        self._tokens.pop()  # End of input marker
+        errors = self._errors
+        del self._tokens, self._keys, self._errors
+        return tree, errors
+
+    @staticmethod
+    def _key(token):
+        if token.type == IDENTIFIER:
+            return ID_KEY
+        if token.type == INTEGER:
+            return INT_KEY
+        if token.type == DECIMAL:
+            return FLOAT_KEY
+        return token.value
+
+    def _end_token(self):
+        if not self._tokens:
+            return Token(None, "fin de archivo", 1, 1)
+        last = self._tokens[-1]
+        return Token(None, "fin de archivo", last.line, last.column + len(last.value))
+
+    # Token helpers
+
+    def _peek(self):
+        return self._keys[self._pos]
+
+    def _advance(self):
+        token = self._tokens[self._pos]
+        if self._pos < len(self._keys) - 1:
+            self._pos += 1
+        return token
+
+    def _match(self, key):
+        if self._keys[self._pos] == key:
+            return self._advance()
+        return None
+
+    def _error(self, message):
+        """Record an error at the current token, once per position"""
+        if self._pos <= self._last_error:
+            return
+        self._last_error = self._pos
+        token = self._tokens[self._pos]
+        self._errors.append(SyntacticError(token.value, token.line, token.column, message))
+
+    def _expect(self, key, description=None):
+        """Consume key or abandon the current statement"""
+        token = self._match(key)
+        if token is None:
+            self._error(f"Se esperaba {description or repr(key)} y se encontró")
+            raise _Panic()
+        return token
+
+    def _require(self, key):
+        """Consume key, or report it as missing and carry on as if it were there"""
+        if self._match(key) is None:
+            self._error(f"Se esperaba {key!r} y se encontró")
+
+    def _enter(self):
+        self._depth += 1
+        if self._depth > MAX_DEPTH:
+            self._error("Anidamiento demasiado profundo en")
+            raise _Panic()
+
+    def _leave(self):
+        self._depth -= 1
+
+    # Recovery
+
+    def _synchronize(self):
+        """Skip tokens up to a safe point to resume parsing statements"""
+        keys = self._keys
+        while True:
+            key = keys[self._pos]
+            if key == ';':
+                self._advance()
+                return
+            if key == '{':
+                # The block of a broken statement: skip it whole
+                self._skip_block()
+                return
+            if key in SYNC_KEYS:
+                return
+            self._advance()
+
+    def _skip_block(self):
+        depth = 0
+        keys = self._keys
+        while keys[self._pos] != EOF_KEY:
+            key = self._advance().value
+            if key == '{':
+                depth += 1
+            elif key == '}':
+                depth -= 1
+                if depth == 0:
+                    return
+
+    # Grammar
+
+    def _program(self):
+        start = self._tokens[self._pos]
+        if self._match('main') is None:
+            self._error("Se esperaba 'main' y se encontró")
+        self._require('{')
+        body = self._statements(())
+        self._require('}')
+
+        # Keep parsing whatever follows, e.g. after an unbalanced '}'
+        if self._peek() != EOF_KEY:
+            self._error("Código después del fin del programa:")
+            while self._peek() != EOF_KEY:
+                if self._peek() == '}':
+                    self._advance()
+                body.extend(self._statements(()))
+        return Program(start.line, start.column, body, self._tokens)
+
+    def _statements(self, terminators):
+        """Parse statements until '}', one of terminators or the end of input"""
+        statements = []
+        parsers = self.statement_parsers
+        while True:
+            key = self._keys[self._pos]
+            if key == '}' or key == EOF_KEY or key in terminators:
+                return statements
+            if key in ('else', 'end', 'case'):
+                self._error("Palabra reservada fuera de lugar:")
+                self._advance()
+                continue
+
+            start = self._pos
+            depth = self._depth
+            try:
+                parser = parsers.get(key)
+                if parser is None:
+                    self._error("Se esperaba una sentencia y se encontró")
+                    raise _Panic()
+                statements.append(parser())
+            except _Panic:
+                self._depth = depth
+                self._synchronize()
+                if self._pos == start:
+                    self._advance()
+
+    def _body(self, terminators):
+        """Statements as a Block covering their tokens"""
+        start = self._pos
+        token = self._tokens[start]
+        statements = self._statements(terminators)
+        return Block(token.line, token.column, statements, start, self._pos)
+
+    def _block(self):
+        """{ statements }, the Block including the braces"""
+        # Too deep a block is skipped whole by the recovery
+        self._enter()
+        start = self._pos
+        token = self._tokens[start]
+        self._require('{')
+        statements = self._statements(())
+        self._leave()
+        self._require('}')
+        return Block(token.line, token.column, statements, start, self._pos)
+
+    def _condition(self):
+        """( expression ), recovering inside the parentheses on errors"""
+        self._require('(')
+        depth = self._depth
+        try:
+            condition = self._expression()
+        except _Panic:
+            self._depth = depth
+            condition = None
+            keys = self._keys
+            while keys[self._pos] not in SYNC_KEYS and keys[self._pos] not in (')', '{', ';'):
+                self._advance()
+        self._require(')')
+        return condition
+
+    def _declaration(self):
+        token = self._advance()
+        names = []
+        while True:
+            name = self._expect(ID_KEY, "un identificador")
+            names.append(Name(name.line, name.column, name.value))
+            if self._match(',') is None:
+                break
+        self._require(';')
+        return Declaration(token.line, token.column, token.value, names)
+
+    def _assignment(self):
+        token = self._advance()
+        target = Name(token.line, token.column, token.value)
+        key = self._peek()
+        if key in ('++', '--'):
+            self._advance()
+            self._require(';')
+            return Update(token.line, token.column, target, key)
+        self._expect('=', "'=', '++' o '--'")
+        value = self._expression()
+        self._require(';')
+        return Assignment(token.line, token.column, target, value)
+
+    def _if(self):
+        token = self._advance()
+        condition = self._condition()
+        self._enter()
+        then_body = self._body(('else', 'end'))
+        else_body = None
+        if self._match('else') is not None:
+            else_body = self._body(('end',))
+        self._leave()
+        self._require('end')
+        return If(token.line, token.column, condition, then_body, else_body)
+
+    def _while(self):
+        token = self._advance()
+        condition = self._condition()
+        body = self._block()
+        return While(token.line, token.column, condition, body)
+
+    def _do_while(self):
+        token = self._advance()
+        body = self._block()
+        self._require('while')
+        condition = self._condition()
+        self._require(';')
+        return DoWhile(token.line, token.column, body, condition)
+
+    def _switch(self):
+        token = self._advance()
+        subject = self._condition()
+        self._require('{')
+        cases = []
+        while True:
+            key = self._peek()
+            if key == '}' or key == EOF_KEY:
+                break
+            if key != 'case':
+                self._error("Se esperaba 'case' y se encontró")
+                while self._peek() not in ('case', '}', EOF_KEY):
+                    if self._peek() == '{':
+                        self._skip_block()
+                    else:
+                        self._advance()
+                continue
+            case = self._advance()
+            try:
+                value = self._literal()
+            except _Panic:
+                value = None
+                while self._peek() not in ('{', 'case', '}', EOF_KEY):
+                    self._advance()
+            cases.append(Case(case.line, case.column, value, self._block()))
+        self._require('}')
+        return Switch(token.line, token.column, subject, cases)
+
+    def _input(self):
+        token = self._advance()
+        name = self._expect(ID_KEY, "un identificador")
+        self._require(';')
+        return Input(token.line, token.column, Name(name.line, name.column, name.value))
+
+    def _output(self):
+        token = self._advance()
+        value = self._expression()
+        self._require(';')
+        return Output(token.line, token.column, value)
+
+    # Expressions
+
+    def _expression(self, min_precedence=1):
+        """Precedence climbing over the left-associative binary operators"""
+        left = self._unary()
+        keys = self._keys
+        while True:
+            precedence = BINARY_PRECEDENCE.get(keys[self._pos])
+            if precedence is None or precedence < min_precedence:
+                return left
+            operator = self._advance()
+            right = self._expression(precedence + 1)
+            left = BinaryOp(operator.line, operator.column, operator.value, left, right)
+
+    def _unary(self):
+        if self._peek() in UNARY_OPERATORS:
+            operator = self._advance()
+            self._enter()
+            operand = self._unary()
+            self._leave()
+            return UnaryOp(operator.line, operator.column, operator.value, operand)
+        return self._power()
+
+    def _power(self):
+        base = self._primary()
+        if self._peek() == '^':
+            operator = self._advance()
+            # Right associative, and binds tighter than a unary sign on its left
+            self._enter()
+            exponent = self._unary()
+            self._leave()
+            return BinaryOp(operator.line, operator.column, '^', base, exponent)
+        return base
+
+    def _primary(self):
+        key = self._peek()
+        if key == ID_KEY:
+            token = self._advance()
+            return Name(token.line, token.column, token.value)
+        if key == INT_KEY or key == FLOAT_KEY:
+            return self._literal()
+        if key == '(':
+            self._advance()
+            self._enter()
+            value = self._expression()
+            self._leave()
+            self._expect(')')
+            return value
+        self._error("Se esperaba una expresión y se encontró")
+        raise _Panic()
+
+    def _literal(self):
+        key = self._peek()
+        if key == INT_KEY:
+            token = self._advance()
+            return Literal(token.line, token.column, int(token.value), 'int')
+        if key == FLOAT_KEY:
+            token = self._advance()
+            return Literal(token.line, token.column, float(token.value), 'float')
+        self._error("Se esperaba un número y se encontró")
+        raise _Panic()
+
+
+def _describe(node):
+    """One-line label of a node for format_tree"""
+    if isinstance(node, Declaration):
+        return f"declaración {node.var_type}: " + ", ".join(name.name for name in node.names)
+    if isinstance(node, Assignment):
+        return f"asignación {node.target.name} ="
+    if isinstance(node, Update):
+        return f"{node.target.name}{node.operator}"
+    if isinstance(node, Input):
+        return f"cin {node.target.name}"
+    if isinstance(node, (BinaryOp, UnaryOp)):
+        return node.operator
+    if isinstance(node, Literal):
+        return f"{node.value!r} ({node.var_type})"
+    if isinstance(node, Name):
+        return node.name
+    if isinstance(node, Case):
+        return f"case {node.value.value!r}" if node.value is not None else "case <error>"
+    return {Program: "main", If: "if", While: "while", DoWhile: "do", Switch: "switch", Output: "cout"}[type(node)]
+
+
+def _sections(node):
+    """Children of a node as (title, node or list of nodes) pairs"""
+    if isinstance(node, Program):
+        return [(None, node.body)]
+    if isinstance(node, Assignment):
+        return [(None, node.value)]
+    if isinstance(node, If):
+        sections = [("condición", node.condition), ("entonces", node.then_body.statements)]
+        if node.else_body is not None:
+            sections.append(("sino", node.else_body.statements))
+        return sections
+    if isinstance(node, While):
+        return [("condición", node.condition), ("cuerpo", node.body.statements)]
+    if isinstance(node, DoWhile):
+        return [("cuerpo", node.body.statements), ("condición", node.condition)]
+    if isinstance(node, Switch):
+        return [("valor", node.subject), (None, node.cases)]
+    if isinstance(node, Case):
+        return [(None, node.body.statements)]
+    if isinstance(node, Output):
+        return [(None, node.value)]
+    if isinstance(node, BinaryOp):
+        return [(None, node.left), (None, node.right)]
+    if isinstance(node, UnaryOp):
+        return [(None, node.operand)]
+    return []
+
+
+def format_tree(tree, indent="  "):
+    """Render an AST as indented text, one node per line"""
+    lines = []
+    stack = [(tree, 0)]
+    while stack:
+        node, depth = stack.pop()
+        prefix = indent * depth
+        if isinstance(node, str):
+            lines.append(prefix + node)
+            continue
+        if node is None:
+            lines.append(prefix + "<error>")
+            continue
+        lines.append(f"{prefix}{_describe(node)}  [línea {node.line}]")
+        children = []
+        for title, child in _sections(node):
+            level = depth + 1
+            if title is not None:
+                children.append((title + ":", level))
+                level += 1
+            if isinstance(child, list):
+                children.extend((item, level) for item in child)
+            else:
+                children.append((child, level))
+        stack.extend(reversed(children))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,263 @@
+"""Instrumentation: per-phase timers, counters and an optional cProfile/tracemalloc capture.
+
+    profiler = Profiler()
+    with profiler.phase('scan'):
+        tokens, errors = lexer.tokenize(code)
+    profiler.count('tokens', len(tokens))
+    profiler.report()       # JSON-ready dict
+
+Timers and counters accumulate until reset() and are cheap enough to stay on
+all the time. The capture is opt-in: start_capture() turns on tracemalloc and
+a cProfile that records the code run inside capture() blocks, and
+stop_capture() keeps the top functions and allocations for the report.
+Reports from other processes are folded in with merge().
+"""
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Display names of the phases and counters; unknown names are shown as they are
+PHASE_LABELS = {
+    'read': "lectura de archivos",
+    'comment_prescan': "pre-escaneo de comentarios",
+    'process_text': "procesamiento de texto",
+    'scan': "escaneo",
+    'cache': "carga desde la caché",
+    'save': "guardar tokens",
+    'report_text': "construcción de textos",
+    'update_panes': "actualizar paneles",
+    'highlight': "resaltado",
+}
+COUNTER_LABELS = {
+    'files': "archivos",
+    'cached_files': "archivos desde la caché",
+    'runs': "análisis",
+    'chars': "caracteres analizados",
+    'tokens': "tokens",
+    'errors': "errores léxicos",
+    'bytes_read': "bytes leídos",
+    'bytes_written': "bytes escritos",
+    'tcl_calls': "llamadas Tcl al editor",
+}
+# Phases that produce tokens, for the tokens per second rate
+LEXING_PHASES = ('comment_prescan', 'process_text', 'scan', 'cache')
+# Functions and allocation sites kept by a capture
+CAPTURE_LIMIT = 25
+
+
+class _Phase:
+    """Context manager adding its elapsed time to a phase"""
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # One cProfile runs at a time; capture() blocks entered meanwhile on
+        # other threads are not profiled
+        self._profile_lock = threading.Lock()
+        self._profile = None
+        self._memory = False    # The capture records allocations
+        self._tracing = False   # ... with a tracemalloc it started itself
+        self._active = False
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.phases = {}    # name -> [seconds, calls]
+            self.counters = {}
+            self.capture_report = None
+
+    # Timers and counters
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def add_time(self, name, seconds, calls=1):
+        with self._lock:
+            entry = self.phases.get(name)
+            if entry is None:
+                self.phases[name] = [seconds, calls]
+            else:
+                entry[0] += seconds
+                entry[1] += calls
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, report):
+        """Add the phases and counters of another report (e.g. from a worker process)"""
+        for name, entry in report.get('phases', {}).items():
+            self.add_time(name, entry['seconds'], entry['calls'])
+        for name, value in report.get('counters', {}).items():
+            self.count(name, value)
+
+    # Capture
+
+    @property
+    def capturing(self):
+        return self._active
+
+    def start_capture(self, profile=True, memory=True):
+        """Start recording function calls (inside capture() blocks) and allocations"""
+        if self._active:
+            return
+        self._active = True
+        if profile:
+            self._profile = cProfile.Profile()
+        self._memory = memory
+        if memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self._tracing = True
+
+    @contextmanager
+    def capture(self):
+        """Profile the block with the capture's cProfile, if one is running"""
+        profile = self._profile
+        if profile is None or not self._profile_lock.acquire(blocking=False):
+            yield
+            return
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active (e.g. the block runs under python -m cProfile)
+            self._profile_lock.release()
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._profile_lock.release()
+
+    def stop_capture(self, limit=CAPTURE_LIMIT):
+        """Stop the capture and keep its top entries in capture_report"""
+        report = {}
+        profile, self._profile = self._profile, None
+        if profile is not None:
+            with self._profile_lock:
+                stats = pstats.Stats(profile)
+            entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+            report['functions'] = [
+                {
+                    'function': f"{function} ({filename}:{line})",
+                    'calls': calls,
+                    'own_seconds': own,
+                    'cumulative_seconds': cumulative,
+                }
+                for (filename, line, function), (_, calls, own, cumulative, _) in entries
+            ]
+        if self._memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics('lineno')[:limit]
+            report['memory'] = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top': [
+                    {'location': str(statistic.traceback), 'bytes': statistic.size, 'blocks': statistic.count}
+                    for statistic in statistics
+                ],
+            }
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        self._memory = self._active = False
+        with self._lock:
+            self.capture_report = report
+        return report
+
+    # Output
+
+    def rates(self):
+        with self._lock:
+            lexing = sum(self.phases[name][0] for name in LEXING_PHASES if name in self.phases)
+            saving = self.phases['save'][0] if 'save' in self.phases else 0.0
+            counters = dict(self.counters)
+        rates = {}
+        if lexing > 0 and 'tokens' in counters:
+            rates['tokens_per_second'] = counters['tokens'] / lexing
+        if lexing > 0 and 'chars' in counters:
+            rates['chars_per_second'] = counters['chars'] / lexing
+        if saving > 0 and 'bytes_written' in counters:
+            rates['bytes_written_per_second'] = counters['bytes_written'] / saving
+        return rates
+
+    def report(self):
+        """Phases, counters, derived rates and the last capture, as plain data"""
+        rates = self.rates()
+        with self._lock:
+            return {
+                'phases': {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in self.phases.items()},
+                'counters': dict(self.counters),
+                'rates': rates,
+                'capture': self.capture_report,
+            }
+
+    def format(self):
+        """Human-readable report for the IDE"""
+        report = self.report()
+        phases = report['phases']
+        total = sum(entry['seconds'] for entry in phases.values())
+        lines = ["Fases:"]
+        if not phases:
+            lines.append("  (sin mediciones)")
+        for name, entry in sorted(phases.items(), key=lambda item: item[1]['seconds'], reverse=True):
+            share = entry['seconds'] / total * 100 if total else 0.0
+            average = entry['seconds'] / entry['calls'] * 1000 if entry['calls'] else 0.0
+            lines.append(
+                f"  {PHASE_LABELS.get(name, name):<28} {entry['seconds']:9.3f} s {share:5.1f}%  "
+                f"{entry['calls']:>6} veces, {average:8.2f} ms c/u"
+            )
+        lines.append("")
+        lines.append("Contadores:")
+        for name, value in report['counters'].items():
+            lines.append(f"  {COUNTER_LABELS.get(name, name):<28} {value:>12,}")
+        rates = report['rates']
+        if rates:
+            lines.append("")
+            if 'tokens_per_second' in rates:
+                lines.append(f"  tokens por segundo           {rates['tokens_per_second']:>12,.0f}")
+            if 'chars_per_second' in rates:
+                lines.append(f"  caracteres por segundo       {rates['chars_per_second']:>12,.0f}")
+            if 'bytes_written_per_second' in rates:
+                lines.append(f"  bytes escritos por segundo   {rates['bytes_written_per_second']:>12,.0f}")
+
+        capture = report['capture']
+        if self.capturing:
+            lines += ["", "Captura de cProfile/tracemalloc en curso..."]
+        elif capture:
+            if capture.get('functions'):
+                lines += ["", "Funciones con más tiempo acumulado (cProfile):"]
+                for entry in capture['functions']:
+                    lines.append(
+                        f"  {entry['cumulative_seconds']:8.3f} s acum. {entry['own_seconds']:8.3f} s propio "
+                        f"{entry['calls']:>8} llamadas  {entry['function']}"
+                    )
+            memory = capture.get('memory')
+            if memory:
+                lines += [
+                    "",
+                    f"Memoria (tracemalloc): pico {memory['peak_bytes'] / 1e6:.2f} MB, actual {memory['current_bytes'] / 1e6:.2f} MB",
+                ]
+                for entry in memory['top']:
+                    lines.append(f"  {entry['bytes'] / 1e3:10.1f} KB {entry['blocks']:>8} bloques  {entry['location']}")
+        return "\n".join(lines) + "\n"
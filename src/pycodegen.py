@@ -0,0 +1,361 @@
+"""Python backend: translate a checked Program into a Python function.
+
+The AST is structured, so while, do-while, if and switch become the Python
+statements of the same shape and every variable becomes a local of one
+function, the fastest storage CPython has. The source is compiled once with
+compile(); PythonBackend keeps the results by a hash of the program text, so
+running an unchanged program again skips the whole front end.
+
+The run-time semantics match the VirtualMachine: int / int and int % int
+truncate toward zero, int operands are converted to float before being
+compared with floats, and a bool written by cout prints as 1 or 0. The budget
+counts loop iterations instead of instructions.
+"""
+import marshal
+import math
+import time
+from collections import OrderedDict
+
+from .intermediate import PowerError, int_div, int_mod, power
+from .parser import Assignment, Declaration, DoWhile, If, Input, Literal, Name, Output, Switch, UnaryOp, Update, While
+from .symbol_table import SymbolTable
+from .vm import DEFAULT_BUDGET, Execution, VMError
+
+RELATIONAL_OPERATORS = {'<', '<=', '>', '>=', '==', '!='}
+PYTHON_OPERATORS = {'&&': 'and', '||': 'or'}
+INDENT = "    "
+
+
+class CodegenError(Exception):
+    """The program cannot be expressed as Python source (e.g. nested too deeply)"""
+
+
+class CompiledProgram:
+    __slots__ = ('source', 'code', 'variables', '_function')
+
+    def __init__(self, source, code, variables):
+        self.source = source            # Generated Python source
+        self.code = code                # Its code object
+        self.variables = variables      # Display name of each variable, in return order
+        namespace = {'int_div': int_div, 'int_mod': int_mod, 'power': power}
+        exec(code, namespace)
+        self._function = namespace['program']
+
+    def run(self, io, budget=DEFAULT_BUDGET):
+        """Execute the program; returns an Execution or raises VMError.
+
+        budget limits the loop iterations run; None for no limit.
+        """
+        read = io.read
+
+        def read_int():
+            word = read()
+            try:
+                return int(word)
+            except ValueError:
+                raise VMError(f"se esperaba un valor entero y se leyó '{word}'") from None
+
+        def read_float():
+            word = read()
+            try:
+                return float(word)
+            except ValueError:
+                raise VMError(f"se esperaba un valor float y se leyó '{word}'") from None
+
+        def exceeded():
+            raise VMError(f"se excedió el límite de {budget} iteraciones")
+
+        steps = budget if budget is not None else float('inf')
+        began = time.perf_counter()
+        try:
+            values, remaining = self._function(read_int, read_float, io.write, steps, exceeded)
+        except ZeroDivisionError:
+            raise VMError("división entre cero") from None
+        except OverflowError:
+            raise VMError("desbordamiento en operación de punto flotante") from None
+        except PowerError as e:
+            raise VMError(str(e)) from None
+        except EOFError:
+            raise VMError("no hay más datos de entrada para cin") from None
+        executed = steps - remaining if budget is not None else None
+        return Execution(executed, time.perf_counter() - began, dict(zip(self.variables, values)))
+
+
+class PythonGenerator:
+    """Render a Program that passed semantic analysis as Python source"""
+
+    def __init__(self):
+        self.statement_generators = {
+            Declaration: self._declaration,
+            Assignment: self._assignment,
+            Update: self._update,
+            Input: self._input,
+            Output: self._output,
+            If: self._if,
+            While: self._while,
+            DoWhile: self._do_while,
+            Switch: self._switch,
+        }
+
+    def generate(self, tree):
+        """Returns (source, variables): the source defines
+        program(read_int, read_float, write, steps, exceeded), which returns
+        the final variable values and the unused steps"""
+        self._lines = []
+        self._depth = 1
+        self._table = SymbolTable()
+        self._locals = []       # Python name of each variable slot
+        self._types = []
+        self._variables = []    # Display names, as in the intermediate code listing
+        self._variable_names = set()
+        self._switches = 0
+        self._temps = 0
+        self._statements(tree.body)
+        body = self._lines
+
+        header = ["def program(read_int, read_float, write, steps, exceeded):"]
+        header += [
+            f"{INDENT}{name} = {'0.0' if var_type == 'float' else '0'}"
+            for name, var_type in zip(self._locals, self._types)
+        ]
+        result = ", ".join(self._locals) + ("," if len(self._locals) == 1 else "")
+        footer = [f"{INDENT}return ({result}), steps"]
+        source = "\n".join(header + body + footer) + "\n"
+        variables = self._variables
+        del self._lines, self._table, self._locals, self._types, self._variables, self._variable_names
+        return source, variables
+
+    def _emit(self, line):
+        self._lines.append(INDENT * self._depth + line)
+
+    def _statements(self, statements):
+        generators = self.statement_generators
+        for statement in statements:
+            generators[type(statement)](statement)
+
+    def _suite(self, block):
+        """Indented body of a compound statement, in its own scope"""
+        self._depth += 1
+        mark = len(self._lines)
+        self._table.push_scope()
+        self._statements(block.statements)
+        self._table.pop_scope()
+        if len(self._lines) == mark:
+            self._emit("pass")
+        self._depth -= 1
+
+    def _loop_check(self):
+        self._emit("steps -= 1")
+        self._emit("if steps < 0: exceeded()")
+
+    def _variable(self, node):
+        symbol = self._table.lookup(node.name)
+        if symbol is None:
+            raise ValueError(f"Variable no declarada: {node.name}")
+        return self._locals[symbol.location], symbol.var_type
+
+    # Statements
+
+    def _declaration(self, node):
+        for name in node.names:
+            symbol = self._table.declare(name.name, node.var_type, name.line, name.column)
+            if symbol is None:
+                raise ValueError(f"Variable ya declarada: {name.name}")
+            # The _slot suffix keeps shadowed variables, Python keywords and
+            # the generated names (none end in _<digits>) apart
+            self._locals.append(f"{name.name}_{symbol.location}")
+            self._types.append(node.var_type)
+            shown = name.name if name.name not in self._variable_names else f"{name.name}_{symbol.location}"
+            self._variables.append(shown)
+            self._variable_names.add(name.name)
+
+    def _assignment(self, node):
+        target, target_type = self._variable(node.target)
+        value, value_type = self._expression(node.value)
+        if target_type == 'float' and value_type == 'int':
+            value = f"float({value})"
+        self._emit(f"{target} = {value}")
+
+    def _update(self, node):
+        target, target_type = self._variable(node.target)
+        one = "1.0" if target_type == 'float' else "1"
+        self._emit(f"{target} {'+=' if node.operator == '++' else '-='} {one}")
+
+    def _input(self, node):
+        target, target_type = self._variable(node.target)
+        self._emit(f"{target} = {'read_float' if target_type == 'float' else 'read_int'}()")
+
+    def _output(self, node):
+        value, value_type = self._expression(node.value)
+        self._emit(f"write(int({value}))" if value_type == 'bool' else f"write({value})")
+
+    def _if(self, node):
+        condition, _ = self._expression(node.condition)
+        self._emit(f"if {condition}:")
+        self._suite(node.then_body)
+        if node.else_body is not None:
+            self._emit("else:")
+            self._suite(node.else_body)
+
+    def _while(self, node):
+        condition, _ = self._expression(node.condition)
+        self._emit(f"while {condition}:")
+        self._depth += 1
+        self._loop_check()
+        self._depth -= 1
+        self._suite(node.body)
+
+    def _do_while(self, node):
+        self._emit("while True:")
+        self._depth += 1
+        self._loop_check()
+        self._depth -= 1
+        self._suite(node.body)
+        condition, _ = self._expression(node.condition)
+        self._depth += 1
+        self._emit(f"if not {condition}: break")
+        self._depth -= 1
+
+    def _switch(self, node):
+        if not node.cases:
+            return
+        subject, _ = self._expression(node.subject)
+        # Evaluated once, like the intermediate code
+        name = f"_case{self._switches}"
+        self._switches += 1
+        self._emit(f"{name} = {subject}")
+        keyword = "if"
+        for case in node.cases:
+            self._emit(f"{keyword} {name} == {self._literal(case.value.value)}:")
+            self._suite(case.body)
+            keyword = "elif"
+
+    # Expressions
+
+    def _truncating(self, operator, function, left, right):
+        """Integer / or %: Python's floor operator when both operands are
+        positive, where it agrees with truncation, else the helper function"""
+        a = f"_a{self._temps}"
+        b = f"_b{self._temps}"
+        self._temps += 1
+        # & rather than and: both operands must be evaluated, left first
+        return f"({a} {operator} {b} if (({a} := {left}) >= 0) & (({b} := {right}) > 0) else {function}({a}, {b}))"
+
+    @staticmethod
+    def _literal(value):
+        if isinstance(value, float) and not math.isfinite(value):
+            return f"float('{value}')"
+        return repr(value)
+
+    def _expression(self, root):
+        """Python expression for root, and its type.
+
+        Walked with an explicit stack so long operator chains do not overflow
+        the Python stack here; compile() may still refuse the nesting, which
+        PythonBackend reports as a CodegenError.
+        """
+        values = []                 # (expression, type) of the subexpressions done so far
+        pending = [(root, False)]   # (node, whether its operands are in values)
+        while pending:
+            node, ready = pending.pop()
+            if isinstance(node, Literal):
+                values.append((self._literal(node.value), node.var_type))
+            elif isinstance(node, Name):
+                values.append(self._variable(node))
+            elif not ready:
+                pending.append((node, True))
+                if isinstance(node, UnaryOp):
+                    pending.append((node.operand, False))
+                else:
+                    pending.append((node.right, False))
+                    pending.append((node.left, False))
+            elif isinstance(node, UnaryOp):
+                operand, operand_type = values.pop()
+                values.append((operand if node.operator == '+' else f"(-{operand})", operand_type))
+            else:
+                right = values.pop()
+                values.append(self._binary(node.operator, *values.pop(), *right))
+        return values[0]
+
+    def _binary(self, operator, left, left_type, right, right_type):
+        if operator in ('&&', '||'):
+            return f"({left} {PYTHON_OPERATORS[operator]} {right})", 'bool'
+        if operator in RELATIONAL_OPERATORS:
+            # Python compares int with float exactly; the VM converts first
+            if left_type == 'int' and right_type == 'float':
+                left = f"float({left})"
+            elif left_type == 'float' and right_type == 'int':
+                right = f"float({right})"
+            return f"({left} {operator} {right})", 'bool'
+
+        value_type = 'float' if 'float' in (left_type, right_type) else 'int'
+        if operator == '/' and value_type == 'int':
+            return self._truncating('//', 'int_div', left, right), 'int'
+        if operator == '%':
+            return self._truncating('%', 'int_mod', left, right), 'int'
+        if operator == '^':
+            # Python's ** gives floats and complex numbers the language does not have
+            return f"power({left}, {right})", value_type
+        return f"({left} {operator} {right})", value_type
+
+
+def _unmarshal(stored):
+    """(source, code object, variables) from a disk cache entry; damaged
+    marshal data raises, which the cache counts as a miss"""
+    source, code, variables = stored
+    return source, marshal.loads(code), variables
+
+
+class PythonBackend:
+    """Compile Programs to Python code objects, caching them by content hash.
+
+    Recent programs stay in memory; with a CompileCache the code objects are
+    also kept on disk (marshalled) for later runs.
+    """
+    CACHE_SIZE = 32
+
+    def __init__(self, cache=None):
+        self.generator = PythonGenerator()
+        self.disk_cache = cache
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """Cached CompiledProgram for a content hash, or None"""
+        program = self._cache.get(key)
+        if program is None and self.disk_cache is not None:
+            stored = self.disk_cache.get('python', key, _unmarshal)
+            if stored is not None:
+                source, code, variables = stored
+                program = self._remember(key, CompiledProgram(source, code, variables))
+        if program is None:
+            self.misses += 1
+            return None
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return program
+
+    def _remember(self, key, program):
+        self._cache[key] = program
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return program
+
+    def compile(self, tree, key=None):
+        """CompiledProgram for a checked Program; stored under key when given.
+
+        Raises CodegenError when Python cannot compile the result, e.g. for
+        blocks nested deeper than its parser allows.
+        """
+        source, variables = self.generator.generate(tree)
+        try:
+            code = compile(source, "<programa>", "exec")
+        except (SyntaxError, RecursionError, MemoryError) as e:
+            raise CodegenError(f"el backend Python no puede compilar el programa: {e}") from None
+        program = CompiledProgram(source, code, variables)
+        if key is not None:
+            self._remember(key, program)
+            if self.disk_cache is not None:
+                self.disk_cache.put('python', key, (source, marshal.dumps(code), variables))
+        return program
@@ -0,0 +1,315 @@
+"""Type checking over the AST built by the Parser.
+
+Variables are int or float; relational and logical operators produce bool,
+which only conditions and other logical operators accept. int values are
+promoted to float in mixed arithmetic and when assigned to float variables;
+float values cannot be assigned to int variables.
+
+Nested blocks are cached between runs. A block's key is its kind, its length
+and a hash of its token values; the cached result records the types it found for
+the names declared outside it. It is reused when those names still have the
+same types, so an edit only re-checks the blocks that contain it and the
+blocks that use a declaration whose type changed. Cached errors and
+declarations refer to tokens by their index inside the block, so they stay
+right when the block moves.
+"""
+from bisect import bisect_left
+from operator import attrgetter
+
+from .parser import Assignment, Declaration, DoWhile, If, Input, Literal, Name, Output, Switch, UnaryOp, Update, While
+from .symbol_table import SymbolTable
+
+RELATIONAL_OPERATORS = {'<', '<=', '>', '>=', '==', '!='}
+LOGICAL_OPERATORS = {'&&', '||'}
+
+_value = attrgetter('value')
+
+
+class SemanticError:
+    def __init__(self, value, line, column, message):
+        self.value = value
+        self.line = line
+        self.column = column
+        self.message = message
+
+    def __str__(self):
+        return f"Error: {self.message} '{self.value}' en línea {self.line}, columna {self.column}"
+
+
+class Declared:
+    """A variable declaration found by the analysis"""
+    __slots__ = ('name', 'var_type', 'line', 'column', 'level')
+
+    def __init__(self, name, var_type, line, column, level):
+        self.name = name
+        self.var_type = var_type
+        self.line = line
+        self.column = column
+        self.level = level
+
+
+class _BlockResult:
+    """Errors and declarations of a block, positioned by token index"""
+    __slots__ = ('start', 'level', 'requirements', 'errors', 'declarations')
+
+    def __init__(self, start, level):
+        self.start = start          # Index of the block's first token
+        self.level = level          # Scope level inside the block
+        self.requirements = {}      # Outer name -> type it had (None if undeclared)
+        self.errors = []            # (message, value, token index from start)
+        self.declarations = []      # (name, type, token index from start, level from self.level)
+
+
+class SemanticAnalyzer:
+    def __init__(self):
+        self._cache = {}
+        self.blocks_checked = 0
+        self.blocks_reused = 0
+        self.statement_checkers = {
+            Declaration: self._declaration,
+            Assignment: self._assignment,
+            Update: self._update,
+            Input: self._input,
+            Output: self._output,
+            If: self._if,
+            While: self._while,
+            DoWhile: self._do_while,
+            Switch: self._switch,
+        }
+
+    def analyze(self, tree):
+        """Check a Program; returns (declarations, errors) in source order"""
+        self._tokens = tree.tokens
+        self._table = SymbolTable()
+        self._new_cache = {}
+        self.blocks_checked = self.blocks_reused = 0
+
+        program = _BlockResult(0, 0)
+        self._frames = [program]
+        self._statements(tree.body)
+
+        # Keep only the blocks of this version of the program
+        self._cache = self._new_cache
+        tokens = self._tokens
+        declarations = [
+            Declared(name, var_type, tokens[index].line, tokens[index].column, level)
+            for name, var_type, index, level in program.declarations
+        ]
+        errors = [
+            SemanticError(value, tokens[index].line, tokens[index].column, message)
+            for message, value, index in program.errors
+        ]
+        del self._tokens, self._table, self._new_cache, self._frames
+        return declarations, errors
+
+    # Bookkeeping
+
+    def _index(self, node):
+        """Index of the token a node starts at"""
+        frame = self._frames[-1]
+        index = bisect_left(self._tokens, (node.line, node.column), lo=frame.start, key=lambda t: (t.line, t.column))
+        return index - frame.start
+
+    def _error(self, node, message, value):
+        self._frames[-1].errors.append((message, value, self._index(node)))
+
+    def _resolve(self, node):
+        """Type of a Name, reporting undeclared ones"""
+        symbol = self._table.lookup(node.name)
+        frame = self._frames[-1]
+        if symbol is None or symbol.level < frame.level:
+            frame.requirements[node.name] = symbol.var_type if symbol is not None else None
+        if symbol is None:
+            self._error(node, "Variable no declarada", node.name)
+            return None
+        return symbol.var_type
+
+    # Blocks
+
+    def _block(self, block, braced=True):
+        """Check a nested block, reusing the cached result when still valid.
+
+        braced tells { } blocks from if/else bodies: the parser recovers from
+        errors differently in each, so the same tokens may not give the same
+        statements.
+        """
+        if block.start >= block.end:
+            return
+        table = self._table
+        values = tuple(map(_value, self._tokens[block.start:block.end]))
+        key = (braced, len(values), hash(values))
+
+        result = self._cache.get(key)
+        if result is not None and self._still_valid(result):
+            self.blocks_reused += 1
+        else:
+            self.blocks_checked += 1
+            result = _BlockResult(block.start, table.level + 1)
+            self._frames.append(result)
+            table.push_scope()
+            self._statements(block.statements)
+            table.pop_scope()
+            self._frames.pop()
+        self._new_cache[key] = result
+
+        # Fold into the enclosing block, which may itself be cached later
+        parent = self._frames[-1]
+        shift = block.start - parent.start
+        level = table.level + 1 - parent.level
+        parent.errors.extend((message, value, index + shift) for message, value, index in result.errors)
+        parent.declarations.extend(
+            (name, var_type, index + shift, depth + level) for name, var_type, index, depth in result.declarations
+        )
+        for name, var_type in result.requirements.items():
+            symbol = table.lookup(name)
+            if symbol is None or symbol.level < parent.level:
+                parent.requirements[name] = var_type
+
+    def _still_valid(self, result):
+        """Whether the outer names a cached block used still have the same types"""
+        lookup = self._table.lookup
+        for name, var_type in result.requirements.items():
+            symbol = lookup(name)
+            if (symbol.var_type if symbol is not None else None) != var_type:
+                return False
+        return True
+
+    def _statements(self, statements):
+        checkers = self.statement_checkers
+        for statement in statements:
+            checkers[type(statement)](statement)
+
+    # Statements
+
+    def _declaration(self, node):
+        frame = self._frames[-1]
+        for name in node.names:
+            if self._table.declare(name.name, node.var_type, name.line, name.column) is None:
+                self._error(name, "Variable ya declarada en este ámbito", name.name)
+            else:
+                frame.declarations.append((name.name, node.var_type, self._index(name), self._table.level - frame.level))
+
+    def _assignment(self, node):
+        target = self._resolve(node.target)
+        value = self._expression(node.value)
+        if target is None or value is None:
+            return
+        if value == 'bool':
+            self._error(node.target, "No se puede asignar una expresión booleana a la variable", node.target.name)
+        elif target == 'int' and value == 'float':
+            self._error(node.target, "No se puede asignar un valor float a la variable entera", node.target.name)
+
+    def _update(self, node):
+        self._resolve(node.target)
+
+    def _input(self, node):
+        self._resolve(node.target)
+
+    def _output(self, node):
+        self._expression(node.value)
+
+    def _condition(self, node, keyword):
+        condition = self._expression(node.condition)
+        if condition is not None and condition != 'bool':
+            self._error(node, "La condición debe ser una expresión relacional o lógica en", keyword)
+
+    def _if(self, node):
+        self._condition(node, 'if')
+        self._block(node.then_body, braced=False)
+        if node.else_body is not None:
+            self._block(node.else_body, braced=False)
+
+    def _while(self, node):
+        self._condition(node, 'while')
+        self._block(node.body)
+
+    def _do_while(self, node):
+        self._block(node.body)
+        self._condition(node, 'do')
+
+    def _switch(self, node):
+        subject = self._expression(node.subject)
+        if subject is not None and subject != 'int':
+            self._error(node, "La expresión de switch debe ser entera en", 'switch')
+        seen = set()
+        for case in node.cases:
+            value = case.value
+            if value is not None:
+                if value.var_type != 'int':
+                    self._error(value, "La etiqueta de case debe ser entera", repr(value.value))
+                elif value.value in seen:
+                    self._error(value, "Etiqueta de case duplicada", repr(value.value))
+                seen.add(value.value)
+            self._block(case.body)
+
+    # Expressions
+
+    def _expression(self, root):
+        """Type of an expression: 'int', 'float', 'bool' or None after an error.
+
+        The tree is walked with an explicit stack: a long chain like
+        1 + 1 + ... + 1 is as deep as it has terms.
+        """
+        if root is None:
+            return None
+        types = []                      # Types of the subexpressions checked so far
+        pending = [(root, False)]       # (node, whether its operands are in types)
+        while pending:
+            node, checked = pending.pop()
+            if isinstance(node, Literal):
+                types.append(node.var_type)
+            elif isinstance(node, Name):
+                types.append(self._resolve(node))
+            elif not checked:
+                pending.append((node, True))
+                if isinstance(node, UnaryOp):
+                    pending.append((node.operand, False))
+                else:
+                    pending.append((node.right, False))
+                    pending.append((node.left, False))
+            elif isinstance(node, UnaryOp):
+                types.append(self._unary(node, types.pop()))
+            else:
+                right = types.pop()
+                types.append(self._binary(node, types.pop(), right))
+        return types[0]
+
+    def _unary(self, node, operand):
+        if operand == 'bool':
+            self._error(node, "Se requiere un operando numérico para el operador", node.operator)
+            return None
+        return operand
+
+    def _binary(self, node, left, right):
+        if left is None or right is None:
+            return None
+        operator = node.operator
+        if operator in LOGICAL_OPERATORS:
+            if left != 'bool' or right != 'bool':
+                self._error(node, "Se requieren operandos booleanos para el operador", operator)
+                return None
+            return 'bool'
+        if operator in RELATIONAL_OPERATORS:
+            if left == 'bool' and right == 'bool' and operator in ('==', '!='):
+                return 'bool'
+            if left == 'bool' or right == 'bool':
+                self._error(node, "Tipos incompatibles para el operador", operator)
+                return None
+            return 'bool'
+        if left == 'bool' or right == 'bool':
+            self._error(node, "Se requieren operandos numéricos para el operador", operator)
+            return None
+        if operator == '%' and (left != 'int' or right != 'int'):
+            self._error(node, "Se requieren operandos enteros para el operador", operator)
+            return None
+        return 'float' if 'float' in (left, right) else 'int'
+
+
+def format_declarations(declarations):
+    """Render the declarations found by the analysis as a table"""
+    lines = [f"{'Nombre':<20} {'Tipo':<6} {'Ámbito':>6} {'Línea':>6}"]
+    lines += [
+        f"{declared.name:<20} {declared.var_type:<6} {declared.level:>6} {declared.line:>6}"
+        for declared in declarations
+    ]
+    return "\n".join(lines) + "\n"
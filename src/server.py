@@ -0,0 +1,646 @@
+"""Analysis server: JSON-RPC 2.0 over stdio, framed like the Language Server Protocol.
+
+    python -m src.cli serve
+
+One process keeps the lexer (with its compiled patterns) and, for every open
+document, an IncrementalLexer, a Parser and a SemanticAnalyzer with its block
+cache, so an edit only costs re-lexing the region it touched. Supported
+messages:
+
+    initialize, initialized, shutdown, exit
+    textDocument/didOpen, textDocument/didChange (full or incremental), textDocument/didClose
+    textDocument/semanticTokens/full     highlight ranges, LSP relative encoding
+    compilador/tokens                    the token stream of a document
+    textDocument/publishDiagnostics      sent after each analysis (lexical, syntactic and semantic errors)
+
+Messages are handled on an asyncio loop and the work runs on a thread pool.
+Every document is lexed as soon as it changes, and requests wait only for
+that; parsing and semantic analysis run alongside, once edits pause, and a
+check overtaken by a newer version is dropped.
+"""
+import argparse
+import asyncio
+import functools
+import io
+import json
+import os
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import CompileCache
+from .incremental import IncrementalLexer
+from .lexer import TOKEN_NAMES, Lexer
+from .line_index import LineIndex
+from .parser import Parser
+from .semantic import SemanticAnalyzer
+from .worker import AnalysisCancelled
+
+SERVER_NAME = "compilador"
+DEFAULT_WORKERS = 4
+READ_SIZE = 65536
+# Quiet time after an edit before parsing starts, so a burst of keystrokes is
+# checked once
+CHECK_DELAY = 0.1
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+SERVER_NOT_INITIALIZED = -32002
+
+# LSP constants
+SYNC_INCREMENTAL = 2
+SEVERITY_ERROR = 1
+# Semantic token types, in legend order; symbols ({ } ; ...) are not highlighted
+SEMANTIC_TOKEN_TYPES = ['number', 'variable', 'comment', 'keyword', 'operator']
+
+
+def _semantic_types(lexer):
+    """Legend index of each token type"""
+    types = lexer.TOKEN_TYPES
+    index = SEMANTIC_TOKEN_TYPES.index
+    return {
+        types['INTEGER']: index('number'),
+        types['DECIMAL']: index('number'),
+        types['IDENTIFIER']: index('variable'),
+        types['COMMENT']: index('comment'),
+        types['RESERVED']: index('keyword'),
+        types['ARITHMETIC_OP']: index('operator'),
+        types['REL_LOG_OP']: index('operator'),
+        types['ASSIGNMENT']: index('operator'),
+    }
+
+
+def _units(text, encoding):
+    """Length of text in the client's position units"""
+    if encoding == 'utf-16' and not text.isascii():
+        return len(text) + sum(1 for char in text if ord(char) > 0xFFFF)
+    return len(text)
+
+
+class Positions:
+    """Convert between 1-based (line, column) in code points, as the compiler
+    reports them, and LSP positions: 0-based, in UTF-16 or UTF-32 units"""
+
+    def __init__(self, text, encoding):
+        self.text = text
+        self.encoding = encoding
+        # Code points and UTF-16 units only differ outside the BMP
+        self.exact = encoding != 'utf-16' or text.isascii()
+        self._lines = None  # LineIndex, built when a line is first needed
+
+    def _line_start(self, line):
+        if self._lines is None:
+            self._lines = LineIndex(self.text)
+        return self._lines.line_start(min(line, len(self._lines)))
+
+    def position(self, line, column):
+        if self.exact:
+            return {'line': line - 1, 'character': column - 1}
+        start = self._line_start(line)
+        return {'line': line - 1, 'character': _units(self.text[start:start + column - 1], self.encoding)}
+
+    def range(self, line, column, value):
+        """Range of value starting at (line, column); it may span lines"""
+        start = self.position(line, column)
+        newlines = value.count('\n')
+        if not newlines:
+            end = {'line': start['line'], 'character': start['character'] + _units(value, self.encoding)}
+        else:
+            end = {'line': start['line'] + newlines, 'character': _units(value[value.rfind('\n') + 1:], self.encoding)}
+        return {'start': start, 'end': end}
+
+
+def _diagnostic(error, positions, source):
+    return {
+        'range': positions.range(error.line, error.column, error.value),
+        'severity': SEVERITY_ERROR,
+        'source': source,
+        'message': f"{error.message} '{error.value}'",
+    }
+
+
+class Document:
+    """An open document, its pending edits and the state kept between analyses"""
+
+    def __init__(self, uri, text, version, cache):
+        self.uri = uri
+        self.text = text
+        self.version = version
+        self.lexer = IncrementalLexer(cache)
+        self.parser = Parser()
+        self.analyzer = SemanticAnalyzer()
+        self.generation = 0         # Bumped by every change
+        self.closed = False
+        # Unchanged (prefix, suffix) since the text the lexer has, None when unknown;
+        # NO_EDIT when nothing changed
+        self.edit = None
+        self._line_starts = [0]     # Known line starts of text, extended on demand
+        self.lexed_version = None
+        self.lexed = asyncio.Event()    # Set while the lexer's items match the current text
+        self.lock = asyncio.Lock()      # Held while the lexer's items are updated or read
+        self.semantic_data = None       # Semantic tokens of the lexed version, encoded on request
+        self.lex_count = 0              # Lexer updates so far
+        self.pending_check = None       # (generation, version, text, tokens, errors) to check next
+        self.task = None
+        self.check_task = None
+
+    NO_EDIT = (float('inf'), float('inf'))
+
+    # Edits (event loop thread)
+
+    def _fold(self, edit):
+        """Merge an edit range into the one carried to the lexer"""
+        if self.edit is None or edit is None:
+            self.edit = None
+        else:
+            self.edit = (min(self.edit[0], edit[0]), min(self.edit[1], edit[1]))
+
+    def take_edit(self):
+        edit, self.edit = self.edit, self.NO_EDIT
+        return edit
+
+    def restore_edit(self, edit):
+        """Give back an edit range the lexer did not consume"""
+        self._fold(edit)
+
+    def _line_start(self, line):
+        """Offset where a 0-based line starts, or None past the end"""
+        starts = self._line_starts
+        text = self.text
+        while len(starts) <= line:
+            newline = text.find('\n', starts[-1])
+            if newline < 0:
+                return None
+            starts.append(newline + 1)
+        return starts[line]
+
+    def offset(self, position, encoding):
+        """Offset in text of an LSP position, clamped to the document"""
+        start = self._line_start(max(position['line'], 0))
+        if start is None:
+            return len(self.text)
+        end = self.text.find('\n', start)
+        if end < 0:
+            end = len(self.text)
+        character = max(position['character'], 0)
+        line = self.text[start:end]
+        if encoding != 'utf-16' or line.isascii():
+            return min(start + character, end)
+        units = 0
+        for index, char in enumerate(line):
+            if units >= character:
+                return start + index
+            units += 2 if ord(char) > 0xFFFF else 1
+        return end
+
+    def change(self, changes, version, encoding):
+        """Apply textDocument/didChange content changes, in order"""
+        for change in changes:
+            if 'range' not in change:
+                self.text = change['text']
+                self._line_starts = [0]
+                self._fold(None)
+                continue
+            start_position = change['range']['start']
+            end_position = change['range']['end']
+            start = self.offset(start_position, encoding)
+            end = self.offset(end_position, encoding)
+            if end < start:
+                start, end = end, start
+                start_position = end_position
+            self._fold((start, len(self.text) - end))
+            self.text = self.text[:start] + change['text'] + self.text[end:]
+            # Lines before the edit keep their starts
+            del self._line_starts[max(start_position['line'], 0) + 1:]
+        self.version = version
+        self.generation += 1
+        self.lexed.clear()
+
+    # Analysis (worker thread)
+
+    def lex(self, text, edit, cancelled):
+        """Bring the lexer up to date with text; returns the (tokens, errors)
+        views of its new stream or raises AnalysisCancelled, leaving the lexer
+        as it was"""
+        prefix, suffix = edit if edit is not None and edit != self.NO_EDIT else (None, None)
+        if not self.lexer.update(text, prefix, suffix, cancelled):
+            raise AnalysisCancelled()
+        self.semantic_data = None
+        stream = self.lexer.stream
+        return stream.tokens, stream.errors
+
+    def check(self, text, tokens, lexical_errors, cancelled, encoding):
+        """Diagnostics for every error in the lexed text"""
+        tree, syntax_errors = self.parser.parse(tokens)
+        if cancelled():
+            raise AnalysisCancelled()
+        _, semantic_errors = self.analyzer.analyze(tree)
+
+        positions = Positions(text, encoding)
+        diagnostics = [_diagnostic(error, positions, "léxico") for error in lexical_errors]
+        diagnostics += [_diagnostic(error, positions, "sintáctico") for error in syntax_errors]
+        diagnostics += [_diagnostic(error, positions, "semántico") for error in semantic_errors]
+        return diagnostics
+
+    def semantic_tokens(self, semantic_types, encoding):
+        """LSP semantic token data for the lexer's items; block comments are
+        split into one range per line"""
+        data = []
+        extend = data.extend
+        stream = self.lexer.stream
+        positions = Positions(stream.text, encoding)
+        previous_line = previous_start = 0
+        for item in stream.tokens:
+            token_type = semantic_types.get(item.type)
+            if token_type is None:
+                continue
+            start = positions.position(item.line, item.column)
+            line, character = start['line'], start['character']
+            for piece in item.value.split('\n') if '\n' in item.value else (item.value,):
+                if piece:
+                    delta = character - previous_start if line == previous_line else character
+                    extend((line - previous_line, delta, _units(piece, encoding), token_type, 0))
+                    previous_line, previous_start = line, character
+                line += 1
+                character = 0
+        return data
+
+    def token_list(self, encoding):
+        stream = self.lexer.stream
+        positions = Positions(stream.text, encoding)
+        return [
+            {
+                'type': TOKEN_NAMES.get(item.type, str(item.type)),
+                'value': item.value,
+                'range': positions.range(item.line, item.column, item.value),
+            }
+            for item in stream.tokens
+        ]
+
+
+class RequestError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def read_messages(read, deliver):
+    """Split the bytes returned by read(size) into framed messages, calling
+    deliver(body) for each and deliver(None) at the end (reader thread)"""
+    buffer = bytearray()
+    while True:
+        header_end = buffer.find(b"\r\n\r\n")
+        if header_end < 0:
+            chunk = read(READ_SIZE)
+            if not chunk:
+                deliver(None)
+                return
+            buffer += chunk
+            continue
+        length = None
+        for line in bytes(buffer[:header_end]).split(b"\r\n"):
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                try:
+                    length = int(value)
+                except ValueError:
+                    pass
+        del buffer[:header_end + 4]
+        if length is None:
+            continue
+        while len(buffer) < length:
+            chunk = read(max(READ_SIZE, length - len(buffer)))
+            if not chunk:
+                deliver(None)
+                return
+            buffer += chunk
+        deliver(bytes(buffer[:length]))
+        del buffer[:length]
+
+
+class AnalysisServer:
+    def __init__(self, input_stream=None, output_stream=None, workers=DEFAULT_WORKERS, cache=None):
+        self.input_stream = input_stream if input_stream is not None else sys.stdin.buffer
+        self.output_stream = output_stream if output_stream is not None else sys.stdout.buffer
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        self.cache = cache
+        # Its token types map to the semantic token legend
+        self.lexer = Lexer()
+        self.semantic_types = _semantic_types(self.lexer)
+        self.documents = {}
+        self.encoding = 'utf-16'
+        self.initialized = False
+        self.shutting_down = False
+        self.exit_code = None
+        self._pending = set()   # Request and analysis tasks in flight
+        self.handlers = {
+            'initialize': self.initialize,
+            'initialized': self.ignore,
+            'shutdown': self.shutdown,
+            'exit': self.exit,
+            'textDocument/didOpen': self.did_open,
+            'textDocument/didChange': self.did_change,
+            'textDocument/didClose': self.did_close,
+            'textDocument/semanticTokens/full': self.semantic_tokens,
+            'compilador/tokens': self.tokens,
+        }
+
+    # Transport
+
+    def send(self, message):
+        body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+        self.output_stream.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+        self.output_stream.flush()
+
+    def notify(self, method, params):
+        self.send({'jsonrpc': "2.0", 'method': method, 'params': params})
+
+    async def serve(self):
+        """Handle messages until exit or the end of the input; returns the exit code"""
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue()
+        try:
+            # Reading the descriptor directly leaves no stream lock held by the
+            # reader thread when the interpreter exits
+            read = functools.partial(os.read, self.input_stream.fileno())
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            read = getattr(self.input_stream, 'read1', self.input_stream.read)
+
+        def deliver(body):
+            try:
+                loop.call_soon_threadsafe(messages.put_nowait, body)
+            except RuntimeError:
+                # The loop closed after exit; input read since then is dropped
+                pass
+
+        reader = threading.Thread(
+            target=read_messages,
+            args=(read, deliver),
+            name="rpc-reader",
+            daemon=True,
+        )
+        reader.start()
+        try:
+            while self.exit_code is None:
+                body = await messages.get()
+                if body is None:
+                    break
+                self.dispatch(body)
+        finally:
+            for task in list(self._pending):
+                task.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.exit_code is None:
+            # Input closed without an exit notification
+            self.exit_code = 0 if self.shutting_down else 1
+        return self.exit_code
+
+    def _spawn(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    def dispatch(self, body):
+        try:
+            message = json.loads(body)
+        except ValueError as e:
+            self.send({'jsonrpc': "2.0", 'id': None, 'error': {'code': PARSE_ERROR, 'message': f"JSON inválido: {e}"}})
+            return
+        if not isinstance(message, dict) or not isinstance(message.get('method'), str):
+            if isinstance(message, dict) and 'method' not in message:
+                return  # A response to a request we never send
+            self.send({'jsonrpc': "2.0", 'id': None, 'error': {'code': INVALID_REQUEST, 'message': "Mensaje inválido"}})
+            return
+
+        method = message['method']
+        params = message.get('params') or {}
+        handler = self.handlers.get(method)
+        if 'id' not in message:
+            # Notifications run right away so edits are applied in order
+            if handler is None:
+                return
+            if not self.initialized and method != 'exit':
+                return
+            try:
+                handler(params)
+            except Exception as e:
+                print(f"Error al procesar {method}:\n{e}\n\n{traceback.format_exc()}", file=sys.stderr)
+            return
+        self._spawn(self._respond(message['id'], method, handler, params))
+
+    async def _respond(self, request_id, method, handler, params):
+        try:
+            if handler is None:
+                raise RequestError(METHOD_NOT_FOUND, f"Método desconocido: {method}")
+            if not self.initialized and method != 'initialize':
+                raise RequestError(SERVER_NOT_INITIALIZED, "El servidor no ha sido inicializado")
+            result = handler(params)
+            if asyncio.iscoroutine(result):
+                result = await result
+        except RequestError as e:
+            self.send({'jsonrpc': "2.0", 'id': request_id, 'error': {'code': e.code, 'message': e.message}})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error al procesar {method}:\n{e}\n\n{traceback.format_exc()}", file=sys.stderr)
+            self.send({'jsonrpc': "2.0", 'id': request_id, 'error': {'code': INTERNAL_ERROR, 'message': f"Error al procesar {method}: {e}"}})
+        else:
+            self.send({'jsonrpc': "2.0", 'id': request_id, 'result': result})
+
+    # Lifecycle
+
+    def initialize(self, params):
+        offered = params.get('capabilities', {}).get('general', {}).get('positionEncodings') or []
+        # Columns are code points, so UTF-32 needs no conversion at all
+        self.encoding = 'utf-32' if 'utf-32' in offered else 'utf-16'
+        self.initialized = True
+        return {
+            'capabilities': {
+                'positionEncoding': self.encoding,
+                'textDocumentSync': {'openClose': True, 'change': SYNC_INCREMENTAL},
+                'semanticTokensProvider': {
+                    'legend': {'tokenTypes': SEMANTIC_TOKEN_TYPES, 'tokenModifiers': []},
+                    'full': True,
+                },
+            },
+            'serverInfo': {'name': SERVER_NAME},
+        }
+
+    def ignore(self, params):
+        pass
+
+    def shutdown(self, params):
+        self.shutting_down = True
+        return None
+
+    def exit(self, params):
+        self.exit_code = 0 if self.shutting_down else 1
+
+    # Documents
+
+    def _document(self, params):
+        uri = params['textDocument']['uri']
+        document = self.documents.get(uri)
+        if document is None:
+            raise RequestError(INVALID_REQUEST, f"Documento no abierto: {uri}")
+        return document
+
+    def did_open(self, params):
+        item = params['textDocument']
+        previous = self.documents.get(item['uri'])
+        if previous is not None:
+            previous.closed = True
+        document = Document(item['uri'], item['text'], item.get('version'), self.cache)
+        self.documents[item['uri']] = document
+        self._schedule(document)
+
+    def did_change(self, params):
+        document = self._document(params)
+        document.change(params['contentChanges'], params['textDocument'].get('version'), self.encoding)
+        self._schedule(document)
+
+    def did_close(self, params):
+        document = self.documents.pop(params['textDocument']['uri'], None)
+        if document is None:
+            return
+        document.closed = True
+        for task in (document.task, document.check_task):
+            if task is not None:
+                task.cancel()
+        self.notify('textDocument/publishDiagnostics', {'uri': document.uri, 'diagnostics': []})
+
+    def _schedule(self, document):
+        if document.task is None:
+            document.task = self._spawn(self._analyze(document))
+
+    async def _analyze(self, document):
+        """Lex document until the lexer has the latest text, handing each
+        version to _check; requests only need the lexer, so they are answered
+        without waiting for parsing"""
+        loop = asyncio.get_running_loop()
+        try:
+            while not document.closed and not document.lexed.is_set():
+                generation = document.generation
+                text = document.text
+                version = document.version
+                edit = document.take_edit()
+
+                def cancelled():
+                    return document.closed or document.generation != generation
+
+                async with document.lock:
+                    try:
+                        tokens, lexical_errors = await loop.run_in_executor(
+                            self.executor, document.lex, text, edit, cancelled
+                        )
+                    except AnalysisCancelled:
+                        continue
+                    finally:
+                        if document.lexer.text is not text:
+                            document.restore_edit(edit)
+                        else:
+                            document.lex_count += 1
+                if cancelled():
+                    continue
+                document.lexed_version = version
+                document.lexed.set()
+                document.pending_check = (generation, version, text, tokens, lexical_errors)
+                if document.check_task is None:
+                    document.check_task = self._spawn(self._check(document))
+        except Exception as e:
+            print(f"Error al analizar {document.uri}:\n{e}\n\n{traceback.format_exc()}", file=sys.stderr)
+        finally:
+            document.task = None
+
+    async def _check(self, document):
+        """Parse and analyze the latest lexed version of document and publish
+        its diagnostics.
+
+        Runs alongside the lexer, so typing is never held up by a check. A
+        lex during a check shifts the tokens it is reading: its result is
+        dropped, along with what the semantic analyzer cached from it.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while document.pending_check is not None and not document.closed:
+                # Let a burst of edits settle before starting
+                await asyncio.sleep(CHECK_DELAY)
+                generation, version, text, tokens, lexical_errors = document.pending_check
+                document.pending_check = None
+                if generation != document.generation:
+                    continue
+                lex_count = document.lex_count
+
+                def cancelled():
+                    return document.closed or document.lex_count != lex_count
+
+                try:
+                    diagnostics = await loop.run_in_executor(
+                        self.executor, document.check, text, tokens, lexical_errors, cancelled, self.encoding
+                    )
+                except AnalysisCancelled:
+                    # Stopped before the semantic analyzer ran
+                    continue
+                except Exception as e:
+                    if not cancelled():
+                        print(f"Error al analizar {document.uri}:\n{e}\n\n{traceback.format_exc()}", file=sys.stderr)
+                    diagnostics = None
+                if cancelled():
+                    document.analyzer = SemanticAnalyzer()
+                    continue
+                if diagnostics is None:
+                    continue
+                params = {'uri': document.uri, 'diagnostics': diagnostics}
+                if version is not None:
+                    params['version'] = version
+                self.notify('textDocument/publishDiagnostics', params)
+        finally:
+            document.check_task = None
+
+    async def _current(self, params, work):
+        """Run work(document) on a worker thread once the lexer has the document's latest text"""
+        document = self._document(params)
+        loop = asyncio.get_running_loop()
+        while True:
+            await document.lexed.wait()
+            async with document.lock:
+                if document.closed:
+                    raise RequestError(INVALID_REQUEST, f"Documento cerrado: {document.uri}")
+                if document.lexed.is_set():
+                    return document, await loop.run_in_executor(self.executor, work, document)
+
+    async def semantic_tokens(self, params):
+        def work(document):
+            if document.semantic_data is None:
+                document.semantic_data = document.semantic_tokens(self.semantic_types, self.encoding)
+            return document.semantic_data
+
+        _, data = await self._current(params, work)
+        return {'data': data}
+
+    async def tokens(self, params):
+        document, tokens = await self._current(params, lambda document: document.token_list(self.encoding))
+        return {'uri': document.uri, 'version': document.lexed_version, 'tokens': tokens}
+
+
+def run_server(workers=DEFAULT_WORKERS, use_cache=True, input_stream=None, output_stream=None):
+    server = AnalysisServer(input_stream, output_stream, workers, CompileCache() if use_cache else None)
+    return asyncio.run(server.serve())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.server", description="Servidor de análisis JSON-RPC por stdio")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="hilos de análisis")
+    parser.add_argument("--no-cache", action="store_true", help="no usar la caché de compilación")
+    args = parser.parse_args(argv)
+    return run_server(args.workers, not args.no_cache)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Scoped symbol table backed by a chained hash table.
+
+Each name has at most one entry in the buckets: the innermost visible
+declaration, which links to the one it shadows. Opening a scope only records
+the length of an undo log; closing it replays the log backwards, restoring
+shadowed symbols and dropping the rest. Nothing is copied, so both are
+proportional to the declarations made inside the scope.
+"""
+import sys
+
+# Token type codes assigned by Lexer.TOKEN_TYPES
+IDENTIFIER = 2
+
+
+class Symbol:
+    __slots__ = ('name', 'var_type', 'line', 'column', 'level', 'location', 'lines', 'shadowed')
+
+    def __init__(self, name, var_type, line, column, level, location, shadowed=None):
+        self.name = name
+        self.var_type = var_type
+        self.line = line
+        self.column = column
+        self.level = level          # Scope depth, 0 = global
+        self.location = location    # Memory slot, in declaration order
+        self.lines = [line]         # Lines where the name appears
+        self.shadowed = shadowed    # Declaration of the same name in an outer scope
+
+    def __repr__(self):
+        return f"Symbol({self.name!r}, {self.var_type!r}, line={self.line}, level={self.level})"
+
+
+class SymbolTable:
+    INITIAL_BUCKETS = 64
+    MAX_LOAD_FACTOR = 0.75
+
+    def __init__(self):
+        self._buckets = [[] for _ in range(self.INITIAL_BUCKETS)]
+        self._mask = self.INITIAL_BUCKETS - 1
+        self._count = 0
+        self._log = []      # Symbols in declaration order, for undoing scopes
+        self._marks = []    # Log length when each open scope began
+        self._next_location = 0
+        self.resizes = 0
+
+    def __len__(self):
+        """Number of visible symbols"""
+        return self._count
+
+    def __contains__(self, name):
+        return self.lookup(name) is not None
+
+    def __iter__(self):
+        """Visible symbols, in no particular order"""
+        for bucket in self._buckets:
+            yield from bucket
+
+    @property
+    def level(self):
+        return len(self._marks)
+
+    def lookup(self, name):
+        """Innermost visible declaration of name, or None"""
+        for symbol in self._buckets[hash(name) & self._mask]:
+            # Interned names usually match by identity
+            if symbol.name is name or symbol.name == name:
+                return symbol
+        return None
+
+    def lookup_current(self, name):
+        """Declaration of name in the innermost scope only, or None"""
+        symbol = self.lookup(name)
+        if symbol is not None and symbol.level == self.level:
+            return symbol
+        return None
+
+    def declare(self, name, var_type, line=0, column=0):
+        """Add name to the current scope; returns the new Symbol, or None if
+        the scope already declares it"""
+        name = sys.intern(name)
+        bucket = self._buckets[hash(name) & self._mask]
+        for index, symbol in enumerate(bucket):
+            if symbol.name is name:
+                if symbol.level == self.level:
+                    return None
+                # Shadow the outer declaration in place
+                bucket[index] = new = Symbol(name, var_type, line, column, self.level, self._next_location, symbol)
+                break
+        else:
+            new = Symbol(name, var_type, line, column, self.level, self._next_location)
+            bucket.append(new)
+            self._count += 1
+            if self._count > len(self._buckets) * self.MAX_LOAD_FACTOR:
+                self._resize(len(self._buckets) * 2)
+        self._next_location += 1
+        self._log.append(new)
+        return new
+
+    def push_scope(self):
+        self._marks.append(len(self._log))
+
+    def pop_scope(self):
+        """Close the innermost scope, making shadowed declarations visible again"""
+        mark = self._marks.pop()
+        log = self._log
+        mask = self._mask
+        while len(log) > mark:
+            symbol = log.pop()
+            bucket = self._buckets[hash(symbol.name) & mask]
+            index = bucket.index(symbol)
+            if symbol.shadowed is not None:
+                bucket[index] = symbol.shadowed
+            else:
+                # Order inside a bucket does not matter: swap with the last entry
+                bucket[index] = bucket[-1]
+                bucket.pop()
+                self._count -= 1
+
+    def _resize(self, size):
+        buckets = [[] for _ in range(size)]
+        mask = size - 1
+        for bucket in self._buckets:
+            for symbol in bucket:
+                buckets[hash(symbol.name) & mask].append(symbol)
+        self._buckets = buckets
+        self._mask = mask
+        self.resizes += 1
+
+    def stats(self):
+        """Bucket usage figures for the current contents"""
+        lengths = [len(bucket) for bucket in self._buckets]
+        used = sum(1 for length in lengths if length)
+        return {
+            'buckets': len(lengths),
+            'entries': self._count,
+            'load_factor': self._count / len(lengths),
+            'used_buckets': used,
+            'longest_chain': max(lengths),
+            'average_chain': self._count / used if used else 0.0,
+            'resizes': self.resizes,
+        }
+
+
+def build_symbol_table(tokens):
+    """Fill a SymbolTable from the int/float declarations of a token list.
+
+    Scopes follow the braces of while/do/switch/case blocks and the bodies of
+    if/else; the block of main is the global scope. Returns (table, symbols):
+    the table holds the global declarations at the end of the program, and
+    symbols every declaration in source order, nested ones included. Uses of
+    a declared name are added to its Symbol.lines.
+    """
+    table = SymbolTable()
+    symbols = []
+    intern = sys.intern
+    declaring = None      # Type of the declaration expecting a name, if any
+    listing = None        # Type of the declaration a ',' would continue
+    if_parens = None      # Parenthesis depth while reading an if condition
+    braces = 0
+
+    for token in tokens:
+        value = token.value
+        if token.type == IDENTIFIER:
+            name = intern(value)
+            if declaring is not None:
+                symbol = table.declare(name, declaring, token.line, token.column)
+                listing, declaring = declaring, None
+                if symbol is not None:
+                    symbols.append(symbol)
+                    continue
+            symbol = table.lookup(name)
+            if symbol is not None and symbol.lines[-1] != token.line:
+                symbol.lines.append(token.line)
+            continue
+
+        if value == ',' and listing is not None:
+            declaring, listing = listing, None
+            continue
+        listing = None
+        declaring = value if value in ('int', 'float') else None
+
+        if value == '{':
+            braces += 1
+            if braces > 1:
+                table.push_scope()
+        elif value == '}':
+            braces -= 1
+            if table.level:
+                table.pop_scope()
+        elif value == 'if':
+            if_parens = 0
+        elif if_parens is not None and value == '(':
+            if_parens += 1
+        elif if_parens is not None and value == ')':
+            if_parens -= 1
+            if if_parens <= 0:
+                if_parens = None
+                table.push_scope()
+        elif value == 'else':
+            if table.level:
+                table.pop_scope()
+            table.push_scope()
+        elif value == 'end':
+            if table.level:
+                table.pop_scope()
+
+    return table, symbols
+
+
+def format_symbol_table(table, symbols):
+    """Render the declarations and the hash table statistics as text"""
+    lines = [f"{'Nombre':<20} {'Tipo':<6} {'Ámbito':>6} {'Loc':>6}  Líneas"]
+    for symbol in symbols:
+        lines.append(
+            f"{symbol.name:<20} {symbol.var_type:<6} {symbol.level:>6} {symbol.location:>6}  "
+            + ", ".join(map(str, symbol.lines))
+        )
+    stats = table.stats()
+    lines += [
+        "",
+        f"Símbolos declarados: {len(symbols)}",
+        f"Símbolos globales: {stats['entries']}",
+        f"Cubetas: {stats['buckets']} ({stats['used_buckets']} ocupadas)",
+        f"Factor de carga: {stats['load_factor']:.2f}",
+        f"Cadena más larga: {stats['longest_chain']}, promedio: {stats['average_chain']:.2f}",
+        f"Redimensionamientos: {stats['resizes']}",
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,241 @@
+"""Compact token streams kept in typed arrays.
+
+    buffer = TokenBuffer.from_source(code)     # lexed straight into the arrays
+    tokens, errors = buffer.split(code)        # the lists Lexer().tokenize(code) returns
+
+Each item, token or lexical error, takes 21 bytes: its type (ERROR_TYPE for
+an error), start offset, length, line and column. Values are sliced back out
+of the text only when an item is built, and error messages are kept in a
+list, in source order. This is the storage of the token cache, the parallel
+lexer and the IDE's incremental lexer, which keeps one buffer per piece of
+the document and adds each piece's offset and line delta when reading it.
+"""
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .lexer import COMBINED_REGEX, COMBINED_TYPES, ERROR_MESSAGES, LexicalError, Token
+
+# (attribute, typecode) of the per-item arrays, in storage order
+ITEM_ARRAYS = (('types', 'B'), ('starts', 'Q'), ('lengths', 'I'), ('lines', 'I'), ('columns', 'I'))
+# Type stored for a lexical error
+ERROR_TYPE = 0
+# IDENTIFIER and RESERVED values are interned: the same names repeat a lot
+INTERNED_TYPES = (2, 4)
+# How many items to scan between checks of the cancellation callback
+CANCEL_CHECK_INTERVAL = 4096
+
+
+class TokenBuffer:
+    """Tokens and lexical errors of a text, in source order, as typed arrays"""
+
+    def __init__(self, arrays=None, messages=None):
+        if arrays is None:
+            arrays = [array(typecode) for _, typecode in ITEM_ARRAYS]
+        self.types, self.starts, self.lengths, self.lines, self.columns = arrays
+        self.messages = messages if messages is not None else []
+        self._error_indexes = None
+        self._token_gaps = None
+
+    @classmethod
+    def from_source(cls, code):
+        """Tokenize code straight into a buffer, without building Token objects"""
+        buffer = cls()
+        buffer.scan(code)
+        return buffer
+
+    @property
+    def arrays(self):
+        return self.types, self.starts, self.lengths, self.lines, self.columns
+
+    def __len__(self):
+        return len(self.types)
+
+    @property
+    def error_count(self):
+        return len(self.messages)
+
+    @property
+    def token_count(self):
+        return len(self.types) - len(self.messages)
+
+    @property
+    def nbytes(self):
+        """Memory used by the per-item arrays"""
+        return sum(values.itemsize * len(values) for values in self.arrays)
+
+    # Building
+
+    def scan(self, code, pos=0, line=1, line_start=0, offset=0, stop_from=None, stop=None, cancelled=None):
+        """Lex code from offset pos onto the end of the buffer; returns False
+        if cancelled() said so, leaving the items scanned until then.
+
+        line is the line number at pos and line_start the offset where that
+        line begins; offset is added to every stored start (e.g. where code
+        lies in a larger text). From offset stop_from on, each item is first
+        passed to stop(token_type, start, end, line, column, message); when
+        that returns True the scan ends before the item.
+        """
+        types, starts, lengths = self.types.append, self.starts.append, self.lengths.append
+        lines, columns = self.lines.append, self.columns.append
+        add_message = self.messages.append
+        self._error_indexes = None
+        if stop is None:
+            stop_from = len(code) + 1
+        count = 0
+        for m in COMBINED_REGEX.finditer(code, pos):
+            kind = m.lastgroup
+            if kind == 'WHITESPACE':
+                continue
+            if kind == 'NEWLINE':
+                line += 1
+                line_start = m.end()
+                continue
+
+            start, end = m.span()
+            message = ERROR_MESSAGES.get(kind)
+            if message is None:
+                token_type = COMBINED_TYPES[kind]
+                if callable(token_type):
+                    token_type = token_type(code[start:end])
+            else:
+                token_type = ERROR_TYPE
+            if start >= stop_from and stop(token_type, start, end, line, start - line_start + 1, message):
+                return True
+            if cancelled is not None:
+                count += 1
+                if count % CANCEL_CHECK_INTERVAL == 0 and cancelled():
+                    return False
+
+            types(token_type)
+            starts(start + offset)
+            lengths(end - start)
+            lines(line)
+            columns(start - line_start + 1)
+            if message is not None:
+                add_message(message)
+
+            if kind == 'BLOCK_COMMENT':
+                newlines = code.count('\n', start, end)
+                if newlines:
+                    line += newlines
+                    line_start = code.rfind('\n', start, end) + 1
+        return True
+
+    def append(self, token_type, start, length, line, column, message=None):
+        """Add one item to the end of the buffer; message is required for errors"""
+        self.types.append(token_type)
+        self.starts.append(start)
+        self.lengths.append(length)
+        self.lines.append(line)
+        self.columns.append(column)
+        if token_type == ERROR_TYPE:
+            self.messages.append(message)
+            self._error_indexes = None
+
+    def extend(self, other, offset=0, line_offset=0):
+        """Add the items of other, with offset and line_offset added to their
+        starts and lines"""
+        self.types.extend(other.types)
+        if offset:
+            self.starts.extend(array('Q', [start + offset for start in other.starts]))
+        else:
+            self.starts.extend(other.starts)
+        self.lengths.extend(other.lengths)
+        if line_offset:
+            self.lines.extend(array('I', [line + line_offset for line in other.lines]))
+        else:
+            self.lines.extend(other.lines)
+        self.columns.extend(other.columns)
+        self.messages.extend(other.messages)
+        self._error_indexes = None
+        self._token_gaps = None
+
+    def slice(self, start, stop):
+        """New buffer with the items [start, stop)"""
+        errors = self.error_indexes()
+        first, last = bisect_left(errors, start), bisect_left(errors, stop)
+        return TokenBuffer([values[start:stop] for values in self.arrays], self.messages[first:last])
+
+    # Reading
+
+    def error_indexes(self):
+        """Index of each error in the buffer, in order"""
+        if self._error_indexes is None:
+            types = self.types.tobytes()
+            indexes = []
+            index = types.find(ERROR_TYPE)
+            while index >= 0:
+                indexes.append(index)
+                index = types.find(ERROR_TYPE, index + 1)
+            # Tokens before each error; the count of these that are <= n is
+            # the number of errors in front of the n-th token
+            self._token_gaps = [index - count for count, index in enumerate(indexes)]
+            self._error_indexes = indexes
+        return self._error_indexes
+
+    def token_index(self, number):
+        """Index of the token that comes number-th among the tokens"""
+        self.error_indexes()
+        return number + bisect_right(self._token_gaps, number)
+
+    def message(self, index):
+        """Message of the error at index"""
+        return self.messages[bisect_left(self.error_indexes(), index)]
+
+    def item(self, index, text, offset=0, line_offset=0, column_offset=0):
+        """Token or LexicalError at index, its value sliced from text.
+
+        offset and line_offset are added to the stored start and line, and
+        column_offset to the column of the items on the buffer's first line.
+        """
+        token_type = self.types[index]
+        start = self.starts[index] + offset
+        value = text[start:start + self.lengths[index]]
+        line = self.lines[index]
+        column = self.columns[index]
+        if column_offset and line == self.lines[0]:
+            column += column_offset
+        if token_type == ERROR_TYPE:
+            return LexicalError(value, line + line_offset, column, self.message(index), start)
+        if token_type in INTERNED_TYPES:
+            value = sys.intern(value)
+        return Token(token_type, value, line + line_offset, column, start)
+
+    def items(self, text, offset=0, line_offset=0, column_offset=0, start=0, stop=None):
+        """Tokens and LexicalErrors [start, stop) in source order; the
+        offsets are applied as in item()"""
+        stop = len(self.types) if stop is None else stop
+        errors = self.error_indexes()
+        messages = iter(self.messages[bisect_left(errors, start):bisect_left(errors, stop)])
+        first_line = self.lines[0] if column_offset and self.lines else None
+        intern = sys.intern
+        items = []
+        append = items.append
+        for token_type, begin, length, line, column in zip(
+            self.types[start:stop], self.starts[start:stop], self.lengths[start:stop], self.lines[start:stop],
+            self.columns[start:stop],
+        ):
+            begin += offset
+            value = text[begin:begin + length]
+            if line == first_line:
+                column += column_offset
+            if token_type == ERROR_TYPE:
+                append(LexicalError(value, line + line_offset, column, next(messages), begin))
+            else:
+                if token_type in INTERNED_TYPES:
+                    value = intern(value)
+                append(Token(token_type, value, line + line_offset, column, begin))
+        return items
+
+    def errors(self, text, offset=0, line_offset=0, column_offset=0):
+        """Just the LexicalErrors, without building the tokens"""
+        return [self.item(index, text, offset, line_offset, column_offset) for index in self.error_indexes()]
+
+    def split(self, text):
+        """(tokens, errors), as Lexer.tokenize returns them"""
+        tokens = []
+        errors = []
+        for item in self.items(text):
+            (tokens if isinstance(item, Token) else errors).append(item)
+        return tokens, errors
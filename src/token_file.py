@@ -0,0 +1,124 @@
+import mmap
+import struct
+from bisect import bisect_left, bisect_right
+
+from .lexer import Token
+
+# File layout (little endian):
+#   header   magic "TOKB", version, reserved, token count, string table size
+#   records  one fixed-width record per token, in source order
+#   strings  UTF-8 token values, each distinct value stored once
+MAGIC = b'TOKB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQ')
+# type, padding, value length (bytes), value offset in the string table,
+# source offset, line, column
+RECORD = struct.Struct('<B3xIQQII')
+
+
+def write_token_file(tokens, filename="tokens.bin"):
+    """Write tokens to filename in the binary format with a single write"""
+    tokens = list(tokens)
+    records = bytearray(RECORD.size * len(tokens))
+    strings = bytearray()
+    value_offsets = {}
+    pack_into = RECORD.pack_into
+
+    for index, token in enumerate(tokens):
+        value = token.value
+        entry = value_offsets.get(value)
+        if entry is None:
+            encoded = value.encode('utf-8')
+            entry = value_offsets[value] = (len(strings), len(encoded))
+            strings += encoded
+        offset, length = entry
+        source_offset = token.offset if token.offset is not None else 0
+        pack_into(records, index * RECORD.size, token.type, length, offset, source_offset, token.line, token.column)
+
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(tokens), len(strings)) + records + strings)
+
+
+class TokenFile:
+    """Memory-mapped reader for files written by write_token_file.
+
+    Records are decoded on access, so opening a file costs the same no matter
+    how many tokens it holds. Tokens are stored in source order, which makes
+    lookups by line a binary search over the record table.
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file: mmap refuses zero-length mappings
+            self._file.close()
+            raise ValueError(f"{filename} no es un archivo de tokens válido")
+
+        magic, version, _, self._count, strings_size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{filename} no es un archivo de tokens válido")
+        self._records = HEADER.size
+        self._strings = self._records + self._count * RECORD.size
+        if self._strings + strings_size > len(self._map):
+            self.close()
+            raise ValueError(f"{filename} está truncado")
+        self._view = memoryview(self._map)
+
+    def close(self):
+        if getattr(self, '_view', None) is not None:
+            self._view.release()
+            self._view = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def record(self, index):
+        """Return (type, value length, value offset, source offset, line, column) for a token"""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("token index out of range")
+        return RECORD.unpack_from(self._map, self._records + index * RECORD.size)
+
+    def value_bytes(self, index):
+        """Return the UTF-8 value of a token as a zero-copy memoryview.
+
+        Release the view before closing the file.
+        """
+        _, length, offset, _, _, _ = self.record(index)
+        start = self._strings + offset
+        return self._view[start:start + length]
+
+    def line_of(self, index):
+        return self.record(index)[4]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        token_type, length, offset, source_offset, line, column = self.record(index)
+        start = self._strings + offset
+        value = self._map[start:start + length].decode('utf-8')
+        return Token(token_type, value, line, column, source_offset)
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def line_range(self, line):
+        """Return the range of token indexes that start on the given line"""
+        indexes = range(self._count)
+        return range(bisect_left(indexes, line, key=self.line_of), bisect_right(indexes, line, key=self.line_of))
+
+    def tokens_on_line(self, line):
+        return [self[index] for index in self.line_range(line)]
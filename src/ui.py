@@ -1,19 +1,106 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+import tkinter.font as tkfont
+from tkinter import filedialog, messagebox, simpledialog
+from bisect import bisect_left
+import io
+import json
+from operator import attrgetter
 import subprocess
 import sys
 import os
 
-# Add the src directory to the path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+if __package__ in (None, ""):
+    # Running as a script (python src/ui.py): make the src package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.lexer import Lexer
+from src.incremental import IncrementalLexer
+from src.parser import Parser, format_tree
+from src.symbol_table import build_symbol_table, format_symbol_table
+from src.semantic import SemanticAnalyzer, format_declarations
+from src.intermediate import IntermediateGenerator
+from src.optimizer import LEVELS, PassManager, format_report
+from src.vm import StreamIO, VirtualMachine, VMError, assemble
+from src.pycodegen import CodegenError, PythonBackend
+from src.cache import CompileCache, content_hash
+from src.profiling import Profiler
+from src.virtual_text import ItemRows, VirtualText
+from src.worker import AnalysisCancelled, AnalysisWorker
+
+class DialogInput:
+    """Input stream for cin that asks for each line in a dialog"""
+
+    def __init__(self, parent):
+        self.parent = parent
+
+    def readline(self):
+        text = simpledialog.askstring("Entrada", "Valor para cin:", parent=self.parent)
+        # Cancelling ends the input
+        return "" if text is None else text + "\n"
 
-# Now import Lexer
-from lexer import Lexer
 
 class IDE:
+    # Lines above and below the viewport that are highlighted eagerly
+    HIGHLIGHT_MARGIN = 50
+    # Marks text whose highlighting is waiting for it to scroll into view
+    PENDING_HIGHLIGHT_TAG = "highlight_pending"
+    # How often the Tk thread checks for finished analyses (ms)
+    ANALYSIS_POLL_MS = 30
+    # Quadruples shown per page of the Intermedio view
+    QUADS_PER_PAGE = 500
+    # Instructions a program run from the IDE may execute
+    EXECUTION_BUDGET = 10_000_000
+    # Refresh period of the open profiling panel (ms)
+    PROFILE_REFRESH_MS = 1000
+
     def __init__(self, root):
-        self.last_analysis_text = ""
         self._syntax_highlight_after = None
+        # Phase timers and counters of the analyses, shown in the Perfil panel
+        self.profiler = Profiler()
+        self.profile_window = None
+        self._profile_after = None
+        # What the gutter last drew, to skip redundant redraws
+        self._gutter_state = None
+        self._gutter_digits = 0
+        self.lexer = Lexer()
+        self.parser = Parser()
+        # Keeps per-block results between runs
+        self.semantic_analyzer = SemanticAnalyzer()
+        self.intermediate_generator = IntermediateGenerator()
+        # Artifacts of earlier runs, shared by every phase that can reuse them
+        self.compile_cache = CompileCache()
+        # Compiled programs by content hash, for the Python execution backend
+        self.python_backend = PythonBackend(self.compile_cache)
+        self.intermediate = None
+        self._intermediate_page = 0
+        # Passes run on the last generated code, shown above the listing
+        self._optimization_level_used = 0
+        self._optimization_reports = []
+        # Token stream kept between analyses so edits only re-lex what changed
+        self.incremental_lexer = IncrementalLexer(self.compile_cache)
+        # Full token list the lazy highlighter pulls from
+        self._highlight_tokens = []
+        self._highlight_after = None
+        # Unchanged characters at the start/end of the text since the last analysis
+        self._edit_prefix = None
+        self._edit_suffix = None
+        # Analysis runs on a background thread. Generations number the snapshots
+        # sent to it so results for outdated text can be told apart.
+        self.analysis_worker = AnalysisWorker(self._analyze_snapshot, self._fold_edit_range)
+        self._analysis_generation = 0   # Last snapshot submitted
+        self._received_generation = 0   # Last result collected
+        self._applied_generation = 0    # Last result whose changes were highlighted
+        self._result_generation = 0     # Last result produced (worker thread)
+        self._analysis_poll_after = None
+        # Edit range of snapshots that have not reached the lexer yet, and
+        # whether one of them asked for tokens.txt (worker thread)
+        self._carry_prefix = None
+        self._carry_suffix = None
+        self._carry_save_tokens = False
+        # Token stream of the last result, shared by the later phases, and a
+        # phase waiting for the stream of the current text
+        self._stream = None
+        self._waiting_phase = None
         # Define color scheme
         self.colors = {
             'bg_main': '#1a1a2e',  # Dark navy blue
@@ -108,21 +195,15 @@ class IDE:
         self.editor_with_lines_frame = tk.Frame(self.editor_frame, bg=self.colors['bg_main'])
         self.editor_with_lines_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        # Line numbers text widget - adjust width and add proper styling
-        self.line_numbers = tk.Text(self.editor_with_lines_frame, width=4)
+        # Line numbers gutter: a canvas that only draws the visible lines
+        self.line_numbers = tk.Canvas(self.editor_with_lines_frame, width=40)
         self.line_numbers.pack(side=tk.LEFT, fill=tk.Y)
         self.line_numbers.config(
             bg=self.colors['bg_main'],
-            fg=self.colors['fg_secondary'],
-            font=self.fonts['line_numbers'],
-            padx=5,
-            pady=5,
             borderwidth=0,
-            highlightthickness=0,
-            spacing1=2,  # Match main editor spacing
-            spacing2=2,
-            spacing3=2
+            highlightthickness=0
         )
+        self.line_numbers_font = tkfont.Font(font=self.fonts['line_numbers'])
 
         # Main text area - ensure consistent spacing
         self.text_area = tk.Text(self.editor_with_lines_frame, wrap=tk.NONE, undo=True)  # Changed wrap to NONE
@@ -146,9 +227,12 @@ class IDE:
         self.editor_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Configure editor scrollbar
-        self.text_area.config(yscrollcommand=self.editor_scroll.set)
+        self.text_area.config(yscrollcommand=self.on_text_scrolled)
         self.editor_scroll.config(command=self.on_scroll)  # Use on_scroll instead of yview
 
+        # Record the range touched by every edit for incremental analysis
+        self._track_text_edits()
+
         # Bind events for updating line numbers and cursor position
         self.text_area.bind('<Key>', self.update_line_numbers)
         self.text_area.bind('<KeyRelease>', lambda e: (self.update_line_numbers(), self.update_cursor_position()))
@@ -170,11 +254,6 @@ class IDE:
         self.cursor_label = tk.Label(self.main_frame, text="Línea: 1, Columna: 1")
         self.cursor_label.pack(side=tk.BOTTOM, anchor=tk.SE, padx=5, pady=2)
 
-        # Configure line numbers
-        self.line_numbers.tag_configure('line', justify='right')
-        self.line_numbers.config(bg=self.colors['bg_main'], fg=self.colors['fg_secondary'])
-        self.line_numbers.config(state='disabled')
-
         # Frame inferior para resultados y errores
         self.output_frame = tk.Frame(self.main_frame, bg=self.colors['bg_main'])
         self.main_frame.add(self.output_frame, stretch="always")
@@ -217,6 +296,19 @@ class IDE:
                                       command=lambda: self.show_result("intermedio"))
         self.btn_intermedio.pack(side=tk.LEFT, padx=2)
 
+        # Paging for the intermediate code listing
+        self.btn_next_page = tk.Button(self.results_buttons_frame, text="▶",
+                                       command=lambda: self.show_intermediate_page(self._intermediate_page + 1))
+        self.btn_next_page.pack(side=tk.RIGHT, padx=2)
+
+        self.btn_prev_page = tk.Button(self.results_buttons_frame, text="◀",
+                                       command=lambda: self.show_intermediate_page(self._intermediate_page - 1))
+        self.btn_prev_page.pack(side=tk.RIGHT, padx=2)
+
+        # Jump the editor and both panes to a source line
+        self.btn_go_to_line = tk.Button(self.results_buttons_frame, text="Ir a línea", command=self.go_to_line)
+        self.btn_go_to_line.pack(side=tk.RIGHT, padx=2)
+
         # Área de texto para resultados (después de los botones)
         self.result_text = tk.Text(self.results_frame)  # Increased height from 10 to 15
 
@@ -255,18 +347,12 @@ class IDE:
         self.result_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.result_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # Configure results scrollbar
-        self.result_text.config(yscrollcommand=self.result_scroll.set)
-        self.result_scroll.config(command=self.result_text.yview)
 
         # Error scrollbar setup
         self.error_scroll = tk.Scrollbar(self.errors_frame)
         self.error_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.error_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # Configure error scrollbar
-        self.error_text.config(yscrollcommand=self.error_scroll.set)
-        self.error_scroll.config(command=self.error_text.yview)
 
         # Configurar colores para diferenciar las áreas
         self.text_area.config(
@@ -293,17 +379,6 @@ class IDE:
             fg=self.colors['fg_main']
         )
 
-        # Update line numbers configuration
-        self.line_numbers.config(
-            bg=self.colors['bg_main'],
-            fg=self.colors['fg_secondary'],
-            font=self.fonts['line_numbers'],
-            pady=5,
-            padx=5,
-            borderwidth=0,
-            highlightthickness=0
-        )
-
         # Update result and error text areas
         for text_widget in [self.result_text, self.error_text]:
             text_widget.config(
@@ -318,9 +393,10 @@ class IDE:
                 highlightbackground=self.colors['accent']
             )
 
-        # Make error and result text readonly
-        self.result_text.config(state='disabled')
-        self.error_text.config(state='disabled')
+        # Read-only panes that only render the rows in view; double-clicking a
+        # token or error row moves the editor's cursor to it
+        self.result_view = VirtualText(self.result_text, self.result_scroll, on_activate=self.go_to_position)
+        self.error_view = VirtualText(self.error_text, self.error_scroll, on_activate=self.go_to_position)
 
         # Añadir frame para botones
         self.button_frame = tk.Frame(self.root, bg=self.colors['bg_main'])
@@ -347,7 +423,30 @@ class IDE:
         self.compile_menu.add_command(label="Análisis Sintáctico", command=self.syntax_analysis)
         self.compile_menu.add_command(label="Análisis Semántico", command=self.semantic_analysis)
         self.compile_menu.add_command(label="Código Intermedio", command=self.intermediate_code)
-        self.compile_menu.add_command(label="Ejecutar", command=self.execute_code)
+        self.compile_menu.add_separator()
+
+        # Ejecutar: comando y motor de ejecución
+        self.execution_backend = tk.StringVar(value="vm")
+        self.execute_menu = tk.Menu(self.compile_menu, tearoff=0)
+        self.compile_menu.add_cascade(label="Ejecutar", menu=self.execute_menu)
+        self.execute_menu.add_command(label="Ejecutar", command=self.execute_code)
+        self.execute_menu.add_separator()
+        self.execute_menu.add_radiobutton(label="Máquina virtual", variable=self.execution_backend, value="vm")
+        self.execute_menu.add_radiobutton(label="Código Python compilado", variable=self.execution_backend, value="python")
+
+        # Nivel de optimización del código intermedio
+        self.optimization_level = tk.IntVar(value=max(LEVELS))
+        self.optimization_menu = tk.Menu(self.compile_menu, tearoff=0)
+        self.compile_menu.add_cascade(label="Optimización", menu=self.optimization_menu)
+        for level, label in ((0, "O0 - Sin optimizar"), (1, "O1 - Plegado y código muerto"), (2, "O2 - Todas")):
+            self.optimization_menu.add_radiobutton(label=label, variable=self.optimization_level, value=level)
+
+        # Herramientas: instrumentación del análisis
+        self.tools_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Herramientas", menu=self.tools_menu)
+        self.tools_menu.add_command(label="Perfil de rendimiento", command=self.show_profile_panel)
+        self.tools_menu.add_command(label="Ir a línea", command=self.go_to_line, accelerator="Ctrl+G")
+        self.root.bind('<Control-g>', self.go_to_line)
 
         # Botones directos en la barra de menú
         self.menu_bar.add_command(label="Léxico", command=self.lexical_analysis)
@@ -374,7 +473,7 @@ class IDE:
         # Apply style to all buttons
         all_buttons = [
             self.btn_lexico, self.btn_sintactico, self.btn_semantico, 
-            self.btn_tabla, self.btn_intermedio, self.btn_err_lexico, 
+            self.btn_tabla, self.btn_intermedio, self.btn_prev_page, self.btn_next_page, self.btn_go_to_line, self.btn_err_lexico, 
             self.btn_err_sintactico, self.btn_err_semantico, 
             self.btn_err_resultados  # Removed btn_err_intermedio from this list
         ]
@@ -392,6 +491,9 @@ class IDE:
         
         self.file_menu.configure(**menu_config)
         self.compile_menu.configure(**menu_config)
+        self.optimization_menu.configure(**menu_config)
+        self.execute_menu.configure(**menu_config)
+        self.tools_menu.configure(**menu_config)
 
         # Update menu configuration
         menu_config.update({
@@ -423,10 +525,80 @@ class IDE:
             foreground=self.colors['fg_main']
         )
 
+        # One tag per token type, configured once
+        for token_type in self.lexer.TOKEN_TYPES.values():
+            self.text_area.tag_configure(f"token_{token_type}", foreground=self.lexer.get_color_for_token_type(token_type))
+        self.text_area.tag_raise("sel")
+
+    def _track_text_edits(self):
+        """Route the editor's Tcl command through a proxy that records modified ranges.
+
+        The proxy is a Tcl procedure that reports each command to Python and
+        then runs the real widget command itself, so the widget's errors reach
+        the caller unchanged (tk_textCopy relies on "get sel.first sel.last"
+        failing when nothing is selected).
+        """
+        widget = str(self.text_area)
+        self._text_widget_cmd = widget + "_orig"
+        self.root.tk.call("rename", widget, self._text_widget_cmd)
+        note = self.root.register(self._note_text_command)
+        self.root.tk.call(
+            "proc", widget, "command args",
+            f"{note} $command {{*}}$args\n{self._text_widget_cmd} $command {{*}}$args"
+        )
+
+    def _note_text_command(self, command, *args):
+        """Note which characters an edit is about to change"""
+        self.profiler.count('tcl_calls')
+        if command in ("insert", "delete", "replace"):
+            self._record_edit(command, args)
+        elif command == "edit" and args and str(args[0]) in ("undo", "redo"):
+            # Tk does not say what undo/redo touched: assume everything
+            self._edit_prefix, self._edit_suffix = 0, 0
+
+    def _record_edit(self, command, args):
+        """Shrink the known-unchanged prefix/suffix to exclude an edit"""
+        call = self.root.tk.call
+        widget = self._text_widget_cmd
+
+        def offset(index):
+            return int(call(widget, "count", "-chars", "1.0", index) or 0)
+
+        try:
+            length = offset("end - 1c")
+            if command == "insert":
+                positions = [offset(args[0])]
+            elif command == "delete" and len(args) == 1:
+                start = offset(args[0])
+                positions = [start, start + 1]
+            else:
+                # delete index1 index2 ... / replace index1 index2 chars
+                indexes = args if command == "delete" else args[:2]
+                positions = [offset(index) for index in indexes]
+        except tk.TclError:
+            # Unknown index: fall back to treating the whole text as changed
+            self._edit_prefix, self._edit_suffix = 0, 0
+            return
+
+        start = min(min(positions), length)
+        end = min(max(positions), length)
+        prefix, suffix = start, length - end
+        if self._edit_prefix is None:
+            self._edit_prefix, self._edit_suffix = prefix, suffix
+        else:
+            self._edit_prefix = min(self._edit_prefix, prefix)
+            self._edit_suffix = min(self._edit_suffix, suffix)
+
+    def on_text_scrolled(self, first, last):
+        """Keep the scrollbar and gutter in sync and highlight text scrolled into view"""
+        self.editor_scroll.set(first, last)
+        self.redraw_line_numbers()
+        if self._highlight_after is None:
+            self._highlight_after = self.root.after_idle(self._highlight_scrolled)
+
     def on_scroll(self, *args):
         """Handle scrolling of text area and line numbers"""
         self.text_area.yview(*args)
-        self.line_numbers.yview(*args)
         self.update_line_numbers()
 
     def open_file(self):
@@ -438,7 +610,7 @@ class IDE:
                 self.text_area.delete(1.0, tk.END)
                 self.text_area.insert(tk.END, content)
                 self.update_line_numbers()  # Add this line
-                self.lexical_analysis()
+                self.lexical_analysis(save_tokens=False)
 
     def save_file(self):
         """Guarda el archivo actual"""
@@ -446,6 +618,8 @@ class IDE:
             with open(self.filename, "w") as file:
                 content = self.text_area.get(1.0, tk.END)
                 file.write(content)
+            # Saving also refreshes tokens.txt
+            self.lexical_analysis()
         else:
             self.save_as_file()
 
@@ -456,109 +630,474 @@ class IDE:
             self.save_file()
 
     def update_result(self, text):
-        """Update the result text area"""
-        self.result_text.config(state='normal')
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(tk.END, text)
-        self.result_text.config(state='disabled')
+        """Update the result text area with a string or a row sequence (ItemRows)"""
+        if isinstance(text, str):
+            self.result_view.set_text(text)
+        else:
+            self.result_view.set_rows(text)
 
     def update_error(self, text):
-        """Update the error text area"""
-        self.error_text.config(state='normal')
-        self.error_text.delete(1.0, tk.END)
-        self.error_text.insert(tk.END, text)
-        self.error_text.config(state='disabled')
-
-    def lexical_analysis(self):
-        """Performs lexical analysis on the code"""
-        try:
-            code = self.text_area.get(1.0, tk.END)
-            lexer = Lexer()
-            tokens, errors = lexer.tokenize(code, save_to_file=True, output_filename="tokens.txt")
-            
-            # Store the analyzed text to avoid unnecessary repeated analysis
-            self.last_analysis_text = code
-            
-            # Update result with tokens
-            result_text = "Análisis léxico realizado...\n\n"
-            for token in tokens:
-                result_text += str(token) + "\n"
-            self.update_result(result_text)
-            
-            # Update error with errors
-            if errors:
-                error_text = "Se encontraron errores léxicos:\n\n"
-                for error in errors:
-                    error_text += str(error) + "\n"
-                self.update_error(error_text)
-            else:
-                self.update_error("No se encontraron errores léxicos\n")
-            
-            # Apply syntax highlighting
-            self.apply_syntax_highlighting(tokens)
-        except Exception as e:
-            import traceback
-            error_message = f"Error al realizar el análisis léxico:\n{str(e)}\n\n"
-            error_message += traceback.format_exc()
+        """Update the error text area with a string or a row sequence (ItemRows)"""
+        if isinstance(text, str):
+            self.error_view.set_text(text)
+        else:
+            self.error_view.set_rows(text)
+
+    def go_to_position(self, line, column):
+        """Move the editor's cursor to a source position and show it"""
+        index = f"{line}.{column - 1}"
+        self.text_area.mark_set(tk.INSERT, index)
+        self.text_area.see(index)
+        self.text_area.focus_set()
+        self.update_line_numbers()
+        self.update_cursor_position()
+
+    def go_to_line(self, event=None):
+        """Ask for a line, move the editor there and scroll both panes to its rows"""
+        last_line = int(self.text_area.index("end-1c").split('.')[0])
+        line = simpledialog.askinteger("Ir a línea", f"Número de línea (1-{last_line}):",
+                                       parent=self.root, minvalue=1, maxvalue=last_line)
+        if line is None:
+            return "break"
+        self.go_to_position(line, 1)
+        self.result_view.show_line(line)
+        self.error_view.show_line(line)
+        return "break"
+
+    def lexical_analysis(self, save_tokens=True):
+        """Performs lexical analysis on the code in the background.
+
+        tokens.txt is written only when save_tokens is set, i.e. for the
+        Léxico command and when the file is saved, not after every edit.
+        """
+        code = self.text_area.get(1.0, tk.END)
+        self._analysis_generation += 1
+        self.analysis_worker.submit(
+            self._analysis_generation,
+            (self._analysis_generation, code, self._edit_prefix, self._edit_suffix, save_tokens)
+        )
+        self._edit_prefix = self._edit_suffix = None
+        if self._analysis_poll_after is None:
+            self._analysis_poll_after = self.root.after(self.ANALYSIS_POLL_MS, self._poll_analysis)
+
+    def _fold_edit_range(self, job):
+        """Merge a snapshot's edit range, and its request for tokens.txt, into
+        what is carried to the lexer (worker thread)"""
+        _, _, prefix, suffix, save_tokens = job
+        self._carry_save_tokens = self._carry_save_tokens or save_tokens
+        if prefix is None:
+            return
+        if self._carry_prefix is None:
+            self._carry_prefix, self._carry_suffix = prefix, suffix
+        else:
+            self._carry_prefix = min(self._carry_prefix, prefix)
+            self._carry_suffix = min(self._carry_suffix, suffix)
+
+    def _analyze_snapshot(self, job, is_cancelled):
+        """Lex a snapshot of the editor and build the result texts (worker thread)"""
+        generation, code = job[:2]
+        self._fold_edit_range(job)
+        if self._applied_generation == self._result_generation:
+            # Every change reported so far is already highlighted
+            self.incremental_lexer.clear_dirty()
+
+        profiler = self.profiler
+        with profiler.capture():
+            # Re-lex only the region touched since the last analysis
+            with profiler.phase('scan'):
+                lexed = self.incremental_lexer.update(code, self._carry_prefix, self._carry_suffix, is_cancelled)
+            if not lexed:
+                raise AnalysisCancelled()
+            self._carry_prefix = self._carry_suffix = None
+            # An immutable snapshot: the Tk thread reads it while this thread
+            # lexes the next edit
+            stream = self.incremental_lexer.stream
+            tokens = stream.tokens
+            errors = stream.errors
+            first, stop = self.incremental_lexer.changed_items
+            start, end = self.incremental_lexer.changed_range
+            profiler.count('runs')
+            profiler.count('tokens', stop - first)
+            profiler.count('chars', end - start)
+            if is_cancelled():
+                raise AnalysisCancelled()
+
+            if self._carry_save_tokens:
+                with profiler.phase('save'):
+                    self.lexer.save_tokens_to_file(tokens, "tokens.txt")
+                profiler.count('bytes_written', os.path.getsize("tokens.txt"))
+                self._carry_save_tokens = False
+            # Rows are formatted when they scroll into view, not here
+            with profiler.phase('report_text'):
+                result_rows = ItemRows("Análisis léxico realizado...\n", tokens)
+                if errors:
+                    error_rows = ItemRows("Se encontraron errores léxicos:\n", errors)
+                else:
+                    error_rows = ItemRows("No se encontraron errores léxicos", [])
+
+        self._result_generation = generation
+        return {
+            'stream': stream,
+            'tokens': tokens,
+            'result_rows': result_rows,
+            'error_rows': error_rows,
+            'dirty_range': self.incremental_lexer.dirty_range or (0, 0),
+            'token_diff': self.incremental_lexer.token_diff,
+        }
+
+    def _poll_analysis(self):
+        """Collect the newest analysis result, if any, on the Tk thread"""
+        self._analysis_poll_after = None
+        outcome = self.analysis_worker.poll()
+        if outcome is not None:
+            self._apply_analysis(*outcome)
+        if self._received_generation != self._analysis_generation:
+            self._analysis_poll_after = self.root.after(self.ANALYSIS_POLL_MS, self._poll_analysis)
+
+    def _apply_analysis(self, generation, result, error):
+        """Show an analysis result in the widgets"""
+        self._received_generation = generation
+        if error:
+            self._stream = self._waiting_phase = None
+            error_message = f"Error al realizar el análisis léxico:\n{error}"
             self.update_error(error_message)
             print(error_message)
+            return
+
+        self._stream = result['stream']
+        with self.profiler.capture():
+            with self.profiler.phase('update_panes'):
+                # Stay at the same rows while the document is being edited
+                self.result_view.set_rows(result['result_rows'], keep_position=True)
+                self.error_view.set_rows(result['error_rows'], keep_position=True)
+
+            if self._edit_prefix is not None:
+                # The text changed after the snapshot: offsets no longer match, so
+                # leave highlighting to the analysis that is already scheduled
+                return
+            self._applied_generation = generation
+            start, end = result['dirty_range']
+            with self.profiler.phase('highlight'):
+                if result['token_diff'] is not None:
+                    self.retag_changed_tokens(result['tokens'], *result['token_diff'])
+                else:
+                    self.apply_syntax_highlighting(result['tokens'], f"1.0 + {start} chars", f"1.0 + {end} chars")
+
+        phase = self._waiting_phase
+        if phase is not None and self._received_generation == self._analysis_generation:
+            self._waiting_phase = None
+            phase(self._stream.text, self._stream.tokens, self._stream.errors)
+
+    def _with_tokens(self, phase):
+        """Run phase(code, tokens, lexical_errors) on the editor's text.
+
+        The tokens are the worker's latest stream. If the text changed since,
+        it is lexed in the background first and phase runs when that result
+        arrives, so no phase lexes the whole text on the Tk thread.
+        """
+        current = self._edit_prefix is None and self._received_generation == self._analysis_generation
+        if current and self._stream is not None:
+            self._waiting_phase = None
+            phase(self._stream.text, self._stream.tokens, self._stream.errors)
+            return
+        self._waiting_phase = phase
+        if self._edit_prefix is not None or current:
+            # Skip the rest of the debounce delay
+            if self._syntax_highlight_after:
+                self.root.after_cancel(self._syntax_highlight_after)
+                self._syntax_highlight_after = None
+            self.lexical_analysis(save_tokens=False)
 
     # Add a new method to apply syntax highlighting
-    def apply_syntax_highlighting(self, tokens):
-        """Apply syntax highlighting to the text based on token types"""
+    def apply_syntax_highlighting(self, tokens, start="1.0", end=tk.END):
+        """Apply syntax highlighting to the text based on token types.
+
+        tokens is the document's full token sequence in source order. Only the text
+        between start and end is refreshed: its visible lines are tagged now and
+        the rest is marked pending and tagged when it scrolls into view.
+        """
+        self._highlight_tokens = tokens
+
         # First, remove any existing tags
         for tag in self.text_area.tag_names():
             if tag != "sel":  # Don't remove selection tag
-                self.text_area.tag_remove(tag, "1.0", tk.END)
-        
-        # Apply highlighting for each token
-        lexer = Lexer()
-        for token in tokens:
-            # Calculate positions
-            start_pos = f"{token.line}.{token.column-1}"
-            end_pos = f"{token.line}.{token.column-1 + len(token.value)}"
-            
-            # Create a tag for this token type if it doesn't exist
-            tag_name = f"token_{token.type}"
-            if tag_name not in self.text_area.tag_names():
-                color = lexer.get_color_for_token_type(token.type)
-                self.text_area.tag_configure(tag_name, foreground=color)
-            
-            # Apply the tag
-            self.text_area.tag_add(tag_name, start_pos, end_pos)
+                self.text_area.tag_remove(tag, start, end)
+
+        self.text_area.tag_add(self.PENDING_HIGHLIGHT_TAG, start, end)
+        self._highlight_visible()
+
+    def retag_changed_tokens(self, tokens, removed, added):
+        """Update highlighting after an edit by retagging only the tokens that changed.
+
+        removed and added come from IncrementalLexer.token_diff. Every other
+        token keeps its tag, since Tk moves tags along with the text around
+        an edit, so the Tcl calls issued grow with the edit, not the document.
+        """
+        self._highlight_tokens = tokens
+        removals = {}
+        for token_type, line, column, length in removed:
+            start_pos = f"{line}.{column - 1}"
+            removals.setdefault(f"token_{token_type}", []).extend((start_pos, f"{start_pos} + {length} chars"))
+        additions = {}
+        for token in added:
+            additions.setdefault(f"token_{token.type}", []).extend(self._token_indices(token))
+
+        # One Tcl call per tag; tkinter's tag_remove only takes a single range
+        text = self.text_area
+        for tag_name, indices in removals.items():
+            text.tk.call(text._w, "tag", "remove", tag_name, *indices)
+        for tag_name, indices in additions.items():
+            text.tag_add(tag_name, *indices)
+
+    @staticmethod
+    def _token_indices(token):
+        """Text widget indices where a token starts and ends"""
+        start_pos = f"{token.line}.{token.column - 1}"
+        if '\n' in token.value:
+            return start_pos, f"{start_pos} + {len(token.value)} chars"
+        return start_pos, f"{token.line}.{token.column - 1 + len(token.value)}"
+
+    def _highlight_scrolled(self):
+        """Tag pending text scrolled into view, if the tokens match the text"""
+        self._highlight_after = None
+        if self._edit_prefix is not None or self._applied_generation != self._analysis_generation:
+            # Tokens describe an older text; the next analysis will catch up
+            return
+        with self.profiler.phase('highlight'):
+            self._highlight_visible()
+
+    def _highlight_visible(self):
+        """Tag the pending text in the viewport plus a margin"""
+        text = self.text_area
+        first_line = int(text.index("@0,0").split('.')[0])
+        last_line = int(text.index(f"@0,{text.winfo_height()}").split('.')[0])
+        low = max(first_line - self.HIGHLIGHT_MARGIN, 1)
+        high = last_line + self.HIGHLIGHT_MARGIN
+        window_start, window_end = f"{low}.0", f"{high + 1}.0"
+
+        # Narrow the window down to the pending text inside it
+        tag = self.PENDING_HIGHLIGHT_TAG
+        if tag not in text.tag_names(window_start):
+            found = text.tag_nextrange(tag, window_start, window_end)
+            if not found:
+                return
+            low = int(found[0].split('.')[0])
+        last_range = text.tag_prevrange(tag, window_end)
+        if last_range:
+            high = min(int(last_range[1].split('.')[0]), high)
+
+        # Tag every token on those lines; re-adding a tag that is already there
+        # is harmless.
+        tokens = self._highlight_tokens
+        line_of = attrgetter('line')
+        # Start one token early in case a multi-line comment reaches into view
+        index = max(bisect_left(tokens, low, key=line_of) - 1, 0)
+        by_tag = {}
+        while index < len(tokens) and tokens[index].line <= high:
+            token = tokens[index]
+            by_tag.setdefault(f"token_{token.type}", []).extend(self._token_indices(token))
+            index += 1
+
+        # One Tcl call per tag, whatever the number of tokens
+        for tag_name, indices in by_tag.items():
+            text.tag_add(tag_name, *indices)
+        text.tag_remove(tag, f"{low}.0", f"{high + 1}.0")
 
     def syntax_analysis(self):
-        """Simula el análisis sintáctico"""
-        self.update_result("Análisis sintáctico realizado...\n")
-        self.update_error("No se encontraron errores sintácticos\n")
+        """Performs syntax analysis on the code"""
+        self._with_tokens(self._syntax_analysis)
+
+    def _syntax_analysis(self, code, tokens, lexical_errors):
+        try:
+            tree, errors = self.parser.parse(tokens)
+
+            self.update_result("Análisis sintáctico realizado...\n\n" + format_tree(tree))
+            if errors:
+                self.update_error(ItemRows("Se encontraron errores sintácticos:\n", errors))
+            else:
+                self.update_error("No se encontraron errores sintácticos\n")
+        except Exception as e:
+            import traceback
+            error_message = f"Error al realizar el análisis sintáctico:\n{str(e)}\n\n"
+            error_message += traceback.format_exc()
+            self.update_error(error_message)
+            print(error_message)
 
     def semantic_analysis(self):
-        """Simula el análisis semántico"""
-        self.update_result("Análisis semántico realizado...\n")
-        self.update_error("No se encontraron errores semánticos\n")
+        """Performs semantic analysis on the code"""
+        self._with_tokens(self._semantic_analysis)
+
+    def _semantic_analysis(self, code, tokens, lexical_errors):
+        try:
+            tree, _ = self.parser.parse(tokens)
+            analyzer = self.semantic_analyzer
+            declarations, errors = analyzer.analyze(tree)
+
+            self.update_result(
+                "Análisis semántico realizado...\n"
+                f"Bloques revisados: {analyzer.blocks_checked}, reutilizados: {analyzer.blocks_reused}\n\n"
+                + format_declarations(declarations)
+            )
+            if errors:
+                self.update_error(ItemRows("Se encontraron errores semánticos:\n", errors))
+            else:
+                self.update_error("No se encontraron errores semánticos\n")
+        except Exception as e:
+            import traceback
+            error_message = f"Error al realizar el análisis semántico:\n{str(e)}\n\n"
+            error_message += traceback.format_exc()
+            self.update_error(error_message)
+            print(error_message)
+
+    def _check_program(self, tokens, lexical_errors, task):
+        """AST of a program without errors, or None after reporting them"""
+        tree, syntax_errors = self.parser.parse(tokens)
+        _, semantic_errors = self.semantic_analyzer.analyze(tree)
+        if lexical_errors or syntax_errors or semantic_errors:
+            self.update_result(f"{task}...\n")
+            self.update_error(
+                f"{task} cancelada: el programa tiene "
+                f"{len(lexical_errors)} errores léxicos, {len(syntax_errors)} sintácticos "
+                f"y {len(semantic_errors)} semánticos\n"
+            )
+            return None
+        return tree
+
+    def _generate_intermediate(self, task, tokens, lexical_errors):
+        """Compile the editor's program to optimized intermediate code.
+
+        Returns False, after reporting why, when the program has errors.
+        """
+        tree = self._check_program(tokens, lexical_errors, task)
+        if tree is None:
+            self.intermediate = None
+            return False
+
+        self.intermediate = self.intermediate_generator.generate(tree)
+        self._optimization_level_used = self.optimization_level.get()
+        self._optimization_reports = PassManager(self._optimization_level_used).run(self.intermediate)
+        return True
 
     def intermediate_code(self):
-        """Simula la generación de código intermedio"""
-        self.update_result("Generación de código intermedio...\n")
-        self.update_error("No se encontraron errores en la generación de código intermedio\n")
+        """Generates the intermediate code of a program without errors"""
+        self._with_tokens(self._intermediate_code)
+
+    def _intermediate_code(self, code, tokens, lexical_errors):
+        try:
+            if not self._generate_intermediate("Generación de código intermedio", tokens, lexical_errors):
+                return
+            self.show_intermediate_page(0)
+            self.update_error("No se encontraron errores en la generación de código intermedio\n")
+        except Exception as e:
+            import traceback
+            error_message = f"Error al generar el código intermedio:\n{str(e)}\n\n"
+            error_message += traceback.format_exc()
+            self.update_error(error_message)
+            print(error_message)
+
+    def show_intermediate_page(self, page):
+        """Show one page of quadruples; only that page is formatted"""
+        code = self.intermediate
+        if code is None:
+            return
+        pages = max((len(code) + self.QUADS_PER_PAGE - 1) // self.QUADS_PER_PAGE, 1)
+        page = min(max(page, 0), pages - 1)
+        self._intermediate_page = page
+        start = page * self.QUADS_PER_PAGE
+        stop = min(start + self.QUADS_PER_PAGE, len(code))
+        header = (
+            f"Código intermedio: {len(code)} cuádruplos, {code.temp_count} temporales, "
+            f"{len(code.label_positions)} etiquetas\n"
+            f"Optimización O{self._optimization_level_used}\n"
+            + format_report(self._optimization_reports)
+            + f"Página {page + 1} de {pages} (cuádruplos {start}-{stop - 1})\n\n"
+        )
+        self.update_result(header + "\n".join(code.format_range(start, stop)) + "\n")
 
     def execute_code(self):
-        """Simula la ejecución del código"""
-        self.update_result("Ejecutando el código...\n")
-        self.update_error("No se encontraron errores en la ejecución del código\n")
+        """Compile the program and run it with the selected backend.
+
+        cin asks for each input line in a dialog; cout goes to the results
+        pane. The budget (instructions on the virtual machine, loop
+        iterations in Python) stops programs that never end.
+        """
+        self._with_tokens(self._execute_code)
+
+    def _execute_code(self, code, tokens, lexical_errors):
+        try:
+            output = io.StringIO()
+            program_io = StreamIO(DialogInput(self.root), output)
+            note = ""
+            program = None
+            if self.execution_backend.get() == "python":
+                # An unchanged program skips the front end entirely
+                key = content_hash(code)
+                program = self.python_backend.lookup(key)
+                if program is None:
+                    tree = self._check_program(tokens, lexical_errors, "Ejecución")
+                    if tree is None:
+                        return
+                    try:
+                        program = self.python_backend.compile(tree, key)
+                    except CodegenError as e:
+                        note = f"{e}; se usó la máquina virtual\n"
+
+            try:
+                if program is not None:
+                    execution = program.run(program_io, self.EXECUTION_BUDGET)
+                    summary = f"{execution.executed} iteraciones de ciclo en {execution.seconds:.3f} s (Python)"
+                else:
+                    if not self._generate_intermediate("Ejecución", tokens, lexical_errors):
+                        return
+                    machine = VirtualMachine(program_io, budget=self.EXECUTION_BUDGET)
+                    execution = machine.run(assemble(self.intermediate))
+                    summary = f"{execution.executed} instrucciones en {execution.seconds:.3f} s (máquina virtual)"
+            except VMError as e:
+                self.update_result("Salida del programa:\n" + output.getvalue())
+                self.update_error(note + str(e) + "\n")
+                return
+            self.update_result("Salida del programa:\n" + output.getvalue() + f"\n{summary}\n" + note)
+            self.update_error("No se encontraron errores en la ejecución del código\n")
+        except Exception as e:
+            import traceback
+            error_message = f"Error al ejecutar el código:\n{str(e)}\n\n"
+            error_message += traceback.format_exc()
+            self.update_error(error_message)
+            print(error_message)
     
     def show_result(self, result_type):
         """Muestra el resultado correspondiente al botón presionado"""
+        if result_type == "tabla":
+            self.show_symbol_table()
+            return
+        if result_type == "intermedio" and self.intermediate is not None:
+            self.show_intermediate_page(self._intermediate_page)
+            return
+
         results = {
             "lexico": "Resultados del análisis léxico:\n",
             "sintactico": "Resultados del análisis sintáctico:\n",
             "semantico": "Resultados del análisis semántico:\n",
-            "tabla": "Tabla de símbolos:\n",
             "intermedio": "Código intermedio generado:\n"
         }
         
         self.update_result(results.get(result_type, "Seleccione un tipo de resultado"))
 
+    def show_symbol_table(self):
+        """Build the symbol table from the declarations in the editor and show it"""
+        self._with_tokens(self._show_symbol_table)
+
+    def _show_symbol_table(self, code, tokens, lexical_errors):
+        try:
+            table, symbols = build_symbol_table(tokens)
+            self.update_result("Tabla de símbolos:\n\n" + format_symbol_table(table, symbols))
+        except Exception as e:
+            import traceback
+            error_message = f"Error al construir la tabla de símbolos:\n{str(e)}\n\n"
+            error_message += traceback.format_exc()
+            self.update_error(error_message)
+            print(error_message)
+
     def show_error(self, error_type):
         """Muestra los errores correspondientes al botón presionado"""
         errors = {
@@ -570,40 +1109,143 @@ class IDE:
         
         self.update_error(errors.get(error_type, "Seleccione un tipo de error"))
 
+    def show_profile_panel(self):
+        """Open the window with the phase timings and counters of the analyses"""
+        if self.profile_window is not None:
+            self.profile_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Perfil de rendimiento")
+        window.geometry("820x520")
+        window.configure(bg=self.colors['bg_main'])
+        window.protocol("WM_DELETE_WINDOW", self._close_profile_panel)
+
+        buttons = tk.Frame(window, bg=self.colors['bg_main'])
+        buttons.pack(fill=tk.X, padx=5, pady=5)
+        self.profile_capture = tk.BooleanVar(value=self.profiler.capturing)
+        tk.Checkbutton(
+            buttons, text="Capturar cProfile y tracemalloc", variable=self.profile_capture,
+            command=self._toggle_profile_capture, bg=self.colors['bg_main'], fg=self.colors['fg_main'],
+            selectcolor=self.colors['bg_secondary'], activebackground=self.colors['bg_main'],
+            activeforeground=self.colors['fg_main'], font=self.fonts['buttons']
+        ).pack(side=tk.LEFT, padx=2)
+        button_style = {
+            'bg': self.colors['accent'],
+            'fg': self.colors['fg_main'],
+            'activebackground': self.colors['bg_secondary'],
+            'activeforeground': self.colors['fg_main'],
+            'font': self.fonts['buttons'],
+            'relief': 'flat',
+            'borderwidth': 0,
+            'padx': 10,
+            'cursor': 'hand2'
+        }
+        tk.Button(buttons, text="Guardar JSON", command=self._save_profile, **button_style).pack(side=tk.RIGHT, padx=2)
+        tk.Button(buttons, text="Reiniciar", command=self._reset_profile, **button_style).pack(side=tk.RIGHT, padx=2)
+
+        self.profile_text = tk.Text(window, wrap=tk.NONE, font=self.fonts['results'],
+                                    bg=self.colors['result_bg'], fg=self.colors['fg_main'], borderwidth=0)
+        profile_scroll = tk.Scrollbar(window, command=self.profile_text.yview)
+        self.profile_text.config(yscrollcommand=profile_scroll.set, state='disabled')
+        profile_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.profile_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+
+        self.profile_window = window
+        self._refresh_profile_panel()
+
+    def _refresh_profile_panel(self):
+        """Redraw the profiling panel, and again every PROFILE_REFRESH_MS while it is open"""
+        self._profile_after = None
+        if self.profile_window is None:
+            return
+        text = self.profile_text
+        top = text.yview()[0]
+        text.config(state='normal')
+        text.delete(1.0, tk.END)
+        text.insert(tk.END, self.profiler.format())
+        text.config(state='disabled')
+        text.yview_moveto(top)
+        self._profile_after = self.root.after(self.PROFILE_REFRESH_MS, self._refresh_profile_panel)
+
+    def _close_profile_panel(self):
+        if self._profile_after is not None:
+            self.root.after_cancel(self._profile_after)
+            self._profile_after = None
+        self.profile_window.destroy()
+        self.profile_window = None
+
+    def _toggle_profile_capture(self):
+        if self.profile_capture.get():
+            self.profiler.start_capture()
+        else:
+            self.profiler.stop_capture()
+        self._refresh_profile_panel_now()
+
+    def _reset_profile(self):
+        self.profiler.reset()
+        self._refresh_profile_panel_now()
+
+    def _refresh_profile_panel_now(self):
+        if self._profile_after is not None:
+            self.root.after_cancel(self._profile_after)
+        self._refresh_profile_panel()
+
+    def _save_profile(self):
+        """Write the profiling report as JSON, in the format of cli lex --profile"""
+        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not filename:
+            return
+        try:
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(self.profiler.report(), f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            import traceback
+            error_message = f"Error al guardar el perfil:\n{str(e)}\n\n"
+            error_message += traceback.format_exc()
+            self.update_error(error_message)
+            print(error_message)
+
     def update_line_numbers(self, event=None):
         """Update line numbers"""
-        self.line_numbers.config(state='normal')
-        self.line_numbers.delete('1.0', tk.END)
-        
-        # Get text content and count lines
-        text_content = self.text_area.get('1.0', tk.END)
-        
-        # Handle empty text area
-        if len(text_content) <= 1:  # Just contains '\n'
-            self.line_numbers.insert('1.0', '  1')
-            self.line_numbers.config(state='disabled')
-            return
-        
-        # Count lines
-        num_lines = text_content.count('\n')
-        if not text_content.endswith('\n'):  # Fix: changed endsWith to endswith
-            num_lines += 1
-        
-        # Create line numbers with padding
-        line_numbers_text = '\n'.join(str(i).rjust(3) for i in range(1, num_lines + 1))
-        
-        # Insert line numbers
-        self.line_numbers.insert('1.0', line_numbers_text)
-        
-        # Sync scrolling
-        self.line_numbers.yview_moveto(self.text_area.yview()[0])
-        self.line_numbers.config(state='disabled')
-        if hasattr(self, 'last_analysis_text') and self.last_analysis_text != self.text_area.get(1.0, tk.END):
-            # Only re-run analysis if significant time has passed (to avoid performance issues)
-            if hasattr(self, '_syntax_highlight_after') and self._syntax_highlight_after:
+        self.redraw_line_numbers()
+
+        # Re-run the analysis once edits stop for a moment
+        if self._edit_prefix is not None:
+            if self._syntax_highlight_after:
                 self.root.after_cancel(self._syntax_highlight_after)
             # Reduce from 1000ms to 300ms for better responsiveness
-            self._syntax_highlight_after = self.root.after(300, self.lexical_analysis)
+            self._syntax_highlight_after = self.root.after(300, self.lexical_analysis, False)
+
+    def redraw_line_numbers(self):
+        """Draw the numbers of the visible lines only"""
+        text = self.text_area
+        line_count = int(text.index("end - 1c").split('.')[0])
+        state = (text.yview()[0], line_count, text.winfo_height())
+        if state == self._gutter_state:
+            return
+        self._gutter_state = state
+
+        # Widen the gutter only when the number of digits changes
+        digits = max(3, len(str(line_count)))
+        if digits != self._gutter_digits:
+            self._gutter_digits = digits
+            self.line_numbers.config(width=self.line_numbers_font.measure('9' * digits) + 10)
+
+        canvas = self.line_numbers
+        canvas.delete("all")
+        x = int(canvas.cget('width')) - 5
+        index = text.index("@0,0")
+        while True:
+            info = text.dlineinfo(index)
+            if info is None:
+                break
+            line = index.split('.')[0]
+            canvas.create_text(x, info[1], anchor=tk.NE, text=line, font=self.line_numbers_font, fill=self.colors['fg_secondary'])
+            next_index = text.index(f"{line}.0 + 1 line")
+            if next_index.split('.')[0] == line:
+                break
+            index = next_index
+
     def update_cursor_position(self, event=None):
         """Update cursor position indicator"""
         try:
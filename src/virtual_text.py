@@ -0,0 +1,191 @@
+"""Read-only text panes that only render the rows in view.
+
+A VirtualText takes over a tk.Text and its scrollbar. Its content is a
+sequence of rows (anything with len() and indexing that returns a str), so a
+million-token listing costs the list of Token objects the lexer already
+built: only the rows in the viewport are formatted and inserted into Tcl, and
+scrolling re-renders them from the sequence.
+"""
+import tkinter as tk
+import tkinter.font as tkfont
+from bisect import bisect_left
+from operator import attrgetter
+
+
+class TextRows:
+    """The lines of a plain string"""
+
+    def __init__(self, text):
+        self.lines = text.split("\n")
+        if len(self.lines) > 1 and self.lines[-1] == "":
+            self.lines.pop()
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, index):
+        return self.lines[index]
+
+
+class ItemRows:
+    """Header lines followed by one row per item, formatted with str() when
+    shown; items are in source order and have line and column attributes
+    (tokens and lexical, syntactic or semantic errors). Line breaks inside an
+    item (multi-line comments) are shown as \\n so each item is one row."""
+
+    def __init__(self, header, items):
+        self.header = header.split("\n")
+        self.items = items
+
+    def __len__(self):
+        return len(self.header) + len(self.items)
+
+    def __getitem__(self, index):
+        if index < len(self.header):
+            return self.header[index]
+        return str(self.items[index - len(self.header)]).replace("\n", "\\n")
+
+    def position(self, index):
+        """(line, column) in the source of the item shown in a row, or None"""
+        index -= len(self.header)
+        if 0 <= index < len(self.items):
+            item = self.items[index]
+            return item.line, item.column
+        return None
+
+    def row_for_line(self, line):
+        """First row whose item is on line or after it"""
+        return len(self.header) + bisect_left(self.items, line, key=attrgetter('line'))
+
+
+class VirtualText:
+    # Extra rows rendered below the viewport, for partly visible and wrapped rows
+    OVERSCAN = 2
+    # Rows scrolled per mouse wheel notch
+    WHEEL_ROWS = 3
+    MARK_TAG = "virtual_mark"
+
+    def __init__(self, text, scrollbar, on_activate=None, mark_color="#344055"):
+        self.text = text
+        self.scrollbar = scrollbar
+        # on_activate(line, column) runs when a row showing a source item is double-clicked
+        self.on_activate = on_activate
+        self.rows = TextRows("")
+        self.first = 0      # Row shown at the top
+        self.marked = None  # Row highlighted by the last jump
+        self._font = None
+
+        text.config(yscrollcommand="", state='disabled')
+        text.tag_configure(self.MARK_TAG, background=mark_color)
+        scrollbar.config(command=self.yview)
+        text.bind('<Configure>', lambda e: self.render())
+        text.bind('<MouseWheel>', self._on_wheel)
+        text.bind('<Button-4>', lambda e: self.scroll(-self.WHEEL_ROWS))
+        text.bind('<Button-5>', lambda e: self.scroll(self.WHEEL_ROWS))
+        text.bind('<Button-1>', lambda e: text.focus_set())
+        text.bind('<Double-Button-1>', self._on_double_click)
+        text.bind('<Up>', lambda e: self.scroll(-1))
+        text.bind('<Down>', lambda e: self.scroll(1))
+        text.bind('<Prior>', lambda e: self.scroll(-self.page_rows()))
+        text.bind('<Next>', lambda e: self.scroll(self.page_rows()))
+        text.bind('<Control-Home>', lambda e: self.show_row(0, mark=False))
+        text.bind('<Control-End>', lambda e: self.show_row(len(self.rows), mark=False))
+
+    # Content
+
+    def set_rows(self, rows, keep_position=False):
+        """Show a sequence of rows; keep_position stays at the same row number
+        (e.g. for a new analysis of the same document)"""
+        self.rows = rows
+        self.marked = None
+        if not keep_position:
+            self.first = 0
+        self.render()
+
+    def set_text(self, text):
+        self.set_rows(TextRows(text))
+
+    # Viewport
+
+    def page_rows(self):
+        """Rows that fit in the widget"""
+        text = self.text
+        if self._font is None:
+            self._font = tkfont.Font(font=text.cget('font'))
+        row_height = self._font.metrics('linespace') + int(text.cget('spacing1')) + int(text.cget('spacing3'))
+        border = 2 * (int(text.cget('pady')) + int(text.cget('borderwidth')) + int(text.cget('highlightthickness')))
+        return max((text.winfo_height() - border) // max(row_height, 1), 1)
+
+    def render(self):
+        total = len(self.rows)
+        page = self.page_rows()
+        self.first = max(min(self.first, total - page), 0)
+        stop = min(self.first + page + self.OVERSCAN, total)
+        rows = self.rows
+        lines = [rows[index] for index in range(self.first, stop)]
+
+        text = self.text
+        text.config(state='normal')
+        text.delete("1.0", tk.END)
+        text.insert("1.0", "\n".join(lines))
+        if self.marked is not None and self.first <= self.marked < stop:
+            line = self.marked - self.first + 1
+            text.tag_add(self.MARK_TAG, f"{line}.0", f"{line + 1}.0")
+        text.config(state='disabled')
+
+        if total:
+            self.scrollbar.set(self.first / total, min((self.first + page) / total, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, rows):
+        self.first += rows
+        self.render()
+        return "break"
+
+    def yview(self, *args):
+        """Scrollbar command: moveto fraction, or scroll n units/pages"""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self.first = int(float(args[1]) * len(self.rows))
+            self.render()
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            self.scroll(amount * self.page_rows() if args[2] == 'pages' else amount)
+
+    def show_row(self, index, mark=True):
+        """Scroll a row into view near the top and highlight it"""
+        index = max(min(index, len(self.rows) - 1), 0)
+        self.marked = index if mark else None
+        self.first = max(index - self.page_rows() // 4, 0)
+        self.render()
+        return "break"
+
+    def show_line(self, line):
+        """Scroll to the first row for a source line, if the rows know lines;
+        returns whether they do"""
+        row_for_line = getattr(self.rows, 'row_for_line', None)
+        if row_for_line is None:
+            return False
+        self.show_row(row_for_line(line))
+        return True
+
+    # Events
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        notches = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        return self.scroll(-notches * self.WHEEL_ROWS)
+
+    def _on_double_click(self, event):
+        position = getattr(self.rows, 'position', None)
+        if position is None or self.on_activate is None:
+            return None
+        row = self.first + int(self.text.index(f"@{event.x},{event.y}").split('.')[0]) - 1
+        found = position(row)
+        if found is not None:
+            self.marked = row
+            self.render()
+            self.on_activate(*found)
+        return "break"
@@ -0,0 +1,250 @@
+"""Register virtual machine for the intermediate code.
+
+assemble() turns an IntermediateCode into Bytecode: one flat array with four
+ints per instruction (opcode, a, b, r), labels dropped and jump targets
+resolved to offsets in that array. Every operand becomes an index into one
+register file holding the variables, then the temporaries, then the
+constants, so the interpreter loop only indexes a preallocated list.
+
+The instruction budget is charged once per jump taken, with the length of
+the straight run that led to it, so counting costs nothing on ordinary
+instructions and runaway loops are still stopped.
+"""
+import sys
+import time
+from array import array
+
+from .intermediate import (
+    ADD, ASSIGN, CONSTANT, DIV, EQ, GE, GOTO, GT, HALT, IF_FALSE, IF_TRUE, ITOF, KIND_BITS, KIND_MASK, LABEL,
+    LABEL_HERE, LE, LT, MOD, MUL, NE, NEG, NOP, POW, READ_FLOAT, READ_INT, SUB, TEMPORARY, VARIABLE, WRITE,
+    PowerError, power,
+)
+
+# Words per instruction in Bytecode.code
+WIDTH = 4
+DEFAULT_BUDGET = 10_000_000
+
+
+class VMError(Exception):
+    """Run-time error; address is the instruction being executed"""
+
+    def __init__(self, message, address=None):
+        super().__init__(message)
+        self.message = message
+        self.address = address
+
+    def __str__(self):
+        if self.address is None:
+            return f"Error de ejecución: {self.message}"
+        return f"Error de ejecución: {self.message} en la instrucción {self.address}"
+
+
+class Bytecode:
+    __slots__ = ('code', 'registers', 'variables')
+
+    def __init__(self, code, registers, variables):
+        self.code = code                # array('q'): opcode, a, b, r per instruction
+        self.registers = registers      # Initial register file, copied by each run
+        self.variables = variables      # Display name of each variable register
+
+    def __len__(self):
+        return len(self.code) // WIDTH
+
+
+class Execution:
+    """Outcome of a run"""
+    __slots__ = ('executed', 'seconds', 'variables')
+
+    def __init__(self, executed, seconds, variables):
+        self.executed = executed    # Instructions run
+        self.seconds = seconds
+        self.variables = variables  # Variable name -> final value
+
+
+def assemble(intermediate):
+    """Bytecode for an IntermediateCode"""
+    ops, arg1, arg2, result = intermediate.ops, intermediate.arg1, intermediate.arg2, intermediate.result
+    variable_count = len(intermediate.variables)
+    constant_base = variable_count + intermediate.temp_count
+
+    # Address of each quadruple once labels and NOPs are gone
+    addresses = array('q', bytes(8 * (len(ops) + 1)))
+    address = 0
+    for index, op in enumerate(ops):
+        addresses[index] = address
+        if op != LABEL_HERE and op != NOP:
+            address += 1
+    addresses[len(ops)] = address
+
+    def register(value):
+        kind = value & KIND_MASK
+        index = value >> KIND_BITS
+        if kind == VARIABLE:
+            return index
+        if kind == TEMPORARY:
+            # Temporaries are numbered from 1
+            return variable_count + index - 1
+        if kind == CONSTANT:
+            return constant_base + index
+        if kind == LABEL:
+            return addresses[intermediate.label_positions[index]] * WIDTH
+        return 0
+
+    code = array('q')
+    for index, op in enumerate(ops):
+        if op == LABEL_HERE or op == NOP:
+            continue
+        code.extend((op, register(arg1[index]), register(arg2[index]), register(result[index])))
+    if not ops or ops[-1] != HALT:
+        code.extend((HALT, 0, 0, 0))
+
+    registers = [0.0 if var_type == 'float' else 0 for var_type in intermediate.variable_types]
+    registers += [0] * intermediate.temp_count
+    registers += intermediate.constants
+    return Bytecode(code, registers, list(intermediate.variables))
+
+
+class StreamIO:
+    """cin/cout over text streams.
+
+    Input is read as whitespace-separated words, a line at a time, so it can
+    come from a pipe, a file or an interactive prompt; each cout writes one
+    line.
+    """
+
+    def __init__(self, input_stream=None, output_stream=None):
+        self.input_stream = input_stream if input_stream is not None else sys.stdin
+        self.output_stream = output_stream if output_stream is not None else sys.stdout
+        self._pending = []
+
+    def read(self):
+        """Next input word; raises EOFError when the input is exhausted"""
+        while not self._pending:
+            line = self.input_stream.readline()
+            if not line:
+                raise EOFError
+            self._pending = line.split()[::-1]
+        return self._pending.pop()
+
+    def write(self, value):
+        try:
+            text = f"{value}\n"
+        except ValueError:
+            # Python refuses to convert ints longer than sys.get_int_max_str_digits()
+            raise VMError(f"el entero de {value.bit_length()} bits es demasiado grande para imprimirlo") from None
+        self.output_stream.write(text)
+
+
+class VirtualMachine:
+    def __init__(self, io=None, budget=DEFAULT_BUDGET):
+        self.io = io if io is not None else StreamIO()
+        self.budget = budget    # Instructions a run may execute; None for no limit
+
+    def run(self, bytecode):
+        """Execute bytecode; returns an Execution or raises VMError"""
+        # A list hands back the stored int objects; an array boxes each read
+        code = bytecode.code.tolist()
+        regs = list(bytecode.registers)
+        read, write = self.io.read, self.io.write
+        budget = self.budget if self.budget is not None else float('inf')
+        executed = 0
+        pc = start = 0  # Current instruction and start of the current straight run
+        began = time.perf_counter()
+        try:
+            while True:
+                op = code[pc]
+                if op == ASSIGN:
+                    regs[code[pc + 3]] = regs[code[pc + 1]]
+                elif op == ADD:
+                    regs[code[pc + 3]] = regs[code[pc + 1]] + regs[code[pc + 2]]
+                elif op == SUB:
+                    regs[code[pc + 3]] = regs[code[pc + 1]] - regs[code[pc + 2]]
+                elif op == MUL:
+                    regs[code[pc + 3]] = regs[code[pc + 1]] * regs[code[pc + 2]]
+                elif op == LT:
+                    regs[code[pc + 3]] = 1 if regs[code[pc + 1]] < regs[code[pc + 2]] else 0
+                elif op == IF_FALSE:
+                    if not regs[code[pc + 1]]:
+                        executed += (pc - start) // WIDTH + 1
+                        if executed > budget:
+                            raise VMError(f"se excedió el límite de {self.budget} instrucciones", pc // WIDTH)
+                        pc = start = code[pc + 3]
+                        continue
+                elif op == IF_TRUE:
+                    if regs[code[pc + 1]]:
+                        executed += (pc - start) // WIDTH + 1
+                        if executed > budget:
+                            raise VMError(f"se excedió el límite de {self.budget} instrucciones", pc // WIDTH)
+                        pc = start = code[pc + 3]
+                        continue
+                elif op == GOTO:
+                    executed += (pc - start) // WIDTH + 1
+                    if executed > budget:
+                        raise VMError(f"se excedió el límite de {self.budget} instrucciones", pc // WIDTH)
+                    pc = start = code[pc + 3]
+                    continue
+                elif op == LE:
+                    regs[code[pc + 3]] = 1 if regs[code[pc + 1]] <= regs[code[pc + 2]] else 0
+                elif op == GT:
+                    regs[code[pc + 3]] = 1 if regs[code[pc + 1]] > regs[code[pc + 2]] else 0
+                elif op == GE:
+                    regs[code[pc + 3]] = 1 if regs[code[pc + 1]] >= regs[code[pc + 2]] else 0
+                elif op == EQ:
+                    regs[code[pc + 3]] = 1 if regs[code[pc + 1]] == regs[code[pc + 2]] else 0
+                elif op == NE:
+                    regs[code[pc + 3]] = 1 if regs[code[pc + 1]] != regs[code[pc + 2]] else 0
+                elif op == DIV:
+                    a = regs[code[pc + 1]]
+                    b = regs[code[pc + 2]]
+                    if type(a) is int and type(b) is int:
+                        # Truncate toward zero like int_div
+                        q = a // b
+                        if q < 0 and q * b != a:
+                            q += 1
+                        regs[code[pc + 3]] = q
+                    else:
+                        regs[code[pc + 3]] = a / b
+                elif op == MOD:
+                    a = regs[code[pc + 1]]
+                    b = regs[code[pc + 2]]
+                    q = a // b
+                    if q < 0 and q * b != a:
+                        q += 1
+                    regs[code[pc + 3]] = a - b * q
+                elif op == NEG:
+                    regs[code[pc + 3]] = -regs[code[pc + 1]]
+                elif op == ITOF:
+                    regs[code[pc + 3]] = float(regs[code[pc + 1]])
+                elif op == POW:
+                    regs[code[pc + 3]] = power(regs[code[pc + 1]], regs[code[pc + 2]])
+                elif op == WRITE:
+                    write(regs[code[pc + 1]])
+                elif op == READ_INT or op == READ_FLOAT:
+                    word = read()
+                    try:
+                        regs[code[pc + 3]] = int(word) if op == READ_INT else float(word)
+                    except ValueError:
+                        kind = "entero" if op == READ_INT else "float"
+                        raise VMError(f"se esperaba un valor {kind} y se leyó '{word}'", pc // WIDTH) from None
+                elif op == HALT:
+                    executed += (pc - start) // WIDTH + 1
+                    break
+                else:
+                    raise VMError(f"instrucción desconocida {op}", pc // WIDTH)
+                pc += WIDTH
+        except ZeroDivisionError:
+            raise VMError("división entre cero", pc // WIDTH) from None
+        except OverflowError:
+            raise VMError("desbordamiento en operación de punto flotante", pc // WIDTH) from None
+        except PowerError as e:
+            raise VMError(str(e), pc // WIDTH) from None
+        except EOFError:
+            raise VMError("no hay más datos de entrada para cin", pc // WIDTH) from None
+        except VMError as e:
+            # Raised by io.write, which does not know the instruction
+            if e.address is None:
+                e.address = pc // WIDTH
+            raise
+
+        variable_count = len(bytecode.variables)
+        return Execution(executed, time.perf_counter() - began, dict(zip(bytecode.variables, regs[:variable_count])))
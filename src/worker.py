@@ -0,0 +1,72 @@
+import queue
+import threading
+import traceback
+
+
+class AnalysisCancelled(Exception):
+    """Raised inside an analysis job when a newer job has been submitted"""
+
+
+class AnalysisWorker:
+    """Run analysis jobs on a background thread; only the newest job matters.
+
+    Each job carries a generation number. Submitting a job makes every older
+    one stale: queued stale jobs are skipped, a running one can notice through
+    the is_cancelled callback it receives, and their results are dropped by
+    poll(). Results travel back through a queue so the Tk thread can collect
+    them with root.after.
+    """
+
+    def __init__(self, analyze, discard=None):
+        # analyze(payload, is_cancelled) -> result, called on the worker thread
+        self._analyze = analyze
+        # discard(payload) is called, also on the worker thread, for jobs that
+        # are skipped without running, so their input can be folded into the next
+        self._discard = discard
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._latest = 0
+        self._thread = threading.Thread(target=self._run, name="analysis-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, generation, payload):
+        """Queue a job; any job with a lower generation becomes stale"""
+        self._latest = generation
+        self._jobs.put((generation, payload))
+
+    def is_stale(self, generation):
+        return generation != self._latest
+
+    def poll(self):
+        """Return (generation, result, error) for the newest finished job, or None"""
+        newest = None
+        while True:
+            try:
+                outcome = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if not self.is_stale(outcome[0]):
+                newest = outcome
+        return newest
+
+    def stop(self):
+        self._jobs.put(None)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            generation, payload = job
+            if self.is_stale(generation):
+                if self._discard is not None:
+                    self._discard(payload)
+                continue
+            try:
+                result = self._analyze(payload, lambda: self.is_stale(generation))
+            except AnalysisCancelled:
+                continue
+            except Exception:
+                self._results.put((generation, None, traceback.format_exc()))
+            else:
+                self._results.put((generation, result, None))
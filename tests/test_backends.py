@@ -0,0 +1,112 @@
+"""The same program must print the same output at every optimization level
+and on both execution backends."""
+import io
+
+import pytest
+
+from src.cli import check_program, compile_program
+from src.optimizer import LEVELS
+from src.pycodegen import CodegenError, PythonBackend
+from src.vm import StreamIO, VirtualMachine, VMError, assemble
+
+PROGRAMS = {
+    'last_temporary': "main { int a; a = 2; cout a * 3; cout 2; }",
+    'float_compare_without_constants': "main { float f; cout f != f; }",
+    'arithmetic': """
+        main {
+            int a, b; float x;
+            a = 7; b = -2;
+            cout a / b; cout a % b; cout -a / 2; cout -a % 2;
+            x = a / 2.0 + b;
+            cout x; cout a ^ 2; cout 2 ^ 0.5;
+            cout a < b || b < a && a == 7;
+        }
+    """,
+    'loops': """
+        main {
+            int i, total;
+            i = 0; total = 0;
+            while (i < 10) { total = total + i * i; i++; }
+            cout total;
+            do { i--; } while (i > 3);
+            cout i;
+            if (total > 100) cout 1; else cout 0; end
+        }
+    """,
+    'switch_and_input': """
+        main {
+            int n; float f;
+            cin n; cin f;
+            switch (n) { case 1 { cout 10; } case 2 { cout 20; } }
+            cout f * n;
+        }
+    """,
+    'unused_division_by_zero': "main { float v; v = v / v; v = 7 + 0.4; cout v; }",
+    'unused_modulo_by_zero': "main { int a, b; cout 1; a = b % b; cout 2; }",
+    'overwritten_int_to_float_overflow': "main { int a; float f; a = 10 ^ 400; f = a; f = 1.0; cout f; }",
+}
+INPUT = "2 1.5\n"
+
+
+def run_vm(code, level):
+    intermediate, errors = compile_program(code, level)
+    assert not errors
+    output = io.StringIO()
+    try:
+        VirtualMachine(StreamIO(io.StringIO(INPUT), output)).run(assemble(intermediate))
+    except VMError as e:
+        return output.getvalue(), e.message
+    return output.getvalue(), None
+
+
+def run_python(code):
+    tree, errors = check_program(code)
+    assert not errors
+    output = io.StringIO()
+    try:
+        PythonBackend().compile(tree).run(StreamIO(io.StringIO(INPUT), output))
+    except VMError as e:
+        return output.getvalue(), e.message
+    return output.getvalue(), None
+
+
+@pytest.mark.parametrize('name', sorted(PROGRAMS))
+def test_same_output_on_every_level_and_backend(name):
+    code = PROGRAMS[name]
+    expected = run_vm(code, 0)
+    for level in sorted(LEVELS):
+        assert run_vm(code, level) == expected, f"-O{level}"
+    assert run_python(code) == expected, "backend python"
+
+
+def test_last_temporary_does_not_alias_a_constant():
+    assert run_vm(PROGRAMS['last_temporary'], 0) == ("6\n2\n", None)
+
+
+def test_unused_trapping_operations_still_fail():
+    for name in ('unused_division_by_zero', 'unused_modulo_by_zero', 'overwritten_int_to_float_overflow'):
+        for level in sorted(LEVELS):
+            assert run_vm(PROGRAMS[name], level)[1] is not None, f"{name} -O{level}"
+
+
+def test_python_backend_reports_chains_it_cannot_compile():
+    code = "main { int x; x = " + " + ".join(["1"] * 20000) + "; cout x; }"
+    tree, errors = check_program(code)
+    assert not errors
+    with pytest.raises(CodegenError):
+        PythonBackend().compile(tree)
+    assert run_vm(code, 2) == ("20000\n", None)
+
+
+@pytest.mark.parametrize('code, expected', [
+    ("main { int a; a = 2 ^ -1; cout a; cout 1 ^ -2; cout -1 ^ -3; }", ("0\n1\n-1\n", None)),
+    ("main { float x, y; x = 0.0 - 8.0; y = x ^ 0.5; cout y; }",
+     ("", "la potencia de una base negativa con exponente fraccionario no es un número real")),
+    ("main { int a; a = 7 ^ 99999999; cout a; }", ("", "el resultado de la potencia es demasiado grande")),
+    ("main { int a; cout 1; a = 10 ^ 5000; cout a; }",
+     ("1\n", "el entero de 16610 bits es demasiado grande para imprimirlo")),
+])
+def test_powers_keep_the_types_of_the_language(code, expected):
+    for level in sorted(LEVELS):
+        assert run_vm(code, level) == expected, f"-O{level}"
+    assert run_python(code) == expected, "backend python"
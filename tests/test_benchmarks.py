@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from benchmarks import bench_lexer
+from benchmarks.corpus import generate_program, main as corpus_main, parse_size
+from src.lexer import Lexer
+from src.parser import Parser
+
+
+@pytest.mark.parametrize("text, size", [("512", 512), ("1K", 1024), ("10m", 10 * 1024 ** 2), ("1.5KB", 1536)])
+def test_parse_size(text, size):
+    assert parse_size(text) == size
+
+
+def test_generated_programs_are_reproducible_and_well_formed():
+    code = generate_program(20000, seed=3)
+    assert len(code) >= 20000
+    assert code == generate_program(20000, seed=3)
+    assert code != generate_program(20000, seed=4)
+    tokens, errors = Lexer().tokenize(code)
+    assert errors == []
+    _, syntax_errors = Parser().parse(tokens)
+    assert syntax_errors == []
+
+
+def test_corpus_command_writes_the_program(tmp_path):
+    path = tmp_path / "programa.txt"
+    corpus_main(["2K", "-o", str(path), "--seed", "5"])
+    assert path.read_text(encoding="utf-8") == generate_program(2048, seed=5)
+
+
+def test_phases_and_report(tmp_path, monkeypatch):
+    # The cold start runs fresh interpreters; it is not what is tested here
+    monkeypatch.setattr(bench_lexer, 'cold_start', lambda: 0.01)
+    report = bench_lexer.run([2048], list(Lexer.ENGINES), memory=False)
+    entries = {entry['engine']: entry for entry in report['results']}
+    assert set(entries) == set(Lexer.ENGINES)
+    assert entries['combined']['tokens'] == entries['legacy']['tokens'] > 0
+    assert set(entries['combined']['phases']) == {'scan', 'save'}
+    assert set(entries['legacy']['phases']) == {'comment_prescan', 'process_text', 'save'}
+
+    old, new = tmp_path / "anterior.json", tmp_path / "nuevo.json"
+    old.write_text(json.dumps(report), encoding="utf-8")
+    new.write_text(json.dumps(report), encoding="utf-8")
+    bench_lexer.compare(str(old), str(new))
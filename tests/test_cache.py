@@ -0,0 +1,95 @@
+import importlib.util
+import marshal
+import os
+
+from src import cache as cache_module
+from src.cache import CompileCache, content_hash
+from src.cli import check_program
+from src.lexer import Lexer
+from src.pycodegen import PythonBackend
+from src.token_buffer import TokenBuffer
+
+PROGRAM = "main { int a; a = 2; /* ok */ cout a * 3; @ }"
+
+
+def entry_path(cache, kind, digest):
+    return cache._path(kind, digest)
+
+
+def test_token_round_trip(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    digest = content_hash(PROGRAM)
+    tokens, errors = Lexer().tokenize(PROGRAM)
+    cache.put_tokens(digest, PROGRAM, TokenBuffer.from_source(PROGRAM))
+
+    buffer = cache.get_tokens(digest, PROGRAM)
+    assert (cache.hits, cache.misses) == (1, 0)
+    loaded_tokens, loaded_errors = buffer.split(PROGRAM)
+    assert [(t.type, t.value, t.line, t.column) for t in loaded_tokens] == \
+        [(t.type, t.value, t.line, t.column) for t in tokens]
+    assert [str(e) for e in loaded_errors] == [str(e) for e in errors]
+
+
+def test_damaged_entries_are_misses_not_hits(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    digest = content_hash(PROGRAM)
+    cache.put('bytecode-O2', digest, [1, 2, 3])
+    cache.put_tokens(digest, PROGRAM, TokenBuffer())
+    for kind in ('bytecode-O2', 'tokens'):
+        with open(entry_path(cache, kind, digest), "wb") as f:
+            f.write(b"basura")
+
+    assert cache.get('bytecode-O2', digest) is None
+    assert cache.get_tokens(digest, PROGRAM) is None
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_truncated_token_entries_are_misses(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    digest = content_hash(PROGRAM)
+    cache.put_tokens(digest, PROGRAM, TokenBuffer.from_source(PROGRAM))
+    path = entry_path(cache, 'tokens', digest)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:cache_module.HEADER.size + 8])
+
+    assert cache.get_tokens(digest, PROGRAM) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_tokens_of_other_text_are_a_miss(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    digest = content_hash(PROGRAM)
+    cache.put_tokens(digest, PROGRAM, TokenBuffer())
+    assert cache.get_tokens(digest, PROGRAM + " ") is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_bad_marshal_data_is_a_miss(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    tree, _ = check_program(PROGRAM.replace("@", ""))
+    digest = content_hash("programa")
+    PythonBackend(cache).compile(tree, digest)
+
+    stored = cache.get('python', digest)
+    cache.put('python', digest, (stored[0], b"\xff no es marshal", stored[2]))
+    backend = PythonBackend(cache)
+    assert backend.lookup(digest) is None
+    assert backend.misses == 1
+
+    cache.put('python', digest, (stored[0], marshal.dumps(compile(stored[0], "<programa>", "exec")), stored[2]))
+    assert PythonBackend(cache).lookup(digest) is not None
+
+
+def test_key_depends_on_the_interpreter(tmp_path, monkeypatch):
+    cache = CompileCache(str(tmp_path))
+    digest = content_hash(PROGRAM)
+    cache.put('bytecode-O2', digest, [1, 2, 3])
+    path = entry_path(cache, 'bytecode-O2', digest)
+    assert os.path.exists(path)
+
+    monkeypatch.setattr(cache_module, "_compiler_version", None)
+    monkeypatch.setattr(importlib.util, "MAGIC_NUMBER", b"\x00\x00\r\n")
+    assert entry_path(cache, 'bytecode-O2', digest) != path
+    assert cache.get('bytecode-O2', digest) is None
@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.corpus import generate_program
+from src import cli
+from src.cache import CompileCache
+from src.lexer import Lexer
+
+PROGRAM = "main {\n  int a;\n  a = 3. @ 2;\n}\n"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """A fresh cache for the CLI, outside the user's cache directory"""
+    cache = CompileCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(cli, '_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def sources(tmp_path):
+    root = tmp_path / "fuentes"
+    (root / "sub").mkdir(parents=True)
+    (root / "uno.txt").write_text(PROGRAM, encoding="utf-8")
+    (root / "sub" / "dos.txt").write_text("int b;\n", encoding="utf-8")
+    (root / "notas.md").write_text("no es un programa", encoding="utf-8")
+    return root
+
+
+def test_collect_files_expands_directories_and_globs(sources):
+    uno, dos = str(sources / "uno.txt"), str(sources / "sub" / "dos.txt")
+    assert cli.collect_files([str(sources)]) == [dos, uno]
+    # A file listed twice, directly and through a glob, is lexed once
+    assert cli.collect_files([uno, str(sources / "*.txt")]) == [uno]
+    assert cli.collect_files([str(sources)], "*.md") == [str(sources / "notas.md")]
+    assert cli.collect_files([str(sources / "falta.txt")]) == []
+
+
+@pytest.mark.parametrize("engine", Lexer.ENGINES)
+def test_lex_file_reports_what_tokenize_finds(sources, engine):
+    tokens, errors = Lexer().tokenize(PROGRAM)
+    result = cli.lex_file(str(sources / "uno.txt"), show_tokens=True, engine=engine)
+    assert (result['tokens'], result['errors'], result['failure']) == (len(tokens), len(errors), None)
+    assert result['report'].splitlines() == [str(token) for token in tokens] + [str(error) for error in errors]
+
+
+def test_lex_file_reports_unreadable_files(tmp_path):
+    path = tmp_path / "latin1.txt"
+    path.write_bytes("año".encode("latin-1"))
+    assert cli.lex_file(str(path))['failure']
+    assert cli.lex_file(str(tmp_path / "falta.txt"))['failure']
+
+
+def test_cached_tokens_give_the_same_result(sources, cache):
+    path = str(sources / "uno.txt")
+    first = cli.lex_file(path, show_tokens=True, use_cache=True)
+    second = cli.lex_file(path, show_tokens=True, use_cache=True)
+    assert (first['cached'], second['cached']) == (False, True)
+    assert second['report'] == first['report']
+    assert second['report'] == cli.lex_file(path, show_tokens=True)['report']
+
+
+def test_legacy_engine_does_not_load_cached_tokens(sources, cache):
+    path = str(sources / "uno.txt")
+    combined = cli.lex_file(path, use_cache=True)
+    legacy = cli.lex_file(path, use_cache=True, engine="legacy")
+    assert not legacy['cached']
+    assert {'comment_prescan', 'process_text'} <= set(legacy['phases'])
+    assert 'cache' not in legacy['phases']
+    assert (legacy['tokens'], legacy['errors'], legacy['report']) == \
+        (combined['tokens'], combined['errors'], combined['report'])
+
+
+@pytest.mark.parametrize("output_format", ["text", "binary"])
+def test_output_dir_mirrors_the_inputs(sources, tmp_path, monkeypatch, output_format):
+    monkeypatch.chdir(sources)
+    output = tmp_path / "salida"
+    result = cli.lex_file(os.path.join("sub", "dos.txt"), str(output), output_format=output_format)
+    suffix = ".tokens.bin" if output_format == "binary" else ".tokens.txt"
+    assert (output / "sub" / ("dos" + suffix)).is_file()
+    assert (output / "sub" / "dos.errors.txt").read_text(encoding="utf-8") == ""
+    assert result['bytes_written'] > 0
+
+
+def test_split_lexing_matches_a_single_pass(tmp_path):
+    path = tmp_path / "grande.txt"
+    path.write_text(generate_program(30000, seed=7), encoding="utf-8")
+    whole = cli.lex_file(str(path), show_tokens=True)
+    split = cli.lex_file(str(path), show_tokens=True, split_workers=3)
+    assert split['report'] == whole['report']
+
+
+def test_lex_command_summary_and_exit_status(sources, cache, capsys):
+    status = cli.main(["lex", str(sources), "-j", "1"])
+    out = capsys.readouterr().out
+    # uno.txt has lexical errors
+    assert status == 1
+    assert f"== {sources / 'uno.txt'}: 10 tokens, 2 errores" in out
+    assert f"== {sources / 'sub' / 'dos.txt'}: 3 tokens, 0 errores" in out
+
+    assert cli.main(["lex", str(sources / "sub"), "-j", "1", "--no-cache"]) == 0
+    assert cli.main(["lex", str(sources / "vacio")]) == 2
+    assert cli.main(["lex", str(sources), "--split", "--engine", "legacy"]) == 2
+
+
+def test_profile_records_the_phases(sources, cache, tmp_path):
+    profile = tmp_path / "perfil.json"
+    cli.main(["lex", str(sources), "-j", "1", "--profile", str(profile)])
+    report = json.loads(profile.read_text(encoding="utf-8"))
+    assert report['command'] == "lex"
+    assert report['counters']['files'] == 2
+    assert {'read', 'scan'} <= set(report['phases'])
+
+
+def test_run_reports_ints_too_large_to_print(tmp_path, cache, capsys):
+    program = tmp_path / "potencia.txt"
+    program.write_text("main { int a; a = 10 ^ 5000; cout a; }", encoding="utf-8")
+    assert cli.main(["run", str(program)]) == 1
+    err = capsys.readouterr().err
+    assert "demasiado grande para imprimirlo" in err and "Traceback" not in err
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from benchmarks.corpus import generate_program
+from src import incremental
+from src.incremental import IncrementalLexer
+from src.lexer import Lexer
+
+SNIPPETS = ("", "a", " ", "\n", "3", ".", "5", "/*", "*/", "//", "@", "x = 1;\n", "if", "12.", "+", "/")
+
+
+def described(items):
+    return [(type(item).__name__, getattr(item, 'type', None), item.value, item.line, item.column, item.offset,
+             getattr(item, 'message', None)) for item in items]
+
+
+def assert_matches_full_lex(stream):
+    tokens, errors = Lexer().tokenize(stream.text)
+    assert described(stream.tokens) == described(tokens)
+    assert described(stream.errors) == described(errors)
+    assert described(stream) == described(sorted(tokens + errors, key=lambda item: item.offset))
+    # Indexing builds the same items as iterating
+    assert described(stream.tokens[index] for index in range(0, len(tokens), 5)) == described(tokens[::5])
+    assert described(stream.errors[-1:]) == described(errors[-1:])
+
+
+def random_edits(text, seed, count, single_line=False):
+    rng = random.Random(seed)
+    snippets = [snippet for snippet in SNIPPETS if not (single_line and "\n" in snippet)]
+    for _ in range(count):
+        start = rng.randrange(len(text) + 1)
+        end = min(len(text), start + rng.choice((0, 0, 1, 2, 6)))
+        new = text[:start] + rng.choice(snippets) + rng.choice(snippets) + text[end:]
+        yield new, start, len(text) - end
+        text = new
+
+
+@pytest.fixture
+def small_pieces(monkeypatch):
+    # Many pieces, so edits cross piece boundaries and move pieces around
+    monkeypatch.setattr(incremental, 'PIECE_SIZE', 4)
+
+
+@pytest.mark.parametrize("known_range", [True, False])
+def test_random_edits_match_a_full_lex(small_pieces, known_range):
+    text = generate_program(2000, seed=2) + "a@b 3. /* x\n y */ z\n"
+    lexer = IncrementalLexer()
+    assert lexer.update(text)
+    for new, prefix, suffix in random_edits(text, seed=5, count=400):
+        assert lexer.update(new, prefix, suffix) if known_range else lexer.update(new)
+        assert_matches_full_lex(lexer.stream)
+
+
+def test_edits_on_one_long_line_move_the_columns_after_them(small_pieces):
+    # No comment markers, so the line is never cut short by a "//"
+    text = " ".join(line for line in generate_program(2000, seed=4).split("\n") if "/" not in line)
+    lexer = IncrementalLexer()
+    assert lexer.update(text)
+    for new, prefix, suffix in random_edits(text, seed=6, count=300, single_line=True):
+        assert lexer.update(new, prefix, suffix)
+        assert_matches_full_lex(lexer.stream)
+
+
+def test_an_edit_leaves_earlier_snapshots_and_later_pieces_alone():
+    text = generate_program(200000, seed=1)
+    lexer = IncrementalLexer()
+    lexer.update(text)
+    before = lexer.stream
+    items = described(before)
+
+    position = 100
+    assert lexer.update(text[:position] + "x" + text[position:], position, len(text) - position)
+    after = lexer.stream
+    assert described(before) == items
+    first, stop = lexer.changed_items
+    assert stop - first < 10
+    # Only the edited piece was rebuilt; the rest are shared and placed one character on
+    assert after.pieces[1:] == before.pieces[1:]
+    assert set(after.offsets[1:]) == {1}
+    assert_matches_full_lex(after)
+
+
+def test_a_cancelled_update_keeps_the_previous_stream():
+    text = generate_program(100000, seed=3)
+    lexer = IncrementalLexer()
+    lexer.update(text)
+    stream = lexer.stream
+    # Opening a comment at the top re-lexes the whole document
+    assert not lexer.update("/*" + text + "*/", 0, 0, cancelled=lambda: True)
+    assert lexer.stream is stream
+
+
+def test_closing_a_comment_relexes_from_its_opener():
+    lexer = IncrementalLexer()
+    text = "a = 1; /* b = 2;\nc = 3;\n"
+    lexer.update(text)
+    lexer.update(text + "*/ d", len(text), 0)
+    assert_matches_full_lex(lexer.stream)
+    assert [token.value for token in lexer.stream.tokens][-2:] == ["/* b = 2;\nc = 3;\n*/", "d"]
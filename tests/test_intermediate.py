@@ -0,0 +1,66 @@
+import io
+
+import pytest
+
+from src.cli import check_program
+from src.intermediate import HALT, IntermediateGenerator, PowerError, power
+from src.vm import StreamIO, VirtualMachine, assemble
+
+
+def generate(code):
+    tree, errors = check_program(code)
+    assert not errors
+    return IntermediateGenerator().generate(tree)
+
+
+def listing(intermediate):
+    return [intermediate.three_address(index) for index in range(len(intermediate))]
+
+
+def run(intermediate):
+    output = io.StringIO()
+    VirtualMachine(StreamIO(io.StringIO(), output)).run(assemble(intermediate))
+    return output.getvalue().split()
+
+
+def test_three_address_listing():
+    intermediate = generate("main { int a; float f; a = 2 + a * 3; f = a; cout -a; }")
+    assert listing(intermediate) == [
+        "t1 = a * 3", "a = 2 + t1", "f = (float) a", "t3 = -a", "write t3", "halt",
+    ]
+    # t2 was written straight into a
+    assert intermediate.temp_count == 3
+    assert intermediate.ops[-1] == HALT
+
+
+def test_short_circuit_jumps():
+    intermediate = generate("main { int a; if (a < 1 || a > 2 && a != 5) cout 1; end }")
+    assert listing(intermediate) == [
+        "t1 = a < 1", "if_true t1 goto L1",
+        "t2 = a > 2", "if_false t2 goto L0",
+        "t3 = a != 5", "if_false t3 goto L0",
+        "L1:", "write 1", "L0:", "halt",
+    ]
+
+
+def test_long_operator_chains_do_not_overflow_the_stack():
+    terms = 20000
+    intermediate = generate(
+        "main { int x; x = " + " + ".join(["1"] * terms) + "; cout x;\n"
+        "if (" + " && ".join(["x > 1"] * terms) + ") cout 1; end\n"
+        "cout " + " || ".join(["x < 1"] * terms) + "; }"
+    )
+    assert run(intermediate) == [str(terms), "1", "0"]
+
+
+def test_power_keeps_the_types_of_the_language():
+    assert [power(2, -1), power(-1, -3), power(-1, -2), power(2, 10), power(2.0, -1)] == [0, -1, 1, 1024, 0.5]
+    assert type(power(2, -1)) is int
+    with pytest.raises(ZeroDivisionError):
+        power(0, -1)
+    with pytest.raises(PowerError):
+        power(-8.0, 0.5)
+    with pytest.raises(PowerError):
+        power(7, 99999999)
+    # Trivial bases are fine with any exponent
+    assert power(-1, 99999999) == -1
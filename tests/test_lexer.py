@@ -0,0 +1,107 @@
+import io
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.corpus import generate_program
+from src import lexer as lexer_module
+from src.lexer import Lexer, Token
+
+# Errors, comments across lines, a "//" before a closed comment and an unclosed "/*"
+TRICKY = "main {\n  int a; a = 3. + 2.5 @ 4;\n  /* uno\n dos */ b = a//* c */ 1;\n  # x /* sin cerrar\n}\n"
+ALPHABET = "ab1 2.\n/*+-=<>!&|;(){}@#\tif "
+
+
+def described(result):
+    """Tokens and errors without offsets, which only the combined engine records"""
+    tokens, errors = result
+    return [(token.type, token.value, token.line, token.column) for token in tokens], [str(error) for error in errors]
+
+
+def streamed(items):
+    tokens = [item for item in items if isinstance(item, Token)]
+    return tokens, [item for item in items if not isinstance(item, Token)]
+
+
+def random_texts(count, seed=1):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(ALPHABET) for _ in range(rng.randrange(60)))
+
+
+@pytest.mark.parametrize("code", [TRICKY, "", "3.", "/*", "a // b /* c */ d", generate_program(30000, seed=9)])
+def test_engines_agree(code):
+    assert described(Lexer('combined').tokenize(code)) == described(Lexer('legacy').tokenize(code))
+
+
+def test_engines_agree_on_random_text():
+    combined, legacy = Lexer('combined'), Lexer('legacy')
+    for code in random_texts(1500):
+        assert described(combined.tokenize(code)) == described(legacy.tokenize(code)), code
+
+
+def test_combined_offsets_point_at_the_values():
+    tokens, errors = Lexer().tokenize(TRICKY)
+    for item in tokens + errors:
+        assert TRICKY[item.offset:item.offset + len(item.value)] == item.value
+    assert [str(error) for error in errors] == [
+        "Error: Número decimal inválido '3.' en línea 2, columna 14",
+        "Error: Carácter no reconocido '@' en línea 2, columna 23",
+        "Error: Carácter no reconocido '#' en línea 5, columna 3",
+    ]
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        Lexer('otro')
+
+
+# Multi-byte characters, so binary chunks also end inside a character
+STREAMED = TRICKY.replace("int a; a", "int á; á") + "x = 12.5 // fin\n3.25 /* largo\n\n */"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 65536])
+def test_iter_tokens_matches_tokenize_whatever_the_chunk_size(chunk_size):
+    lexer = Lexer()
+    expected = described(lexer.tokenize(STREAMED))
+    sources = (io.StringIO(STREAMED), io.BytesIO(STREAMED.encode("utf-8")))
+    for source in sources:
+        assert described(streamed(list(lexer.iter_tokens(source, chunk_size=chunk_size)))) == expected
+    assert described(streamed(list(lexer.iter_tokens(STREAMED)))) == expected
+
+
+def test_iter_tokens_reads_files(tmp_path):
+    path = tmp_path / "programa.txt"
+    path.write_text(STREAMED, encoding="utf-8")
+    lexer = Lexer()
+    with open(path, "rb") as source:
+        items = list(lexer.iter_tokens(source, chunk_size=5))
+    tokens, errors = lexer.tokenize(STREAMED)
+    assert [item.offset for item in items] == sorted(item.offset for item in tokens + errors)
+
+
+def test_lexers_share_one_read_only_specification():
+    first, second = Lexer(), Lexer('legacy')
+    assert first.combined_regex is second.combined_regex is lexer_module.COMBINED_REGEX
+    assert first.TOKEN_TYPES is second.TOKEN_TYPES
+    assert not first.__dict__.keys() - {'engine'}
+    with pytest.raises(TypeError):
+        first.TOKEN_TYPES['NUEVO'] = 11
+    with pytest.raises(TypeError):
+        lexer_module.ERROR_MESSAGES['MISMATCH'] = "otro"
+
+
+def test_legacy_patterns_are_compiled_once_on_first_use():
+    script = (
+        "from src import lexer\n"
+        "assert lexer._regex_patterns is None\n"
+        "lexer.Lexer('legacy').tokenize('a = 1;')\n"
+        "patterns = lexer._regex_patterns\n"
+        "lexer.Lexer('legacy').tokenize('b = 2;')\n"
+        "assert lexer.regex_patterns() is patterns and len(patterns) == len(lexer.PATTERNS)\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", script], cwd=root, check=True)
@@ -0,0 +1,26 @@
+import pytest
+
+from src.line_index import LineIndex
+
+
+@pytest.mark.parametrize("text", ["", "a", "\n", "uno\ndos", "uno\ndos\n", "\n\nañadir\n  x\n\n"])
+def test_positions_match_splitting_the_text(text):
+    index = LineIndex(text)
+    lines = text.split("\n")
+    assert len(index) == len(lines)
+    offset = 0
+    for number, line in enumerate(lines, 1):
+        assert index.line_start(number) == offset
+        assert index.line_end(number) == offset + len(line)
+        # Every offset on the line, and its newline or the end of the text
+        for column in range(1, len(line) + 2):
+            assert index.position(offset + column - 1) == (number, column)
+            assert index.line_of(offset + column - 1) == number
+            assert index.offset(number, column) == offset + column - 1
+        offset += len(line) + 1
+
+
+def test_offsets_past_the_end_of_a_line_are_clamped():
+    index = LineIndex("ab\ncd")
+    assert index.offset(1, 10) == 2
+    assert index.offset(2, 10) == 5
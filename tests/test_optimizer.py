@@ -0,0 +1,88 @@
+import pytest
+
+from src.cli import check_program
+from src.intermediate import DIV, ITOF, MOD, POW, IntermediateGenerator
+from src.optimizer import (
+    LEVELS, NON_TRAPPING_OPCODES, PassManager, eliminate_common_subexpressions, eliminate_dead_code, fold_constants,
+    format_report, hoist_loop_invariants,
+)
+
+
+def generate(code):
+    tree, errors = check_program(code)
+    assert not errors
+    return IntermediateGenerator().generate(tree)
+
+
+def listing(intermediate):
+    return [intermediate.three_address(index) for index in range(len(intermediate))]
+
+
+def optimized(code, optimize):
+    intermediate = generate(code)
+    optimize(intermediate)
+    return listing(intermediate)
+
+
+def test_constants_are_folded_and_propagated():
+    assert optimized("main { int a; a = 2 * 3 + 4; cout a + 1; }", fold_constants) == \
+        ["t1 = 6", "a = 10", "t3 = 11", "write 11", "halt"]
+
+
+def test_a_constant_condition_leaves_one_branch():
+    code = "main { int a; if (1 < 2) a = 1; else a = 2; end cout a; }"
+    assert optimized(code, PassManager(1).run) == ["a = 1", "write a", "halt"]
+
+
+def test_common_subexpressions_are_reused():
+    code = "main { int a, b, c; cin a; cin b; c = (a + b) * (b + a); cout c; }"
+    assert optimized(code, eliminate_common_subexpressions)[2:5] == ["t1 = a + b", "t2 = t1", "c = t1 * t1"]
+    # Not once an operand has changed
+    code = "main { int a, b, c; cin a; cin b; c = a + b; a = 1; c = c + (a + b); cout c; }"
+    assert optimized(code, eliminate_common_subexpressions) == listing(generate(code))
+
+
+def test_loop_invariants_move_in_front_of_the_loop():
+    code = "main { int a, b, i; cin a; cin b; i = 0; while (i < 10) { i = i + a * b; } cout i; }"
+    assert optimized(code, hoist_loop_invariants) == [
+        "read a", "read b", "i = 0", "t1 = a * b", "goto L1",
+        "L0:", "i = i + t1", "L1:", "t3 = i < 10", "if_true t3 goto L0", "write i", "halt",
+    ]
+
+
+def test_dead_stores_are_removed():
+    assert optimized("main { int a; a = 1; a = 2; cout a; }", eliminate_dead_code) == ["a = 2", "write a", "halt"]
+
+
+def test_operations_that_can_fail_are_kept():
+    assert not NON_TRAPPING_OPCODES & {DIV, MOD, POW, ITOF}
+    code = "main { int a, b; float f; cin a; a = a / 0; b = 2 % 0; f = 2 ^ 100; f = a; cout 1; }"
+    instructions = optimized(code, PassManager(2).run)
+    assert "a = a / 0" in instructions and "b = 2 % 0" in instructions
+    # Too large an exponent is left for run time, and its conversion stays
+    # although f is overwritten
+    assert instructions[3:5] == ["t3 = 2 ^ 100", "f = (float) t3"]
+
+
+def test_powers_fold_with_the_language_semantics():
+    code = "main { int a; float x, y; a = 2 ^ -1; x = 0.0 - 8.0; y = x ^ 0.5; cout a; cout y; }"
+    # int ^ negative int stays an int; a complex result is left for run time
+    assert optimized(code, fold_constants)[:3] == ["a = 0", "x = -8.0", "y = -8.0 ^ 0.5"]
+
+
+@pytest.mark.parametrize("level", sorted(LEVELS))
+def test_levels_run_their_passes_and_report_them(level):
+    intermediate = generate("main { int a; a = 2 * 3; a = a + 1; cout a; }")
+    before = len(intermediate)
+    reports = PassManager(level).run(intermediate)
+    assert len(reports) == len(LEVELS[level])
+    if reports:
+        assert reports[0]['before'] == before and reports[-1]['after'] == len(intermediate) < before
+        assert format_report(reports).count("\n") == len(reports)
+    else:
+        assert format_report(reports) == ""
+
+
+def test_unknown_level_is_rejected():
+    with pytest.raises(ValueError):
+        PassManager(3)
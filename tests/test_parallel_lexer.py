@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from benchmarks.corpus import generate_program
+from src.lexer import Lexer
+from src.parallel_lexer import block_comments, scan_parallel, split_points, tokenize_parallel
+
+ALPHABET = "ab1 .\n\n/*+;@"
+
+
+def described(items):
+    return [(type(item).__name__, getattr(item, 'type', None), item.value, item.line, item.column, item.offset,
+             getattr(item, 'message', None)) for item in items]
+
+
+def comment_spans(code):
+    """(start, end) of the block comments in a full lex"""
+    tokens, _ = Lexer().tokenize(code)
+    return [(token.offset, token.offset + len(token.value)) for token in tokens
+            if token.type == 3 and token.value.startswith("/*")]
+
+
+def random_texts(count, seed=1):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(ALPHABET) for _ in range(rng.randrange(80)))
+
+
+@pytest.mark.parametrize("code", [
+    "a /* b */ c", "a // b\n/* c\n */", "a //* b */ c", "a //* b", "/* a", "/* a */ /* b", "x // y /* z */ w\n",
+])
+def test_block_comments_match_the_lexer(code):
+    assert block_comments(code) == comment_spans(code)
+
+
+def test_block_comments_match_the_lexer_on_random_text():
+    for code in random_texts(2000):
+        assert block_comments(code) == comment_spans(code), code
+
+
+def test_split_points_start_lines_outside_comments():
+    code = "a;\n/* uno\ndos\ntres */ b;\nc;\n" * 50
+    for pieces in (1, 2, 7, 40, 1000):
+        bounds = split_points(code, pieces)
+        assert bounds[0] == 0 and bounds[-1] == len(code)
+        assert bounds == sorted(set(bounds)) and len(bounds) <= pieces + 1
+        spans = block_comments(code)
+        for bound in bounds[1:-1]:
+            assert code[bound - 1] == "\n"
+            assert not any(start < bound < end for start, end in spans)
+    assert split_points("", 4) == [0, 0]
+    assert split_points("sin saltos de línea", 4) == [0, len("sin saltos de línea")]
+
+
+@pytest.mark.parametrize("pieces", [1, 3, 16])
+def test_pieces_lexed_apart_match_a_single_pass(pieces):
+    code = generate_program(50000, seed=8) + "/* sin\ncerrar @ 3.\n"
+    tokens, errors = Lexer().tokenize(code)
+    parallel_tokens, parallel_errors = scan_parallel(code, workers=2, pieces=pieces).split(code)
+    assert described(parallel_tokens) == described(tokens)
+    assert described(parallel_errors) == described(errors)
+
+
+def test_random_text_lexed_in_pieces_matches_a_single_pass():
+    for code in random_texts(50, seed=2):
+        expected = Lexer().tokenize(code)
+        buffer = scan_parallel(code, workers=2, pieces=4)
+        assert [described(items) for items in buffer.split(code)] == [described(items) for items in expected], code
+
+
+def test_small_sources_are_lexed_in_this_process():
+    code = "main { a = 1 @ 2; }"
+    tokens, errors = tokenize_parallel(code, workers=4)
+    expected_tokens, expected_errors = Lexer().tokenize(code)
+    assert described(tokens) == described(expected_tokens)
+    assert described(errors) == described(expected_errors)
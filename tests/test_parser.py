@@ -0,0 +1,123 @@
+import pytest
+
+from benchmarks.corpus import generate_program
+from src.lexer import Lexer
+from src.parser import (
+    MAX_DEPTH, Assignment, BinaryOp, Declaration, DoWhile, If, Input, Literal, Output, Parser, Switch,
+    UnaryOp, Update, While, format_tree,
+)
+
+
+def parse(code):
+    tokens, errors = Lexer().tokenize(code)
+    assert errors == []
+    return Parser().parse(tokens)
+
+
+def expression(source):
+    tree, errors = parse(f"main {{ x = {source}; }}")
+    assert errors == []
+    return render(tree.body[0].value)
+
+
+def render(node):
+    """An expression as nested parentheses"""
+    if isinstance(node, BinaryOp):
+        return f"({render(node.left)} {node.operator} {render(node.right)})"
+    if isinstance(node, UnaryOp):
+        return f"({node.operator}{render(node.operand)})"
+    if isinstance(node, Literal):
+        return repr(node.value)
+    return node.name
+
+
+@pytest.mark.parametrize("source, tree", [
+    ("1 + 2 * 3", "(1 + (2 * 3))"),
+    ("1 - 2 - 3", "((1 - 2) - 3)"),
+    ("a || b && c < d + e * f", "(a || (b && (c < (d + (e * f)))))"),
+    ("2 ^ 3 ^ 2", "(2 ^ (3 ^ 2))"),
+    ("-a ^ 2", "(-(a ^ 2))"),
+    ("2 ^ -1", "(2 ^ (-1))"),
+    ("(1 + 2) * 3.5", "((1 + 2) * 3.5)"),
+    ("a % b != 0", "((a % b) != 0)"),
+])
+def test_expressions_follow_precedence_and_associativity(source, tree):
+    assert expression(source) == tree
+
+
+def test_every_statement_kind():
+    tree, errors = parse(
+        "main {\n"
+        "  int a, b; float c;\n"
+        "  cin a; a++; b--;\n"
+        "  if (a > b) c = 1.5; else c = 2; end\n"
+        "  while (a < 10) { a = a + 1; }\n"
+        "  do { b = b - 1; } while (b > 0);\n"
+        "  switch (a) { case 1 { cout a; } case 2 { } }\n"
+        "  /* comentario */ cout c;\n"
+        "}\n"
+    )
+    assert errors == []
+    assert [type(node) for node in tree.body] == [
+        Declaration, Declaration, Input, Update, Update, If, While, DoWhile, Switch, Output,
+    ]
+    declaration, switch = tree.body[0], tree.body[8]
+    assert (declaration.var_type, [name.name for name in declaration.names]) == ('int', ['a', 'b'])
+    assert [case.value.value for case in switch.cases] == [1, 2]
+    branch = tree.body[5]
+    assert [type(node) for node in branch.then_body.statements + branch.else_body.statements] == [Assignment] * 2
+    # Block ranges point into the token list the tree keeps, comments excluded
+    loop = tree.body[6].body
+    assert [token.value for token in tree.tokens[loop.start:loop.end]] == ['{', 'a', '=', 'a', '+', '1', ';', '}']
+    assert all(token.type != 3 for token in tree.tokens)
+
+
+def test_broken_statements_are_dropped_and_parsing_goes_on():
+    tree, errors = parse("main {\n  int ;\n  a = (1 + ;\n  b = 2;\n  3 c;\n  cout b;\n}\n")
+    assert [(error.line, error.value) for error in errors] == [(2, ';'), (3, ';'), (5, '3')]
+    assert [type(node) for node in tree.body] == [Assignment, Output]
+    assert str(errors[0]) == "Error: Se esperaba un identificador y se encontró ';' en línea 2, columna 7"
+
+
+def test_one_error_per_position():
+    tree, errors = parse("main { int a a = 1; }")
+    assert len(errors) == 1
+    # 'main', '{' and '}' are all missing at the end of the input
+    tree, errors = parse("")
+    assert [str(error) for error in errors] == [
+        "Error: Se esperaba 'main' y se encontró 'fin de archivo' en línea 1, columna 1",
+    ]
+    assert tree.body == []
+
+
+def test_deep_nesting_is_reported_instead_of_overflowing():
+    depth = MAX_DEPTH * 50
+    tree, errors = parse("main { a = " + "(" * depth + "1" + ")" * depth + "; b = 1; }")
+    assert any(error.message == "Anidamiento demasiado profundo en" for error in errors)
+    assert isinstance(tree.body[-1], Assignment) and tree.body[-1].target.name == 'b'
+    tree, errors = parse("main { " + "while (a) { " * depth + "}" * depth + " cout a; }")
+    assert errors and isinstance(tree.body[-1], Output)
+
+
+def test_generated_programs_parse_cleanly():
+    tree, errors = parse(generate_program(50000, seed=11))
+    assert errors == []
+    assert tree.body
+
+
+def test_format_tree_lists_one_node_per_line():
+    tree, _ = parse("main {\n  int a;\n  a = 1 + 2;\n  if (a) cout a; end\n}")
+    assert format_tree(tree).splitlines() == [
+        "main  [línea 1]",
+        "  declaración int: a  [línea 2]",
+        "  asignación a =  [línea 3]",
+        "    +  [línea 3]",
+        "      1 (int)  [línea 3]",
+        "      2 (int)  [línea 3]",
+        "  if  [línea 4]",
+        "    condición:",
+        "      a  [línea 4]",
+        "    entonces:",
+        "      cout  [línea 4]",
+        "        a  [línea 4]",
+    ]
@@ -0,0 +1,95 @@
+import threading
+import tracemalloc
+
+from src.lexer import Lexer
+from src.profiling import Profiler
+
+
+def test_phases_and_counters_accumulate():
+    profiler = Profiler()
+    for _ in range(3):
+        with profiler.phase('scan'):
+            pass
+    profiler.add_time('save', 0.5)
+    profiler.count('tokens', 10)
+    profiler.count('tokens', 5)
+    report = profiler.report()
+    assert report['phases']['scan']['calls'] == 3
+    assert report['phases']['save'] == {'seconds': 0.5, 'calls': 1}
+    assert report['counters'] == {'tokens': 15}
+    assert report['capture'] is None
+
+    profiler.reset()
+    assert profiler.report()['phases'] == {} and profiler.report()['counters'] == {}
+
+
+def test_rates_use_the_lexing_phases_only():
+    profiler = Profiler()
+    profiler.add_time('scan', 1.0)
+    profiler.add_time('cache', 1.0)
+    profiler.add_time('save', 2.0)
+    profiler.add_time('highlight', 10.0)
+    profiler.count('tokens', 1000)
+    profiler.count('chars', 4000)
+    profiler.count('bytes_written', 500)
+    assert profiler.rates() == {'tokens_per_second': 500, 'chars_per_second': 2000, 'bytes_written_per_second': 250}
+
+
+def test_merge_folds_in_other_reports():
+    worker = Profiler()
+    worker.add_time('scan', 1.0, calls=2)
+    worker.count('files', 3)
+    profiler = Profiler()
+    profiler.add_time('scan', 0.5)
+    profiler.merge(worker.report())
+    profiler.merge(worker.report())
+    report = profiler.report()
+    assert report['phases']['scan'] == {'seconds': 2.5, 'calls': 5}
+    assert report['counters'] == {'files': 6}
+
+
+def test_counts_from_many_threads_are_not_lost():
+    profiler = Profiler()
+
+    def work():
+        for _ in range(1000):
+            profiler.count('tokens')
+            profiler.add_time('scan', 0.0)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert profiler.report()['counters']['tokens'] == 8000
+    assert profiler.report()['phases']['scan']['calls'] == 8000
+
+
+def test_capture_profiles_only_its_blocks():
+    was_tracing = tracemalloc.is_tracing()
+    profiler = Profiler()
+    profiler.start_capture()
+    assert profiler.capturing
+    with profiler.capture():
+        Lexer().tokenize("main { int a; a = 1; }")
+    assert "Captura de cProfile/tracemalloc en curso..." in profiler.format()
+    report = profiler.stop_capture(limit=50)
+
+    assert not profiler.capturing
+    assert tracemalloc.is_tracing() == was_tracing
+    assert any("tokenize" in entry['function'] for entry in report['functions'])
+    assert report['memory']['peak_bytes'] > 0
+    assert profiler.report()['capture'] is report
+    assert "Funciones con más tiempo acumulado (cProfile):" in profiler.format()
+
+
+def test_format_names_the_phases_and_counters():
+    profiler = Profiler()
+    assert "(sin mediciones)" in profiler.format()
+    profiler.add_time('scan', 0.2)
+    profiler.add_time('otra_fase', 0.1)
+    profiler.count('tokens', 1234)
+    text = profiler.format()
+    assert "escaneo" in text and "otra_fase" in text
+    assert "1,234" in text
+    assert "tokens por segundo" in text
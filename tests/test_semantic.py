@@ -0,0 +1,71 @@
+from src.lexer import Lexer
+from src.parser import Parser
+from src.semantic import SemanticAnalyzer
+
+
+def analyze(code, analyzer=None):
+    tokens, lexical_errors = Lexer().tokenize(code)
+    assert not lexical_errors
+    tree, syntax_errors = Parser().parse(tokens)
+    assert not syntax_errors
+    return (analyzer or SemanticAnalyzer()).analyze(tree)
+
+
+def messages(errors):
+    return [(error.message, error.value, error.line) for error in errors]
+
+
+def test_type_errors():
+    _, errors = analyze("""main {
+        int a; float f; int a;
+        a = f;
+        a = 1 < 2;
+        if (a) cout 1; end
+        cout b;
+        f = 1.5 % 2;
+        cout (1 < 2) + 1;
+    }""")
+    assert messages(errors) == [
+        ("Variable ya declarada en este ámbito", 'a', 2),
+        ("No se puede asignar un valor float a la variable entera", 'a', 3),
+        ("No se puede asignar una expresión booleana a la variable", 'a', 4),
+        ("La condición debe ser una expresión relacional o lógica en", 'if', 5),
+        ("Variable no declarada", 'b', 6),
+        ("Se requieren operandos enteros para el operador", '%', 7),
+        ("Se requieren operandos numéricos para el operador", '+', 8),
+    ]
+
+
+def test_errors_in_operands_come_before_the_operator():
+    _, errors = analyze("main { int a; cout (p < 1) + -(1 < 2) + q; }")
+    assert messages(errors) == [
+        ("Variable no declarada", 'p', 1),
+        ("Se requiere un operando numérico para el operador", '-', 1),
+        ("Variable no declarada", 'q', 1),
+    ]
+
+
+def test_long_operator_chains_do_not_overflow_the_stack():
+    terms = 20000
+    declarations, errors = analyze(
+        "main { int x; float f; x = " + " + ".join(["1"] * terms) + ";\n"
+        "f = " + " * ".join(["x"] * terms) + " / 2.0;\n"
+        "if (" + " && ".join(["x < 1"] * terms) + ") x = 1; end }"
+    )
+    assert errors == []
+    _, errors = analyze("main { int x; x = " + " + ".join(["1"] * terms) + " + 0.5; }")
+    assert messages(errors) == [("No se puede asignar un valor float a la variable entera", 'x', 1)]
+
+
+def test_unchanged_blocks_are_reused():
+    analyzer = SemanticAnalyzer()
+    code = "main { int a; while (a < 3) { a++; } if (a > 1) cout a; else cout 0; end }"
+    analyze(code, analyzer)
+    assert analyzer.blocks_reused == 0
+    _, errors = analyze(code.replace("cout 0", "cout 1"), analyzer)
+    assert errors == []
+    assert analyzer.blocks_reused > 0
+
+    # Changing the type of a name a cached block uses re-checks it
+    _, errors = analyze(code.replace("int a", "float a").replace("cout 0", "cout 2"), analyzer)
+    assert errors == []
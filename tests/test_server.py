@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+
+import pytest
+
+from src.lexer import Lexer
+from src.server import run_server
+
+URI = "file:///programa.txt"
+PROGRAM = "main {\n  int a;\n  a = 1 @;\n  cout b;\n}\n"
+
+
+class Client:
+    """Talk to a server running on a thread, over pipes, as an editor would"""
+
+    def __init__(self):
+        server_in, self._input = os.pipe()
+        self._output, server_out = os.pipe()
+        self.exit_codes = []
+        self._thread = threading.Thread(
+            target=lambda: self.exit_codes.append(
+                run_server(2, False, os.fdopen(server_in, "rb"), os.fdopen(server_out, "wb"))
+            ),
+            daemon=True,
+        )
+        self._thread.start()
+        self._reader = os.fdopen(self._output, "rb")
+        self._next_id = 0
+        self.notifications = []
+
+    def send(self, method, params=None, request_id=None):
+        message = {'jsonrpc': "2.0", 'method': method, 'params': params or {}}
+        if request_id is not None:
+            message['id'] = request_id
+        body = json.dumps(message).encode("utf-8")
+        os.write(self._input, b"Content-Length: %d\r\n\r\n" % len(body) + body)
+
+    def receive(self):
+        length = None
+        while True:
+            line = self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("ascii").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return json.loads(self._reader.read(length))
+
+    def request(self, method, params=None):
+        self._next_id += 1
+        self.send(method, params, self._next_id)
+        while True:
+            message = self.receive()
+            if message.get('id') == self._next_id:
+                return message
+            self.notifications.append(message)
+
+    def diagnostics(self, version):
+        """Wait for the diagnostics published for a version"""
+        while True:
+            for message in self.notifications:
+                params = message['params']
+                if message['method'] == 'textDocument/publishDiagnostics' and params.get('version') == version:
+                    return params['diagnostics']
+            self.notifications.append(self.receive())
+
+    def close(self):
+        self.request('shutdown')
+        self.send('exit')
+        os.close(self._input)
+        self._thread.join(10)
+        self._reader.close()
+        return self.exit_codes
+
+
+@pytest.fixture
+def client():
+    client = Client()
+    client.request('initialize', {})
+    client.send('initialized')
+    yield client
+    if client._thread.is_alive():
+        client.close()
+
+
+def open_document(client, text=PROGRAM):
+    client.send('textDocument/didOpen', {'textDocument': {'uri': URI, 'text': text, 'version': 1}})
+
+
+def test_tokens_follow_incremental_changes(client):
+    open_document(client)
+    # "1 @" becomes "2"
+    client.send('textDocument/didChange', {
+        'textDocument': {'uri': URI, 'version': 2},
+        'contentChanges': [{'range': {'start': {'line': 2, 'character': 6}, 'end': {'line': 2, 'character': 9}},
+                            'text': "2"}],
+    })
+    response = client.request('compilador/tokens', {'textDocument': {'uri': URI}})
+    text = PROGRAM.replace("1 @", "2")
+    tokens, _ = Lexer().tokenize(text)
+    assert [token['value'] for token in response['result']['tokens']] == [token.value for token in tokens]
+    assert response['result']['version'] == 2
+
+
+def test_diagnostics_cover_every_phase(client):
+    open_document(client)
+    messages = [diagnostic['message'] for diagnostic in client.diagnostics(1)]
+    assert any("'@'" in message for message in messages)
+    assert any("'b'" in message for message in messages)
+
+
+def test_semantic_tokens_use_relative_positions(client):
+    open_document(client, "int a;\n  a = 1;")
+    data = client.request('textDocument/semanticTokens/full', {'textDocument': {'uri': URI}})['result']['data']
+    # int, a, a, =, 1 (symbols are not highlighted)
+    assert [data[index:index + 3] for index in range(0, len(data), 5)] == \
+        [[0, 0, 3], [0, 4, 1], [1, 2, 1], [0, 2, 1], [0, 2, 1]]
+
+
+def test_shutdown_then_exit_ends_with_status_zero(client):
+    assert client.close() == [0]
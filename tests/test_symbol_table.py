@@ -0,0 +1,76 @@
+from src.lexer import Lexer
+from src.symbol_table import SymbolTable, build_symbol_table, format_symbol_table
+
+
+def test_scopes_shadow_and_restore():
+    table = SymbolTable()
+    outer = table.declare("a", "int", 1, 1)
+    assert table.declare("a", "float") is None
+
+    table.push_scope()
+    inner = table.declare("a", "float", 2, 1)
+    table.declare("b", "int", 2, 5)
+    assert table.lookup("a") is inner and inner.shadowed is outer
+    assert table.lookup_current("a") is inner
+    assert (len(table), table.level) == (2, 1)
+
+    table.push_scope()
+    assert table.lookup_current("a") is None and table.lookup("a") is inner
+    table.pop_scope()
+
+    table.pop_scope()
+    assert table.lookup("a") is outer
+    assert "b" not in table
+    assert (len(table), table.level) == (1, 0)
+    assert [symbol.location for symbol in (outer, inner)] == [0, 1]
+
+
+def test_the_table_grows_and_shrinks_with_the_scopes():
+    table = SymbolTable()
+    names = [f"v{index}" for index in range(1000)]
+    for name in names[:10]:
+        table.declare(name, "int")
+    table.push_scope()
+    for name in names:
+        table.declare(name, "float")
+    stats = table.stats()
+    assert stats['entries'] == len(table) == 1000
+    assert stats['load_factor'] <= SymbolTable.MAX_LOAD_FACTOR and table.resizes > 0
+    assert all(table.lookup(name).var_type == "float" for name in names)
+
+    table.pop_scope()
+    assert sorted(symbol.name for symbol in table) == sorted(names[:10])
+    assert all(table.lookup(name).var_type == "int" for name in names[:10])
+
+
+def test_build_symbol_table_follows_the_blocks():
+    code = (
+        "main {\n"
+        "  int a, b;\n"
+        "  float c;\n"
+        "  while (a < 3) {\n"
+        "    float a;\n"
+        "    a = b;\n"
+        "  }\n"
+        "  if (a > 0) int d; d = a; else float d; end\n"
+        "  c = a + b;\n"
+        "}\n"
+    )
+    table, symbols = build_symbol_table(Lexer().tokenize(code)[0])
+    assert [(s.name, s.var_type, s.level, s.location) for s in symbols] == [
+        ('a', 'int', 0, 0), ('b', 'int', 0, 1), ('c', 'float', 0, 2), ('a', 'float', 1, 3),
+        ('d', 'int', 1, 4), ('d', 'float', 1, 5),
+    ]
+    assert sorted(symbol.name for symbol in table) == ['a', 'b', 'c']
+    # Uses of the outer a and b, once per line
+    assert table.lookup('a').lines == [2, 4, 8, 9]
+    assert table.lookup('b').lines == [2, 6, 9]
+    assert symbols[3].lines == [5, 6]
+
+
+def test_format_symbol_table():
+    table, symbols = build_symbol_table(Lexer().tokenize("main { int a; a = a + 1; }")[0])
+    lines = format_symbol_table(table, symbols).splitlines()
+    assert lines[1].split() == ['a', 'int', '0', '0', '1']
+    assert "Símbolos declarados: 1" in lines
+    assert "Símbolos globales: 1" in lines
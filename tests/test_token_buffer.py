@@ -0,0 +1,79 @@
+from benchmarks.corpus import generate_program
+from src.lexer import Lexer
+from src.token_buffer import ERROR_TYPE, TokenBuffer
+
+# Errors, comments across lines, a "//" before a closed comment and an unclosed "/*"
+TRICKY = "main {\n  int a; a = 3. + 2.5 @ 4;\n  /* uno\n dos */ b = a//* c */ 1;\n  # x /* sin cerrar\n}\n"
+
+
+def described(items):
+    return [(type(item).__name__, getattr(item, 'type', None), item.value, item.line, item.column, item.offset,
+             getattr(item, 'message', None)) for item in items]
+
+
+def test_from_source_matches_the_lexer():
+    for code in (TRICKY, generate_program(20000, seed=3), ""):
+        tokens, errors = Lexer().tokenize(code)
+        buffer = TokenBuffer.from_source(code)
+        loaded_tokens, loaded_errors = buffer.split(code)
+        assert described(loaded_tokens) == described(tokens)
+        assert described(loaded_errors) == described(errors)
+        assert described(buffer.errors(code)) == described(errors)
+        assert (buffer.token_count, buffer.error_count) == (len(tokens), len(errors))
+        assert buffer.nbytes == 21 * len(buffer)
+
+
+def test_items_one_by_one_and_in_ranges():
+    buffer = TokenBuffer.from_source(TRICKY)
+    items = buffer.items(TRICKY)
+    assert described(buffer.item(index, TRICKY) for index in range(len(buffer))) == described(items)
+    assert described(buffer.items(TRICKY, start=5, stop=12)) == described(items[5:12])
+    assert [items[index].message for index in buffer.error_indexes()] == buffer.messages
+
+
+def test_slice_and_extend_keep_the_messages_in_step():
+    buffer = TokenBuffer.from_source(TRICKY)
+    errors = buffer.error_indexes()
+    middle = errors[0] + 1
+    head, tail = buffer.slice(0, middle), buffer.slice(middle, len(buffer))
+    assert head.types[-1] == ERROR_TYPE
+    assert len(head.messages) == 1 and len(tail.messages) == len(buffer.messages) - 1
+
+    head.extend(tail)
+    assert described(head.items(TRICKY)) == described(buffer.items(TRICKY))
+
+
+def test_offsets_relocate_a_piece():
+    prefix = "x;\n\n"
+    piece = "a = 1;\nb @ 2;\n"
+    text = prefix + piece
+    tokens, errors = Lexer().tokenize(text)
+    buffer = TokenBuffer()
+    buffer.scan(piece, line=3, offset=len(prefix))
+    assert described(buffer.split(text)[0]) == described(tokens[2:])
+    assert described(buffer.errors(text)) == described(errors)
+
+    # The same items read from a text with two more lines and characters in front
+    moved = "\n\n" + text
+    copy = TokenBuffer()
+    copy.extend(buffer, offset=2, line_offset=2)
+    assert [(t.value, t.line, t.offset) for t in copy.items(moved)] == \
+        [(t.value, t.line + 2, t.offset + 2) for t in buffer.items(text)]
+    assert described(buffer.items(moved, offset=2, line_offset=2)) == described(copy.items(moved))
+
+
+def test_scan_stops_when_asked_and_when_cancelled():
+    code = "a = 1; b = 2; c = 3;"
+    seen = []
+
+    def stop(token_type, start, end, line, column, message):
+        seen.append(code[start:end])
+        return code[start:end] == "c"
+
+    buffer = TokenBuffer()
+    assert buffer.scan(code, stop_from=code.index("b"), stop=stop)
+    assert seen == ["b", "=", "2", ";", "c"]
+    assert [item.value for item in buffer.items(code)] == ["a", "=", "1", ";", "b", "=", "2", ";"]
+
+    big = "a;\n" * 10000
+    assert not TokenBuffer().scan(big, cancelled=lambda: True)
@@ -0,0 +1,85 @@
+"""IncrementalLexer.token_diff, checked against a model of how Tk keeps tags
+on the text around an edit"""
+import random
+
+from benchmarks.corpus import generate_program
+from src.incremental import IncrementalLexer
+from src.lexer import Lexer
+from src.line_index import LineIndex
+
+SNIPPETS = ("", "a", "b1", " ", "\n", "3", ".", "5", "/*", "*/", "//", "@", "x = 1;\n", "if", "12.", "+", "=", "==")
+
+
+def tags_of(text):
+    """Token type tagged on each character of text after a full highlight"""
+    tags = [None] * len(text)
+    for token in Lexer().tokenize(text)[0]:
+        tags[token.offset:token.offset + len(token.value)] = [token.type] * len(token.value)
+    return tags
+
+
+def retag(tags, new_text, prefix, old_end, inserted, removed, added):
+    """Edit the tags as Tk does, then apply the diff as IDE.retag_changed_tokens does"""
+    # Inserted text gets the tags of the characters on both sides of it
+    before = tags[prefix - 1] if prefix > 0 else None
+    after = tags[old_end] if old_end < len(tags) else None
+    tags = tags[:prefix] + [before if before == after else None] * inserted + tags[old_end:]
+
+    index = LineIndex(new_text)
+    for token_type, line, column, length in removed:
+        start = index.line_start(line) + column - 1
+        for offset in range(start, start + length):
+            if tags[offset] == token_type:
+                tags[offset] = None
+    for token in added:
+        tags[token.offset:token.offset + len(token.value)] = [token.type] * len(token.value)
+    return tags
+
+
+def random_edits(text, seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        start = rng.randrange(len(text) + 1)
+        end = min(len(text), start + rng.choice((0, 0, 1, 2, 5)))
+        insert = rng.choice(SNIPPETS) + rng.choice(SNIPPETS)
+        yield text[:start] + insert + text[end:], start, end, len(insert)
+        text = text[:start] + insert + text[end:]
+
+
+def test_retagging_the_diff_matches_a_full_highlight():
+    text = generate_program(3000, seed=6) + "a@b 3. /* x\n y */ z\n"
+    lexer = IncrementalLexer()
+    lexer.update(text)
+    tags = tags_of(text)
+    for new, start, end, inserted in random_edits(text, seed=9, count=500):
+        lexer.clear_dirty()
+        assert lexer.update(new, start, len(text) - end)
+        removed, added = lexer.token_diff
+        tags = retag(tags, new, start, end, inserted, removed, added)
+        assert tags == tags_of(new), (text, new)
+        text = new
+
+
+def test_a_small_edit_gives_a_small_diff():
+    text = generate_program(100000, seed=2)
+    lexer = IncrementalLexer()
+    lexer.update(text)
+    position = text.index("=", len(text) // 2) + 1
+    lexer.clear_dirty()
+    lexer.update(text[:position] + " 7 +" + text[position:], position, len(text) - position)
+    removed, added = lexer.token_diff
+    assert [(token.value, token.type) for token in added] == [("7", 1), ("+", 5)]
+    assert removed == []
+
+
+def test_no_diff_without_a_known_starting_point():
+    lexer = IncrementalLexer()
+    lexer.update("a = 1;")
+    assert lexer.token_diff is None
+    # Two updates without clearing: the tags still reflect the first text
+    lexer.update("a = 12;", 5, 1)
+    lexer.update("a = 123;", 6, 1)
+    assert lexer.token_diff is None
+    lexer.clear_dirty()
+    lexer.update("a = 1234;", 7, 1)
+    assert lexer.token_diff is not None
@@ -0,0 +1,69 @@
+import pytest
+
+from benchmarks.corpus import generate_program
+from src.lexer import Lexer
+from src.token_file import TokenFile, write_token_file
+
+PROGRAM = "main {\n  int anio;\n  anio = 3 + anio;\n  /* dos\n líneas */ cout anio;\n}\n"
+
+
+def described(tokens):
+    return [(token.type, token.value, token.line, token.column, token.offset) for token in tokens]
+
+
+@pytest.fixture
+def token_path(tmp_path):
+    path = tmp_path / "tokens.bin"
+    write_token_file(Lexer().tokenize(PROGRAM)[0], str(path))
+    return str(path)
+
+
+def test_round_trip_keeps_every_field(token_path):
+    tokens, _ = Lexer().tokenize(PROGRAM)
+    with TokenFile(token_path) as token_file:
+        assert len(token_file) == len(tokens)
+        assert described(token_file) == described(tokens)
+        assert described(token_file[2:5]) == described(tokens[2:5])
+        assert described([token_file[-1]]) == described(tokens[-1:])
+        with pytest.raises(IndexError):
+            token_file[len(tokens)]
+
+
+def test_repeated_values_are_stored_once(tmp_path):
+    tokens, _ = Lexer().tokenize(generate_program(20000, seed=5))
+    path = tmp_path / "tokens.bin"
+    write_token_file(tokens, str(path))
+    distinct = sum(len(value.encode("utf-8")) for value in {token.value for token in tokens})
+    with TokenFile(str(path)) as token_file:
+        assert described(token_file) == described(tokens)
+        assert path.stat().st_size == token_file._strings + distinct
+
+
+def test_values_are_read_without_copying(token_path):
+    with TokenFile(token_path) as token_file:
+        views = [token_file.value_bytes(index) for index in (3, 11)]
+        assert [bytes(view) for view in views] == [b"anio", "/* dos\n líneas */".encode("utf-8")]
+        for view in views:
+            view.release()
+
+
+def test_tokens_by_line(token_path):
+    tokens, _ = Lexer().tokenize(PROGRAM)
+    with TokenFile(token_path) as token_file:
+        for line in range(1, 8):
+            assert described(token_file.tokens_on_line(line)) == described(t for t in tokens if t.line == line)
+        # The comment starts on line 4, so line 5 only has what follows it
+        assert [token.value for token in token_file.tokens_on_line(5)] == ["cout", "anio", ";"]
+
+
+def test_invalid_files_are_rejected(tmp_path, token_path):
+    empty = tmp_path / "vacio.bin"
+    empty.write_bytes(b"")
+    other = tmp_path / "otro.bin"
+    other.write_bytes(b"x" * 64)
+    truncated = tmp_path / "truncado.bin"
+    with open(token_path, "rb") as f:
+        truncated.write_bytes(f.read()[:-4])
+    for path in (empty, other, truncated):
+        with pytest.raises(ValueError):
+            TokenFile(str(path))
@@ -0,0 +1,77 @@
+import tkinter as tk
+
+import pytest
+
+from src.lexer import Lexer, Token
+from src.ui import IDE
+
+
+@pytest.fixture
+def ide(tmp_path, monkeypatch):
+    """An IDE on a real Tk root; skipped where there is no display"""
+    monkeypatch.setenv("COMPILADOR_CACHE_DIR", str(tmp_path / "cache"))
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("sin pantalla")
+    root.withdraw()
+    ide = IDE(root)
+    yield ide
+    ide.analysis_worker.stop()
+    root.destroy()
+
+
+def show_program(ide, code):
+    ide.text_area.delete("1.0", tk.END)
+    ide.text_area.insert("1.0", code)
+    ide.text_area.see("1.0")
+    ide.root.update()
+
+
+def tagged_lines(ide, tag):
+    ranges = ide.text_area.tag_ranges(tag)
+    return {int(str(index).split('.')[0]) for index in ranges[::2]}
+
+
+def test_token_indices_span_the_value():
+    assert IDE._token_indices(Token(2, "abc", 3, 5, 0)) == ("3.4", "3.7")
+    # A comment across lines ends wherever its characters end
+    assert IDE._token_indices(Token(1, "/* a\nb */", 2, 1, 0)) == ("2.0", "2.0 + 9 chars")
+
+
+def test_only_the_viewport_is_highlighted_at_once(ide):
+    code = "".join(f"v{line} = {line};\n" for line in range(1, 2001))
+    show_program(ide, code)
+    tokens, _ = Lexer().tokenize(code)
+    ide.apply_syntax_highlighting(tokens)
+
+    highlighted = tagged_lines(ide, f"token_{tokens[0].type}")
+    assert 1 in highlighted
+    assert max(highlighted) < 1000
+    assert ide.text_area.tag_nextrange(IDE.PENDING_HIGHLIGHT_TAG, "1.0") != ()
+
+    # Scrolling tags the text that comes into view
+    ide.text_area.see("1500.0")
+    ide.root.update()
+    ide._highlight_visible()
+    assert 1500 in tagged_lines(ide, f"token_{tokens[0].type}")
+
+
+def test_gutter_draws_the_visible_lines_only(ide):
+    show_program(ide, "a;\n" * 5000)
+    ide.redraw_line_numbers()
+    numbers = [int(ide.line_numbers.itemcget(item, 'text')) for item in ide.line_numbers.find_all()]
+    assert numbers[0] == 1
+    assert numbers == list(range(1, len(numbers) + 1))
+    assert len(numbers) < 500
+
+    # Nothing moved: the canvas is not redrawn
+    items = ide.line_numbers.find_all()
+    ide.redraw_line_numbers()
+    assert ide.line_numbers.find_all() == items
+
+    ide.text_area.see("4000.0")
+    ide.root.update()
+    ide.redraw_line_numbers()
+    numbers = [int(ide.line_numbers.itemcget(item, 'text')) for item in ide.line_numbers.find_all()]
+    assert 4000 in numbers and 1 not in numbers
@@ -0,0 +1,110 @@
+import pytest
+
+from src.lexer import Lexer
+from src.virtual_text import ItemRows, TextRows, VirtualText
+
+PAGE = 10
+
+
+class FakeText:
+    """The calls VirtualText makes on a tk.Text, recording what is shown"""
+
+    def __init__(self):
+        self.content = ""
+        self.tags = []
+        self.inserted = 0
+
+    def config(self, **options):
+        pass
+
+    def tag_configure(self, *args, **options):
+        pass
+
+    def bind(self, *args):
+        pass
+
+    def delete(self, start, end):
+        self.content = ""
+        self.tags = []
+
+    def insert(self, index, text):
+        self.content = text
+        self.inserted += text.count("\n") + 1
+
+    def tag_add(self, tag, start, end):
+        self.tags.append((start, end))
+
+
+class FakeScrollbar:
+    def config(self, **options):
+        pass
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+@pytest.fixture
+def view(monkeypatch):
+    monkeypatch.setattr(VirtualText, 'page_rows', lambda self: PAGE)
+    return VirtualText(FakeText(), FakeScrollbar())
+
+
+def test_text_rows_split_lines():
+    assert list(TextRows("a\nb\n")) == ["a", "b"]
+    assert list(TextRows("")) == [""]
+    assert len(TextRows("a\n\nb")) == 3
+
+
+def test_item_rows_format_items_lazily():
+    code = "a = 1;\n/* dos\nlíneas */ b @ 2;\n"
+    tokens, errors = Lexer().tokenize(code)
+    rows = ItemRows("Tokens:\n", tokens)
+    assert len(rows) == 2 + len(tokens)
+    assert rows[0] == "Tokens:" and rows[1] == ""
+    assert rows[2] == str(tokens[0])
+    # One row per item, even for a comment across lines
+    comment = next(index for index, token in enumerate(tokens) if token.type == 3) + 2
+    assert "\n" not in rows[comment] and "\\n" in rows[comment]
+    assert rows.position(0) is None and rows.position(len(rows)) is None
+    assert rows.position(comment) == (2, 1)
+    assert rows.row_for_line(3) == comment + 1
+    assert rows.row_for_line(99) == len(rows)
+    assert ItemRows("Errores:", errors).position(1) == (3, 13)
+
+
+def test_only_the_rows_in_view_are_inserted(view):
+    rows = TextRows("\n".join(f"fila {index}" for index in range(1_000_000)))
+    view.set_rows(rows)
+    assert view.text.content.split("\n")[0] == "fila 0"
+    assert view.text.inserted == PAGE + VirtualText.OVERSCAN
+
+    view.scroll(5)
+    assert view.text.content.split("\n")[0] == "fila 5"
+    view.yview('moveto', '0.5')
+    assert view.first == 500_000
+    assert view.scrollbar.position == (0.5, (500_000 + PAGE) / 1_000_000)
+    view.yview('scroll', '1', 'pages')
+    assert view.first == 500_000 + PAGE
+
+    # The view stops at either end
+    view.scroll(-10_000_000)
+    assert view.first == 0
+    view.scroll(10_000_000)
+    assert view.first == len(rows) - PAGE
+    assert view.text.content.split("\n")[-1] == "fila 999999"
+
+
+def test_show_line_scrolls_to_and_marks_the_first_item_on_it(view):
+    tokens, _ = Lexer().tokenize("".join(f"v{line} = {line};\n" for line in range(1, 101)))
+    rows = ItemRows("Tokens:", tokens)
+    view.set_rows(rows)
+    assert view.show_line(50)
+    marked = rows.row_for_line(50)
+    assert view.marked == marked and view.first <= marked < view.first + PAGE
+    line = marked - view.first + 1
+    assert view.text.tags == [(f"{line}.0", f"{line + 1}.0")]
+    assert rows[marked] == str(tokens[4 * 49])
+
+    view.set_text("sin líneas")
+    assert not view.show_line(1)
+    assert view.marked is None
@@ -0,0 +1,88 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from src.ui import IDE
+from src.worker import AnalysisCancelled, AnalysisWorker
+
+
+def wait_for_result(worker, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        outcome = worker.poll()
+        if outcome is not None:
+            return outcome
+        time.sleep(0.005)
+    raise AssertionError("el trabajador no respondió")
+
+
+def test_only_the_newest_job_is_reported_and_skipped_jobs_are_discarded():
+    started, release = threading.Event(), threading.Event()
+    ran, discarded = [], []
+
+    def analyze(payload, is_cancelled):
+        if payload == "primero":
+            started.set()
+            release.wait(5)
+        ran.append(payload)
+        return payload.upper()
+
+    worker = AnalysisWorker(analyze, discarded.append)
+    try:
+        worker.submit(1, "primero")
+        assert started.wait(5)
+        worker.submit(2, "segundo")
+        worker.submit(3, "tercero")
+        release.set()
+        assert wait_for_result(worker) == (3, "TERCERO", None)
+        # The first job ran but its result was stale; the second never ran
+        assert ran == ["primero", "tercero"]
+        assert discarded == ["segundo"]
+    finally:
+        worker.stop()
+
+
+def test_a_running_job_sees_it_was_cancelled():
+    started = threading.Event()
+    seen = []
+
+    def analyze(payload, is_cancelled):
+        if payload == "largo":
+            started.set()
+            while not is_cancelled():
+                time.sleep(0.001)
+            seen.append(payload)
+            raise AnalysisCancelled()
+        return payload
+
+    worker = AnalysisWorker(analyze)
+    try:
+        worker.submit(1, "largo")
+        assert started.wait(5)
+        worker.submit(2, "corto")
+        assert wait_for_result(worker) == (2, "corto", None)
+        assert seen == ["largo"]
+    finally:
+        worker.stop()
+
+
+def test_errors_come_back_as_tracebacks():
+    def analyze(payload, is_cancelled):
+        raise ValueError("mal")
+
+    worker = AnalysisWorker(analyze)
+    try:
+        worker.submit(1, None)
+        generation, result, error = wait_for_result(worker)
+        assert (generation, result) == (1, None)
+        assert "ValueError: mal" in error
+    finally:
+        worker.stop()
+
+
+def test_skipped_snapshots_fold_their_edit_range_and_tokens_request():
+    ide = SimpleNamespace(_carry_prefix=None, _carry_suffix=None, _carry_save_tokens=False)
+    IDE._fold_edit_range(ide, (1, "texto", 10, 4, False))
+    IDE._fold_edit_range(ide, (2, "texto", 6, 8, True))
+    IDE._fold_edit_range(ide, (3, "texto", None, None, False))
+    assert (ide._carry_prefix, ide._carry_suffix, ide._carry_save_tokens) == (6, 4, True)